@@ -13,45 +13,115 @@ import threading
 import time
 from functools import wraps
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+from werkzeug.test import EnvironBuilder
 from flask_cors import CORS
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from compression_utils import compress_response, decompress_body
+from logging_utils import setup_logging
 from models.auth_model import AuthModel
 from models.lock_model import LockModel
-from models.order_model import OrderModel
-from models.report_model import ReportModel
+from models.order_model import OrderModel, run_order_expirer
+from models.report_model import REPORT_JOBS, ReportModel
 from models.schedule_model import ScheduleModel
 from models.script_model import ScriptModel
-from nosql.config import MONGO_DB_NAME
+from nosql import availability_stream, idempotency, metrics, single_flight
+from nosql.config import (
+    BATCH_MAX_REQUESTS,
+    LOCK_HISTORY_IN_WEB,
+    LOCK_SWEEPER_IN_WEB,
+    METRICS_TOKEN,
+    MONGO_DB_NAME,
+    ORDER_EXPIRER_IN_WEB,
+    SECKILL_MODE,
+    SSE_IN_WSGI,
+)
+from nosql.executor import run_parallel
 from nosql.json_utils import to_jsonable
+from nosql.lock_history import run_writer as run_lock_history_writer
 from nosql.mongo import col, ensure_indexes, ping as mongo_ping
 from nosql.redis_client import ping as redis_ping
-from nosql.seat_lock_service import cleanup_expired_locks
+from nosql.report_cache import get_cache_stats
+from nosql.report_jobs import get_job as get_report_job
+from nosql.report_jobs import submit_job
+from nosql.seat_lock_service import run_lock_sweeper
+from security_utils import InputValidator
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("api.log", encoding="utf-8"), logging.StreamHandler()],
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
 
+# ==================== 请求指标 ====================
+
+
+# SSE 长连接会持续到客户端断开，计入耗时直方图与在途请求数会把指标拉偏，不做统计
+_UNMETERED_ENDPOINTS = {"stream_script_availability"}
+
+
+@app.before_request
+def _metrics_request_started():
+    if request.endpoint in _UNMETERED_ENDPOINTS:
+        return
+    g.metrics_started = time.perf_counter()
+    metrics.request_started()
+
+
+@app.after_request
+def _metrics_capture_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def _metrics_request_finished(_exc=None):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    mongo_seconds = metrics.request_finished()
+    # 用路由模板而不是实际路径作为标签，避免 /api/orders/123 这类路径撑爆时间序列
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.observe_request(
+        request.method, route, g.pop("metrics_status", 500), time.perf_counter() - started, mongo_seconds
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return error_response("无权访问", 401)
+    try:
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+    except Exception as e:
+        return error_response(str(e), 503)
+
+
 def success_response(data=None, message="操作成功"):
-    return jsonify({"code": 200, "message": message, "data": to_jsonable(data)})
+    response = jsonify({"code": 200, "message": message, "data": to_jsonable(data)})
+    return compress_response(response, request.headers.get("Accept-Encoding", ""))
 
 
 def error_response(message="操作失败", code=400):
     return jsonify({"code": code, "message": message, "data": None}), code
 
 
+# WSGI environ 中的私有 key（外部请求头只会以 HTTP_ 前缀出现，无法伪造）
+_BATCH_USER_ENVIRON_KEY = "scriptkill.batch_user"
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
+        # /api/batch 的子请求：批量入口已校验过一次 token，直接复用结果
+        preverified = request.environ.get(_BATCH_USER_ENVIRON_KEY)
+        if preverified is not None:
+            request.current_user = preverified
+            return f(*args, **kwargs)
+
         token = request.headers.get("Authorization")
         if not token:
             return error_response("缺少认证token", 401)
@@ -67,6 +137,56 @@ def token_required(f):
     return decorated
 
 
+def idempotent(f):
+    """
+    支持 Idempotency-Key 请求头（需放在 token_required 之后）：
+    同一用户用同一个 key 重试时直接返回首次成功的响应，不再重复执行业务逻辑。
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return f(*args, **kwargs)
+        if not idempotency.is_valid_key(key):
+            return error_response("Idempotency-Key 格式不正确（1-128 位字母、数字或 _.:-）", 400)
+
+        user_id = request.current_user["user_id"]
+        fp = idempotency.fingerprint(request.method, request.path, request.get_data())
+        state, value = idempotency.begin(user_id, key, fp)
+        if state == idempotency.REPLAY:
+            headers = dict(value["headers"])
+            body = idempotency.decode_body(value)
+            encoding = headers.pop("Content-Encoding", None)
+            if encoding:
+                body = decompress_body(body, encoding)
+            response = Response(body, status=value["status"], headers=headers)
+            response.headers["Idempotent-Replayed"] = "true"
+            # 保存的是未压缩的响应体，按本次请求的 Accept-Encoding 重新协商压缩
+            return compress_response(response, request.headers.get("Accept-Encoding", ""))
+        if state == idempotency.IN_PROGRESS:
+            return error_response("相同请求正在处理中，请稍后重试", 409)
+        if state == idempotency.MISMATCH:
+            return error_response("Idempotency-Key 已用于其他请求", 422)
+        if state == idempotency.UNAVAILABLE:
+            return f(*args, **kwargs)
+
+        try:
+            response = app.make_response(f(*args, **kwargs))
+        except Exception:
+            idempotency.finish(user_id, key, value, 500, b"", {})
+            raise
+        body = response.get_data()
+        encoding = response.headers.get("Content-Encoding")
+        if encoding:
+            body = decompress_body(body, encoding)
+        headers = {"Content-Type": response.headers["Content-Type"]} if "Content-Type" in response.headers else {}
+        idempotency.finish(user_id, key, value, response.status_code, body, headers)
+        return response
+
+    return decorated
+
+
 def _require_staff_or_boss():
     role = request.current_user.get("role")
     if role not in ("staff", "boss"):
@@ -98,6 +218,20 @@ def _get_admin_scope_dm_id(role: str, user_id: int):
     return dm_id, None
 
 
+_initialized = False
+_background_pid = None
+
+
+def _requested_fields(allowed_fields):
+    """解析列表接口的 ?fields=（逗号分隔），按资源白名单校验；未指定返回 None。"""
+    return InputValidator.validate_fields(request.args.get("fields"), allowed_fields)
+
+
+def _coalesced(compute, **params):
+    """相同路由 + 相同（已规范化的）参数的并发请求只查询一次，结果共享。"""
+    return single_flight.do(single_flight.request_key(request.url_rule.rule, request.view_args, params), compute)
+
+
 def _startup_init():
     try:
         if mongo_ping():
@@ -109,18 +243,39 @@ def _startup_init():
     except Exception as e:
         logger.warning(f"startup init skipped: {e}")
 
-    def _cleanup_worker():
-        while True:
-            try:
-                cleanup_expired_locks(limit=200)
-            except Exception as e:
-                logger.warning(f"lock cleanup error: {e}")
-            time.sleep(5)
 
-    threading.Thread(target=_cleanup_worker, daemon=True).start()
+def start_background_workers():
+    """
+    启动本进程的后台线程（锁位过期清理、锁位历史写入、超时订单取消，均为 leader 选举）。线程不会随 fork 复制到子进程，
+    因此预加载（gunicorn --preload）模式下必须在每个 worker 的 post_fork 中调用；同一进程重复调用无副作用。
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+
+    # 所有 worker 都参与选举，但只有 leader 真正执行
+    if LOCK_SWEEPER_IN_WEB:
+        threading.Thread(target=run_lock_sweeper, name="lock-sweeper", daemon=True).start()
+    if LOCK_HISTORY_IN_WEB:
+        threading.Thread(target=run_lock_history_writer, name="lock-history-writer", daemon=True).start()
+    if ORDER_EXPIRER_IN_WEB:
+        threading.Thread(target=run_order_expirer, name="order-expirer", daemon=True).start()
 
 
-_startup_init()
+def create_app(start_background: bool = True) -> Flask:
+    """
+    应用工厂：导入本模块不再产生任何连接或线程，初始化推迟到这里。
+    - start_background=False：只做连接检查与建索引（gunicorn 预加载时在 master 中调用，后台线程交给 post_fork）
+    Mongo/Redis 客户端在 fork 后的子进程中会自动重建（见 nosql.mongo / nosql.redis_client）。
+    """
+    global _initialized
+    if not _initialized:
+        _startup_init()
+        _initialized = True
+    if start_background:
+        start_background_workers()
+    return app
 
 
 # ==================== 认证 ====================
@@ -167,7 +322,7 @@ def me():
 def get_scripts():
     try:
         status = request.args.get("status", type=int)
-        scripts = ScriptModel.get_all_scripts(status)
+        scripts = ScriptModel.get_all_scripts(status, fields=_requested_fields(ScriptModel.LIST_FIELDS))
         return success_response(scripts, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -177,7 +332,7 @@ def get_scripts():
 def get_hot_scripts():
     try:
         limit = request.args.get("limit", default=10, type=int)
-        scripts = ScriptModel.get_hot_scripts(limit)
+        scripts = _coalesced(lambda: ScriptModel.get_hot_scripts(limit), limit=limit)
         return success_response(scripts, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -195,18 +350,43 @@ def get_script_detail(script_id: int):
 @app.route("/api/scripts/<int:script_id>/schedules", methods=["GET"])
 def get_schedules_by_script(script_id: int):
     try:
-        player_id = request.args.get("player_id", type=int)
-        schedules = ScheduleModel.get_schedules_by_script(script_id, player_id)
+        player_id = InputValidator.optional_int(request.args.get("player_id"))
+        schedules = _coalesced(
+            lambda: ScheduleModel.get_schedules_by_script(script_id, player_id), player_id=player_id
+        )
         return success_response(schedules, "查询成功")
     except Exception as e:
         return error_response(str(e))
 
 
+@app.route("/api/scripts/<int:script_id>/availability/stream", methods=["GET"])
+def stream_script_availability(script_id: int):
+    """SSE：先推送该剧本各场次的剩余座位（snapshot），之后座位变化实时推送（seats）。"""
+    try:
+        script_id = InputValidator.validate_id(script_id, "剧本ID")
+    except Exception as e:
+        return error_response(str(e))
+    # 每条连接占用一个 worker 线程：默认不在 WSGI 进程内提供，开启时超出上限也拒绝，避免 SSE 占满线程拖垮其他接口；
+    # 页面收到 503 后改为轮询场次列表
+    if not SSE_IN_WSGI:
+        return error_response("当前部署未开启实时推送（需 ASGI 模式或 SSE_IN_WSGI=1）", 503)
+    if not availability_stream.acquire_slot():
+        return error_response("实时推送连接数已满，请稍后重试", 503)
+    response = Response(
+        stream_with_context(availability_stream.stream(script_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(availability_stream.release_slot)
+    return response
+
+
 # ==================== 订单 ====================
 
 
 @app.route("/api/orders", methods=["POST"])
 @token_required
+@idempotent
 def create_order():
     try:
         user_id = request.current_user["user_id"]
@@ -220,14 +400,34 @@ def create_order():
         schedule_id = data.get("schedule_id")
         if not schedule_id:
             return error_response("缺少场次ID", 400)
+        if SECKILL_MODE:
+            order_id = OrderModel.enqueue_order(int(user["Ref_ID"]), int(schedule_id))
+            return success_response({"order_id": order_id, "status": "queued"}, "预约成功，订单处理中")
         order_id = OrderModel.create_order(int(user["Ref_ID"]), int(schedule_id))
         return success_response({"order_id": order_id}, "订单创建成功")
     except Exception as e:
         return error_response(str(e))
 
 
+@app.route("/api/orders/<int:order_id>/status", methods=["GET"])
+@token_required
+def get_order_status(order_id: int):
+    try:
+        user_id = request.current_user["user_id"]
+        user = AuthModel.get_user_role_ref(user_id)
+        if user.get("Role") != "player":
+            return error_response("只有玩家可以查看订单", 403)
+        if not user.get("Ref_ID"):
+            return error_response("用户信息不完整", 400)
+        status = OrderModel.get_order_status(order_id, int(user["Ref_ID"]))
+        return success_response(status, "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
 @app.route("/api/orders/<int:order_id>/pay", methods=["POST"])
 @token_required
+@idempotent
 def pay_order(order_id: int):
     try:
         user_id = request.current_user["user_id"]
@@ -278,7 +478,7 @@ def my_orders():
             return error_response("只有玩家可以查看订单", 403)
         if not user.get("Ref_ID"):
             return error_response("用户信息不完整", 400)
-        orders = OrderModel.get_orders_by_player(int(user["Ref_ID"]))
+        orders = OrderModel.get_orders_by_player(int(user["Ref_ID"]), fields=_requested_fields(OrderModel.LIST_FIELDS))
         return success_response(orders, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -287,7 +487,7 @@ def my_orders():
 @app.route("/api/players/<int:player_id>/orders", methods=["GET"])
 def get_player_orders(player_id: int):
     try:
-        orders = OrderModel.get_orders_by_player(player_id)
+        orders = OrderModel.get_orders_by_player(player_id, fields=_requested_fields(OrderModel.LIST_FIELDS))
         return success_response(orders, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -304,7 +504,7 @@ def admin_orders():
         dm_id, err = _get_admin_scope_dm_id(role, user_id)
         if err:
             return err
-        orders = OrderModel.get_all_orders(dm_id=dm_id)
+        orders = OrderModel.get_all_orders(dm_id=dm_id, fields=_requested_fields(OrderModel.LIST_FIELDS))
         return success_response(orders, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -361,7 +561,7 @@ def my_locks():
             return error_response("只有玩家可以查看锁位", 403)
         if not user.get("Ref_ID"):
             return error_response("用户信息不完整", 400)
-        locks = LockModel.get_locks_by_player(int(user["Ref_ID"]))
+        locks = LockModel.get_locks_by_player(int(user["Ref_ID"]), fields=_requested_fields(LockModel.LIST_FIELDS))
         return success_response(locks, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -378,7 +578,7 @@ def admin_locks():
         dm_id, err = _get_admin_scope_dm_id(role, user_id)
         if err:
             return err
-        locks = LockModel.get_all_locks(dm_id=dm_id)
+        locks = LockModel.get_all_locks(dm_id=dm_id, fields=_requested_fields(LockModel.LIST_FIELDS))
         return success_response(locks, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -403,7 +603,8 @@ def admin_schedules():
         room_id = request.args.get("room_id", type=int)
         script_id = request.args.get("script_id", type=int)
         status = request.args.get("status", type=int)
-        schedules = ScheduleModel.get_all_schedules(date, room_id, script_id, status, dm_id=dm_id)
+        fields = _requested_fields(ScheduleModel.LIST_FIELDS)
+        schedules = ScheduleModel.get_all_schedules(date, room_id, script_id, status, dm_id=dm_id, fields=fields)
         return success_response(schedules, "查询成功")
     except Exception as e:
         return error_response(str(e))
@@ -427,7 +628,13 @@ def admin_create_schedule():
             data["dm_id"] = dm_id
 
         schedule_id = ScheduleModel.create_schedule(
-            data["script_id"], data["room_id"], data["dm_id"], data["start_time"], data["end_time"], data["real_price"]
+            data["script_id"],
+            data["room_id"],
+            data["dm_id"],
+            data["start_time"],
+            data["end_time"],
+            data["real_price"],
+            pay_timeout_minutes=data.get("pay_timeout_minutes"),
         )
         return success_response({"schedule_id": schedule_id}, "场次创建成功")
     except Exception as e:
@@ -463,6 +670,7 @@ def admin_update_schedule(schedule_id: int):
             end_time=data.get("end_time"),
             real_price=data.get("real_price"),
             status=data.get("status"),
+            pay_timeout_minutes=data.get("pay_timeout_minutes"),
         )
         return success_response(None, "场次更新成功")
     except Exception as e:
@@ -665,7 +873,207 @@ def admin_report_dm_performance():
         return error_response(str(e))
 
 
+@app.route("/api/admin/reports/timeseries", methods=["GET"])
+@token_required
+def admin_report_timeseries():
+    try:
+        user_id = request.current_user["user_id"]
+        role, err = _require_staff_or_boss()
+        if err:
+            return err
+        dm_id, err = _get_admin_scope_dm_id(role, user_id)
+        if err:
+            return err
+        start_date = request.args.get("start")
+        end_date = request.args.get("end")
+        granularity = request.args.get("granularity", default="day")
+        split_by = request.args.get("split_by") or None
+        rows = ReportModel.get_timeseries(start_date, end_date, granularity, split_by, dm_id=dm_id)
+        return success_response(rows, "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.route("/api/admin/reports/occupancy-heatmap", methods=["GET"])
+@token_required
+def admin_report_occupancy_heatmap():
+    try:
+        user_id = request.current_user["user_id"]
+        role, err = _require_staff_or_boss()
+        if err:
+            return err
+        dm_id, err = _get_admin_scope_dm_id(role, user_id)
+        if err:
+            return err
+        start_date = request.args.get("start")
+        end_date = request.args.get("end")
+        data = ReportModel.get_occupancy_heatmap(start_date, end_date, dm_id=dm_id)
+        return success_response(data, "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.route("/api/admin/reports/unique-players", methods=["GET"])
+@token_required
+def admin_report_unique_players():
+    try:
+        user_id = request.current_user["user_id"]
+        role, err = _require_staff_or_boss()
+        if err:
+            return err
+        dm_id, err = _get_admin_scope_dm_id(role, user_id)
+        if err:
+            return err
+        start_date = request.args.get("start")
+        end_date = request.args.get("end")
+        by = request.args.get("by", default="day")
+        data = ReportModel.get_unique_players(start_date, end_date, by, dm_id=dm_id)
+        return success_response(data, "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.route("/api/admin/reports/jobs", methods=["POST"])
+@token_required
+def admin_submit_report_job():
+    try:
+        user_id = request.current_user["user_id"]
+        role, err = _require_staff_or_boss()
+        if err:
+            return err
+        dm_id, err = _get_admin_scope_dm_id(role, user_id)
+        if err:
+            return err
+
+        data = request.get_json() or {}
+        report = data.get("report")
+        if report not in REPORT_JOBS:
+            return error_response(f"不支持的报表: {report}", 400)
+        if report == "dm_performance" and role != "boss":
+            return error_response("只有老板可以查看DM业绩", 403)
+
+        _, allowed = REPORT_JOBS[report]
+        candidates = {
+            "start_date": data.get("start"),
+            "end_date": data.get("end"),
+            "limit": data.get("limit"),
+            "granularity": data.get("granularity"),
+            "split_by": data.get("split_by"),
+            "dm_id": dm_id if role == "staff" else (data.get("dm_id") or dm_id),
+        }
+        params = {k: v for k, v in candidates.items() if k in allowed and v is not None}
+        job_id = submit_job(report, params, int(user_id))
+        return success_response({"job_id": job_id}, "任务已提交")
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.route("/api/admin/reports/jobs/<job_id>", methods=["GET"])
+@token_required
+def admin_get_report_job(job_id: str):
+    try:
+        role, err = _require_staff_or_boss()
+        if err:
+            return err
+        job = get_report_job(job_id)
+        if not job:
+            return error_response("任务不存在或已过期", 404)
+        if role != "boss" and job.get("owner_id") != int(request.current_user["user_id"]):
+            return error_response("无权查看他人的报表任务", 403)
+        return success_response(job, "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.route("/api/admin/reports/cache-stats", methods=["GET"])
+@token_required
+def admin_report_cache_stats():
+    try:
+        if request.current_user.get("role") != "boss":
+            return error_response("只有老板可以查看报表缓存统计", 403)
+        return success_response(get_cache_stats(), "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+# ==================== 批量读取 ====================
+
+
+def _run_batch_subrequest(path: str, params: dict, authorization, user_payload) -> dict:
+    headers = {"Authorization": authorization} if authorization else {}
+    builder = EnvironBuilder(path=path, method="GET", query_string=params or None, headers=headers)
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    if user_payload is not None:
+        environ[_BATCH_USER_ENVIRON_KEY] = user_payload
+
+    with app.request_context(environ):
+        response = app.full_dispatch_request()
+    if response.is_streamed:
+        # 流式响应（如 SSE）不会结束，读取响应体会一直占住线程
+        response.close()
+        return {"path": path, "status": 400, "body": {"code": 400, "message": "流式接口不支持合并请求", "data": None}}
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return {"path": path, "status": response.status_code, "body": body}
+
+
+@app.route("/api/batch", methods=["POST"])
+def batch_get():
+    """
+    合并多个 GET 读取为一次请求：
+      {"requests": [{"path": "/api/scripts/1"}, {"path": "/api/scripts/1/schedules", "params": {"player_id": 3001}}]}
+    带 Authorization 时只校验一次 token；子请求之间互不依赖，并行执行，结果按提交顺序返回。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get("requests")
+        if not isinstance(items, list) or not items:
+            return error_response("requests 必须是非空数组", 400)
+        if len(items) > BATCH_MAX_REQUESTS:
+            return error_response(f"单次最多合并 {BATCH_MAX_REQUESTS} 个请求", 400)
+
+        subrequests = []
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                return error_response(f"第 {i + 1} 个请求格式错误", 400)
+            path = item.get("path")
+            params = item.get("params") or {}
+            if not isinstance(path, str) or not path.startswith("/api/") or path.startswith("/api/batch"):
+                return error_response(f"第 {i + 1} 个请求的 path 无效", 400)
+            if path.rstrip("/").endswith("/stream"):
+                return error_response(f"第 {i + 1} 个请求是流式接口，不支持合并", 400)
+            if "?" in path or not isinstance(params, dict):
+                return error_response(f"第 {i + 1} 个请求的查询参数请放在 params 中", 400)
+            subrequests.append((path, params))
+
+        authorization = request.headers.get("Authorization")
+        user_payload = None
+        if authorization:
+            try:
+                token = authorization[7:] if authorization.startswith("Bearer ") else authorization
+                user_payload = AuthModel.verify_token(token)
+            except Exception as e:
+                return error_response(str(e), 401)
+
+        results = run_parallel(
+            {
+                str(i): (lambda p=path, q=params: _run_batch_subrequest(p, q, authorization, user_payload))
+                for i, (path, params) in enumerate(subrequests)
+            },
+            pool="batch",
+        )
+        return success_response([results[str(i)] for i in range(len(subrequests))], "查询成功")
+    except TimeoutError as e:
+        return error_response(str(e), 504)
+    except Exception as e:
+        return error_response(str(e))
+
+
 if __name__ == "__main__":
     logger.info("启动 Flask API 服务（MongoDB + Redis）...")
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    create_app().run(host="0.0.0.0", port=5000, debug=False)
 
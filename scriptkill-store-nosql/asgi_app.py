@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+ASGI 服务 - 异步模式（可选部署方式）
+
+高并发热点接口（场次查询、锁位/取消锁位、座位余量 SSE）以原生异步实现（PyMongo AsyncMongoClient + redis.asyncio），
+路由与响应格式与 app.py 完全一致；其余接口通过 WSGI 适配器回落到 Flask 应用。
+
+启动：
+  pip install -r requirements-async.txt
+  uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 4
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Mount, Route
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from compression_utils import choose_encoding, compress_body
+from models.auth_model import AuthModel
+from models.lock_model_async import AsyncLockModel
+from models.schedule_model_async import AsyncScheduleModel
+from nosql import availability_stream_async, metrics, mongo_async, redis_async, single_flight
+from nosql.config import RESPONSE_COMPRESSION_ENABLED, RESPONSE_COMPRESSION_MIN_BYTES
+from nosql.json_utils import to_jsonable
+from security_utils import InputValidator
+
+logger = logging.getLogger(__name__)
+
+flask_app = create_app()
+
+
+def _compress_response(response: Response, accept_encoding: str) -> Response:
+    """与 compression_utils.compress_response 相同的协商与阈值，作用于 Starlette 响应。"""
+    if not RESPONSE_COMPRESSION_ENABLED or "content-encoding" in response.headers:
+        return response
+    response.headers.add_vary_header("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None or len(response.body) < RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+    response.body = compress_body(response.body, encoding)
+    response.headers["content-encoding"] = encoding
+    response.headers["content-length"] = str(len(response.body))
+    return response
+
+
+def success_response(request: Request, data=None, message="操作成功"):
+    response = JSONResponse({"code": 200, "message": message, "data": to_jsonable(data)})
+    return _compress_response(response, request.headers.get("accept-encoding", ""))
+
+
+def error_response(message="操作失败", code=400):
+    return JSONResponse({"code": code, "message": message, "data": None}, status_code=code)
+
+
+def _verify_request_token(request: Request) -> dict:
+    token = request.headers.get("Authorization")
+    if not token:
+        raise PermissionError("缺少认证token")
+    if token.startswith("Bearer "):
+        token = token[7:]
+    try:
+        return AuthModel.verify_token(token)
+    except Exception as e:
+        raise PermissionError(str(e))
+
+
+async def _get_user_role_ref(user_id: int) -> dict:
+    user_id = InputValidator.validate_id(user_id, "用户ID")
+    user = await mongo_async.col("users").find_one({"_id": int(user_id)}, {"Role": 1, "Ref_ID": 1})
+    if not user:
+        raise ValueError("用户不存在")
+    return {"Role": user.get("Role"), "Ref_ID": user.get("Ref_ID")}
+
+
+async def _read_json(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except (ValueError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+# ==================== 场次 ====================
+
+
+async def get_schedules_by_script(request: Request):
+    try:
+        script_id = request.path_params["script_id"]
+        player_id = InputValidator.optional_int(request.query_params.get("player_id"))
+        schedules = await single_flight.do_async(
+            single_flight.request_key(
+                "/api/scripts/<int:script_id>/schedules", request.path_params, {"player_id": player_id}
+            ),
+            lambda: AsyncScheduleModel.get_schedules_by_script(script_id, player_id),
+        )
+        return success_response(request, schedules, "查询成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+async def stream_script_availability(request: Request):
+    """SSE：与 app.py 同名接口一致；每条连接只占一个协程，不受 SSE_MAX_STREAMS_PER_PROCESS 限制。"""
+    try:
+        script_id = InputValidator.validate_id(request.path_params["script_id"], "剧本ID")
+    except Exception as e:
+        return error_response(str(e))
+    return StreamingResponse(
+        availability_stream_async.stream(script_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ==================== 锁位 ====================
+
+
+async def create_lock(request: Request):
+    try:
+        payload = _verify_request_token(request)
+    except PermissionError as e:
+        return error_response(str(e), 401)
+    try:
+        user = await _get_user_role_ref(payload["user_id"])
+        if user.get("Role") != "player":
+            return error_response("只有玩家可以锁位", 403)
+        if not user.get("Ref_ID"):
+            return error_response("用户信息不完整", 400)
+
+        data = await _read_json(request)
+        schedule_id = data.get("schedule_id")
+        if not schedule_id:
+            return error_response("缺少场次ID", 400)
+
+        lock_id = await AsyncLockModel.create_lock(int(user["Ref_ID"]), int(schedule_id))
+        return success_response(request, {"lock_id": lock_id}, "锁位成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+async def cancel_lock(request: Request):
+    try:
+        payload = _verify_request_token(request)
+    except PermissionError as e:
+        return error_response(str(e), 401)
+    try:
+        user = await _get_user_role_ref(payload["user_id"])
+        if user.get("Role") != "player":
+            return error_response("只有玩家可以取消锁位", 403)
+        if not user.get("Ref_ID"):
+            return error_response("用户信息不完整", 400)
+        await AsyncLockModel.cancel_lock(request.path_params["lock_id"], int(user["Ref_ID"]))
+        return success_response(request, None, "取消成功")
+    except Exception as e:
+        return error_response(str(e))
+
+
+# ==================== 请求指标 ====================
+
+
+class MetricsMiddleware:
+    """原生路由的请求指标，口径与 app.py 一致；回落到 Flask 的请求由 Flask 自己统计，SSE 长连接不统计。"""
+
+    def __init__(self, app, routes, unmetered=()):
+        self.app = app
+        self.routes = [r for r in routes if isinstance(r, Route)]
+        self.unmetered = set(unmetered)
+
+    def _route_of(self, scope) -> str | None:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                # 转成 Flask 的路由模板写法，两种部署方式的指标标签相同
+                return re.sub(r"\{(\w+):(\w+)\}", r"<\2:\1>", route.path)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        route = self._route_of(scope) if scope["type"] == "http" else None
+        if route is None or route in self.unmetered:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        metrics.request_started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            mongo_seconds = metrics.request_finished()
+            metrics.observe_request(scope["method"], route, status, time.perf_counter() - started, mongo_seconds)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    yield
+    await availability_stream_async.close()
+    await mongo_async.close()
+    await redis_async.close()
+
+
+routes = [
+    Route("/api/scripts/{script_id:int}/schedules", get_schedules_by_script, methods=["GET"]),
+    Route("/api/scripts/{script_id:int}/availability/stream", stream_script_availability, methods=["GET"]),
+    Route("/api/locks", create_lock, methods=["POST"]),
+    Route("/api/locks/{lock_id:int}/cancel", cancel_lock, methods=["POST"]),
+    # 其余接口交给 Flask（在线程池中执行）
+    Mount("/", app=WSGIMiddleware(flask_app)),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+        Middleware(
+            MetricsMiddleware, routes=routes, unmetered={"/api/scripts/<int:script_id>/availability/stream"}
+        ),
+    ],
+    lifespan=lifespan,
+)
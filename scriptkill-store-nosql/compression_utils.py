@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+JSON 响应压缩：超过阈值的响应体按 Accept-Encoding 协商使用 br（安装了 brotli 时）或 gzip。
+
+列表接口每行都重复 Script_Title / Room_Name / DM_Name 等字段，压缩比通常在 5~10 倍。
+相同响应体（报表缓存命中、热门列表等）的压缩结果按摘要缓存在进程内，重复请求不再重复压缩。
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from nosql.config import (
+    RESPONSE_BROTLI_QUALITY,
+    RESPONSE_COMPRESSION_CACHE_ENTRIES,
+    RESPONSE_COMPRESSION_ENABLED,
+    RESPONSE_COMPRESSION_MIN_BYTES,
+    RESPONSE_GZIP_LEVEL,
+)
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时只使用 gzip
+    brotli = None
+
+_cache: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """解析 Accept-Encoding（含 q 值），返回 'br' / 'gzip' / None。"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    # mtime=0：相同输入得到相同输出，便于缓存与 ETag
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    key = (encoding, hashlib.sha1(body).digest())
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    compressed = _compress(body, encoding)
+    with _cache_lock:
+        _cache[key] = compressed
+        while len(_cache) > RESPONSE_COMPRESSION_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return compressed
+
+
+def decompress_body(body: bytes, encoding: str) -> bytes:
+    """compress_body 的逆操作（保存幂等响应等需要原始响应体的场景）。"""
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("brotli 未安装，无法解压")
+        return brotli.decompress(body)
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    return body
+
+
+def compress_response(response, accept_encoding: str):
+    """对 Flask Response 就地压缩（不满足条件时原样返回）。"""
+    if not RESPONSE_COMPRESSION_ENABLED or response.direct_passthrough:
+        return response
+    if "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -1,5 +1,17 @@
 import http from '@/utils/http'
 
+// 列表页只请求实际展示的列（后端 ?fields= 会转成 MongoDB 投影）
+const MY_ORDER_FIELDS = 'Order_ID,Script_Title,Start_Time,Room_Name,Amount,Pay_Status,Create_Time,Pay_Deadline'
+const ADMIN_ORDER_FIELDS = 'Order_ID,Player_ID,Script_Title,Start_Time,Room_Name,DM_Name,Amount,Pay_Status,Create_Time'
+const MY_LOCK_FIELDS = 'LockID,Schedule_ID,Script_Title,Start_Time,Room_Name,LockTime,ExpireTime,Status'
+const ADMIN_LOCK_FIELDS = 'LockID,Player_ID,Script_Title,Start_Time,Room_Name,DM_Name,LockTime,ExpireTime,Status'
+
+// 幂等键：同一次操作的重试复用同一个 key，后端直接返回首次成功的结果
+const newIdempotencyKey = () =>
+  (typeof crypto !== 'undefined' && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`
+
 // 认证相关API
 export const AuthAPI = {
   // 用户登录
@@ -68,13 +80,30 @@ export const ScheduleAPI = {
 // 订单相关API
 export const OrderAPI = {
   // 创建订单
-  create(scheduleId) {
-    return http.post('/orders', { schedule_id: scheduleId })
+  create(scheduleId, idempotencyKey = newIdempotencyKey()) {
+    return http.post('/orders', { schedule_id: scheduleId }, { headers: { 'Idempotency-Key': idempotencyKey } })
   },
 
-  // 支付订单
-  pay(orderId, channel = 1) {
-    return http.post(`/orders/${orderId}/pay`, { channel })
+  // 查询订单处理状态（秒杀模式下订单异步落库）
+  getStatus(orderId) {
+    return http.get(`/orders/${orderId}/status`)
+  },
+
+  // 等待排队中的订单落库完成（同步下单模式直接返回）
+  async waitUntilCreated(result, { interval = 300, tries = 20 } = {}) {
+    if (!result || result.status !== 'queued') return result
+    for (let i = 0; i < tries; i++) {
+      await new Promise((resolve) => setTimeout(resolve, interval))
+      const state = await OrderAPI.getStatus(result.order_id)
+      if (state.status === 'done') return state
+      if (state.status === 'failed') throw new Error(state.error || '订单创建失败')
+    }
+    return result
+  },
+
+  // 支付订单：每次支付操作一个 key（网络重试沿用同一个 key）；重复支付由服务端按订单状态拒绝
+  pay(orderId, channel = 1, idempotencyKey = newIdempotencyKey()) {
+    return http.post(`/orders/${orderId}/pay`, { channel }, { headers: { 'Idempotency-Key': idempotencyKey } })
   },
 
   // 取消订单
@@ -84,12 +113,12 @@ export const OrderAPI = {
 
   // 获取我的订单
   getMyOrders() {
-    return http.get('/my/orders')
+    return http.get('/my/orders', { params: { fields: MY_ORDER_FIELDS } })
   },
 
   // 获取所有订单（员工）
   getAdminOrders(params = {}) {
-    return http.get('/admin/orders', { params })
+    return http.get('/admin/orders', { params: { fields: ADMIN_ORDER_FIELDS, ...params } })
   }
 }
 
@@ -107,12 +136,12 @@ export const LockAPI = {
 
   // 获取我的锁位
   getMyLocks() {
-    return http.get('/my/locks')
+    return http.get('/my/locks', { params: { fields: MY_LOCK_FIELDS } })
   },
 
   // 获取所有锁位（员工）
   getAdminLocks(params = {}) {
-    return http.get('/admin/locks', { params })
+    return http.get('/admin/locks', { params: { fields: ADMIN_LOCK_FIELDS, ...params } })
   }
 }
 
@@ -161,3 +190,21 @@ export const ReportAPI = {
     return http.get('/admin/reports/dm-performance', { params })
   }
 }
+
+// 批量读取：多个 GET 合并为一次请求，按提交顺序返回各自的 data
+export const BatchAPI = {
+  // requests: [{ path: '/api/scripts/1', params: {...} }, ...]
+  async get(requests) {
+    const payload = requests.map(({ path, params = {} }) => ({
+      path,
+      params: Object.fromEntries(Object.entries(params).filter(([, v]) => v !== null && v !== undefined))
+    }))
+    const results = await http.post('/batch', { requests: payload })
+    return results.map((item) => {
+      if (item.status !== 200 || item.body?.code !== 200) {
+        throw new Error(item.body?.message || `请求失败: ${item.path}`)
+      }
+      return item.body.data
+    })
+  }
+}
@@ -37,6 +37,13 @@ http.interceptors.response.use(
   },
   (error) => {
     const authStore = useAuthStore()
+    const config = error.config
+
+    // 带幂等键的写请求在网络错误（无响应）时自动重试，重复提交由后端按 key 去重
+    if (!error.response && config?.headers?.['Idempotency-Key'] && (config.__retryCount || 0) < 2) {
+      config.__retryCount = (config.__retryCount || 0) + 1
+      return new Promise((resolve) => setTimeout(resolve, 300 * config.__retryCount)).then(() => http(config))
+    }
 
     if (error.response) {
       switch (error.response.status) {
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+生产环境多进程部署配置（Linux）
+
+启动：
+  pip install -r requirements-prod.txt
+  gunicorn -c gunicorn.conf.py
+
+说明：
+  - preload_app：master 先加载应用（建索引等只做一次），再 fork 出 worker，节省内存与启动时间
+  - Mongo/Redis 客户端、查询线程池在 fork 后的子进程中自动重建；post_fork 中再显式重置一次，
+    并在每个 worker 内启动后台线程（线程不会随 fork 复制）
+  - 可用环境变量覆盖：GUNICORN_BIND / GUNICORN_WORKERS / GUNICORN_THREADS / GUNICORN_KEEPALIVE / GUNICORN_TIMEOUT
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "app:create_app(start_background=False)"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+# 请求多为 Mongo/Redis I/O 等待，进程数按核数、每进程再开多线程
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+backlog = 2048
+
+# 定期回收 worker，抖动避免所有 worker 同时重启
+max_requests = 10000
+max_requests_jitter = 1000
+
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"
+
+
+def post_fork(server, worker):
+    from nosql.executor import reset_executor
+    from nosql.mongo import reset_client as reset_mongo_client
+    from nosql.redis_client import reset_client as reset_redis_client
+
+    reset_mongo_client()
+    reset_redis_client()
+    reset_executor()
+
+    from app import start_background_workers
+
+    start_background_workers()
+    server.log.info(f"worker {worker.pid} 已重置 Mongo/Redis 客户端并启动后台线程")
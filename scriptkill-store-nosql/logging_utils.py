@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+API 进程日志配置：请求线程只把日志放入内存队列，由后台 QueueListener 线程写文件/控制台。
+
+- 文件按大小轮转（LOG_MAX_BYTES / LOG_BACKUP_COUNT），LOG_FILE 为空则只输出到控制台
+- 相同内容的日志在 LOG_RATE_LIMIT_WINDOW_SECONDS 内最多输出 LOG_RATE_LIMIT_BURST 条，
+  其余只计数，在窗口结束后的下一条同内容日志上附带被抑制的条数（高峰期大量“该场次已满”等业务错误）
+- 队列满时直接丢弃并计数，绝不阻塞请求线程
+- 多进程部署（gunicorn）时多个进程轮转同一文件会互相干扰，建议 LOG_FILE 置空改由进程管理器收集标准输出
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from nosql.config import (
+    LOG_BACKUP_COUNT,
+    LOG_FILE,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_QUEUE_SIZE,
+    LOG_RATE_LIMIT_BURST,
+    LOG_RATE_LIMIT_WINDOW_SECONDS,
+)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_MAX_TRACKED_KEYS = 10000
+
+
+class RateLimitFilter(logging.Filter):
+    """按 (logger, 级别, 消息文本) 限流，窗口内超出 burst 的记录被丢弃。"""
+
+    def __init__(self, window_seconds: float, burst: int):
+        super().__init__()
+        self.window = float(window_seconds)
+        self.burst = int(burst)
+        self._lock = threading.Lock()
+        # key -> [窗口起点, 窗口内已输出条数, 被抑制条数]
+        self._state: Dict[Tuple[str, int, str], List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or self.window <= 0:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            st = self._state.get(key)
+            if st is None or now - st[0] >= self.window:
+                suppressed = int(st[2]) if st else 0
+                if len(self._state) >= _MAX_TRACKED_KEYS:
+                    self._state.clear()
+                self._state[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.getMessage()}（前 {self.window:g}s 内另有 {suppressed} 条相同日志被抑制）"
+                    record.args = None
+                return True
+            if st[1] < self.burst:
+                st[1] += 1
+                return True
+            st[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志而不是阻塞/报错。"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_sinks: List[logging.Handler] = []
+
+
+def _start_listener() -> None:
+    global _listener
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_sinks, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    # 监听线程不会随 fork 复制：子进程换一个新队列并重新启动监听线程
+    if _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _start_listener()
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+
+
+def setup_logging() -> None:
+    """配置根 logger（重复调用无副作用）。"""
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    if LOG_FILE:
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        file_handler.setFormatter(formatter)
+        _sinks.append(file_handler)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    _sinks.append(stream_handler)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT_WINDOW_SECONDS, LOG_RATE_LIMIT_BURST))
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_queue_handler)
+
+    _start_listener()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_restart_after_fork)
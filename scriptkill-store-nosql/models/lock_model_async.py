@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+锁位模型 - 异步版本（ASGI 模式使用），校验规则与提示信息与 LockModel 保持一致
+"""
+
+from __future__ import annotations
+
+import logging
+
+from nosql.mongo_async import col
+from nosql.seat_lock_service_async import cancel_lock as redis_cancel_lock
+from nosql.seat_lock_service_async import create_lock as redis_create_lock
+from nosql.seat_lock_service_async import resolve_lock
+from security_utils import InputValidator
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLockModel:
+    @staticmethod
+    async def create_lock(player_id: int, schedule_id: int, lock_minutes: int = 15) -> int:
+        try:
+            player_id = InputValidator.validate_id(player_id, "玩家ID")
+            schedule_id = InputValidator.validate_id(schedule_id, "场次ID")
+
+            # 场次校验、防重复、占座都在 Redis 原子完成；lock_records 由锁位历史 Stream 批量写入
+            lock_id, _ = await redis_create_lock(int(player_id), int(schedule_id), lock_minutes)
+            return int(lock_id)
+        except Exception as e:
+            logger.error(f"创建锁位失败: {str(e)}")
+            raise
+
+    @staticmethod
+    async def cancel_lock(lock_id: int, player_id: int) -> bool:
+        try:
+            lock_id = InputValidator.validate_id(lock_id, "锁位ID")
+            player_id = InputValidator.validate_id(player_id, "玩家ID")
+
+            # 有效锁位以 Redis 为准：lock_records 为写后落库，可能尚未写入或状态滞后
+            owner = await resolve_lock(int(lock_id))
+            if owner is None:
+                # 升级前创建的锁位没有锁位号索引，从历史记录中取场次（状态仍以 Redis 为准）
+                lock = await col("lock_records").find_one({"_id": int(lock_id)}, {"Schedule_ID": 1, "Player_ID": 1})
+                if not lock:
+                    raise ValueError("锁位不存在或已失效")
+                owner = (int(lock["Schedule_ID"]), int(lock["Player_ID"]))
+            schedule_id, owner_id = owner
+            if owner_id != int(player_id):
+                raise ValueError("无权取消他人锁位")
+
+            # 只取消锁位号一致的锁位；状态变更（Status=2）随取消脚本写入锁位历史 Stream
+            ok = await redis_cancel_lock(int(player_id), schedule_id, int(lock_id))
+            if not ok:
+                # 已过期（由清理任务归还座位）、已取消或已转订单
+                raise ValueError("该锁位已失效或已过期")
+            return bool(ok)
+        except Exception as e:
+            logger.error(f"取消锁位失败: {str(e)}")
+            raise
@@ -7,12 +7,24 @@ from __future__ import annotations
 
 import logging
 import random
+import threading
+import uuid
+from collections import Counter
 from datetime import datetime
 from typing import List, Optional
 
-from nosql.mongo import col
+from pymongo import UpdateOne
+
+from nosql.config import ORDER_EXPIRE_BATCH, ORDER_EXPIRE_INTERVAL_SECONDS, ORDER_EXPIRER_LEASE_MS
+from nosql.leader import run_as_leader
+from nosql.metrics import inc as metric_inc
+from nosql.mongo import col, fields_projection
+from nosql.order_pipeline import admit as admit_order
+from nosql.order_pipeline import forget_buyers, get_status as get_queued_status, remember_buyer
+from nosql.pay_deadline import add_deadlines, claim_due, clear_deadlines, deadline_for
 from nosql.redis_client import get_redis
-from nosql.seat_lock_service import convert_lock_to_order, get_active_lock_id, release_seat, take_seat
+from nosql.seat_lock_service import convert_lock_to_order, get_active_lock_id, release_seat, release_seats, take_seat
+from nosql.unique_players import record_player
 from security_utils import InputValidator
 
 logger = logging.getLogger(__name__)
@@ -24,6 +36,26 @@ class OrderModel:
     STATUS_REFUNDED = 2
     STATUS_CANCELLED = 3
 
+    # 列表接口 ?fields= 允许选择的字段
+    LIST_FIELDS = frozenset(
+        {
+            "Order_ID",
+            "Player_ID",
+            "Schedule_ID",
+            "Amount",
+            "Pay_Status",
+            "Create_Time",
+            "Script_ID",
+            "Script_Title",
+            "Room_ID",
+            "Room_Name",
+            "DM_ID",
+            "DM_Name",
+            "Start_Time",
+            "Pay_Deadline",
+        }
+    )
+
     @staticmethod
     def _gen_id() -> int:
         return int(datetime.now().strftime("%Y%m%d%H%M%S")) + random.randint(1000, 9999)
@@ -58,6 +90,7 @@ class OrderModel:
 
             order_id = OrderModel._gen_id()
             now = datetime.now()
+            pay_deadline = deadline_for(sch, now)
             doc = {
                 "_id": int(order_id),
                 "Order_ID": int(order_id),
@@ -66,6 +99,7 @@ class OrderModel:
                 "Amount": actual_amount,
                 "Pay_Status": OrderModel.STATUS_UNPAID,
                 "Create_Time": now,
+                "Pay_Deadline": pay_deadline,
                 # 反范式字段（用于列表/报表）
                 "Script_ID": sch.get("Script_ID"),
                 "Script_Title": sch.get("Script_Title"),
@@ -76,19 +110,16 @@ class OrderModel:
                 "Start_Time": sch.get("Start_Time"),
             }
             col("orders").insert_one(doc)
+            add_deadlines([(int(order_id), pay_deadline)])
+            # 场次反范式计数（报表直接读取，避免 $lookup）
+            col("schedules").update_one({"_id": int(schedule_id)}, {"$inc": {"Booked_Count": 1}})
 
             if lock_id is not None:
+                # 锁位记录转“已转订单”由锁位历史 Stream 批量写入 Mongo
                 convert_lock_to_order(int(player_id), int(schedule_id))
-                # Mongo：锁位状态转“已转订单”
-                col("lock_records").update_many(
-                    {
-                        "Schedule_ID": int(schedule_id),
-                        "Player_ID": int(player_id),
-                        "Status": 0,
-                        "ExpireTime": {"$gt": now},
-                    },
-                    {"$set": {"Status": 1}},
-                )
+
+            record_player(int(player_id), sch.get("Script_ID"), sch.get("DM_ID"), now)
+            remember_buyer(int(schedule_id), int(player_id))
 
             logger.info(f"订单创建成功: Order_ID={order_id}")
             return int(order_id)
@@ -103,6 +134,39 @@ class OrderModel:
             logger.error(f"创建订单失败: {str(e)}")
             raise
 
+    @staticmethod
+    def enqueue_order(player_id: int, schedule_id: int) -> int:
+        """秒杀模式下单：Redis 原子完成去重 + 占座并入队，返回订单号（稍后由 worker 落库）。"""
+        try:
+            player_id = InputValidator.validate_id(player_id, "玩家ID")
+            schedule_id = InputValidator.validate_id(schedule_id, "场次ID")
+            order_id = admit_order(int(player_id), int(schedule_id))
+            logger.info(f"订单已排队: Order_ID={order_id}")
+            return order_id
+        except Exception as e:
+            logger.error(f"创建订单失败: {str(e)}")
+            raise
+
+    @staticmethod
+    def get_order_status(order_id: int, player_id: int) -> dict:
+        """订单处理状态：queued（排队落库中）/ done（已落库）/ failed。"""
+        try:
+            order_id = InputValidator.validate_id(order_id, "订单ID")
+            player_id = InputValidator.validate_id(player_id, "玩家ID")
+
+            status = get_queued_status(int(order_id))
+            if status is None:
+                order = col("orders").find_one({"_id": int(order_id)}, {"Player_ID": 1})
+                if not order:
+                    raise ValueError("订单不存在")
+                status = {"order_id": int(order_id), "status": "done", "player_id": int(order.get("Player_ID"))}
+            if int(status["player_id"]) != int(player_id):
+                raise ValueError("无权查看他人订单")
+            return {"order_id": int(order_id), "status": status["status"], "error": status.get("error")}
+        except Exception as e:
+            logger.error(f"查询订单状态失败: {str(e)}")
+            raise
+
     @staticmethod
     def pay_order(order_id: int, channel: int = 1) -> int:
         try:
@@ -116,11 +180,24 @@ class OrderModel:
                 raise ValueError("订单已支付，无需重复支付")
             if int(order.get("Pay_Status") or 0) == OrderModel.STATUS_CANCELLED:
                 raise ValueError("订单已取消，无法支付")
+            if order.get("Pay_Deadline") and order["Pay_Deadline"] <= datetime.now():
+                raise ValueError("订单已超过支付时限")
 
             trans_id = OrderModel._gen_id()
             now = datetime.now()
 
-            col("orders").update_one({"_id": int(order_id)}, {"$set": {"Pay_Status": OrderModel.STATUS_PAID}})
+            # 条件更新：与重复支付、超时自动取消并发时只有一方生效
+            res = col("orders").update_one(
+                {
+                    "_id": int(order_id),
+                    "Pay_Status": {"$nin": [OrderModel.STATUS_PAID, OrderModel.STATUS_CANCELLED]},
+                },
+                {"$set": {"Pay_Status": OrderModel.STATUS_PAID}},
+            )
+            if res.modified_count == 0:
+                raise ValueError("订单已支付或已取消")
+            clear_deadlines([int(order_id)])
+            col("schedules").update_one({"_id": int(order.get("Schedule_ID"))}, {"$inc": {"Paid_Count": 1}})
             col("transactions").insert_one(
                 {
                     "_id": int(trans_id),
@@ -134,8 +211,11 @@ class OrderModel:
                     # 报表过滤字段
                     "DM_ID": order.get("DM_ID"),
                     "Schedule_ID": order.get("Schedule_ID"),
+                    "Script_ID": order.get("Script_ID"),
+                    "Room_ID": order.get("Room_ID"),
                 }
             )
+            record_player(int(order.get("Player_ID")), order.get("Script_ID"), order.get("DM_ID"), now)
             return int(trans_id)
         except Exception as e:
             logger.error(f"支付订单失败: {str(e)}")
@@ -157,20 +237,86 @@ class OrderModel:
             if int(order.get("Pay_Status") or 0) != OrderModel.STATUS_UNPAID:
                 raise ValueError("仅未支付订单可取消")
 
-            col("orders").update_one({"_id": int(order_id)}, {"$set": {"Pay_Status": OrderModel.STATUS_CANCELLED}})
+            res = col("orders").update_one(
+                {"_id": int(order_id), "Pay_Status": OrderModel.STATUS_UNPAID},
+                {"$set": {"Pay_Status": OrderModel.STATUS_CANCELLED}},
+            )
+            if res.modified_count == 0:
+                raise ValueError("仅未支付订单可取消")
+            col("schedules").update_one({"_id": int(order.get("Schedule_ID"))}, {"$inc": {"Booked_Count": -1}})
             release_seat(int(order.get("Schedule_ID")))
+            forget_buyers([(int(order.get("Schedule_ID")), int(player_id))])
+            clear_deadlines([int(order_id)])
             return True
         except Exception as e:
             logger.error(f"取消订单失败: {str(e)}")
             raise
 
     @staticmethod
-    def get_orders_by_player(player_id: int) -> List[dict]:
+    def cancel_overdue_orders(limit: int = 500) -> int:
+        """
+        批量取消超过支付时限仍未支付的订单，返回本次归还座位的订单数。
+        条件更新（Pay_Status=0 且已过截止时间）保证与支付并发时只有一方生效；
+        Seat_Release_Pending 标记已取消但尚未归还座位的订单。归还前先以条件更新把标记换成本次的认领令牌，
+        只为认领到的订单扣减 Booked_Count、归还座位：中途失败最多少归还（可用 rebuild_schedule_counters 修复），
+        不会重复归还导致超卖。
+        """
+        try:
+            order_ids = claim_due(limit)
+            if not order_ids:
+                return 0
+
+            now = datetime.now()
+            col("orders").update_many(
+                {"_id": {"$in": order_ids}, "Pay_Status": OrderModel.STATUS_UNPAID, "Pay_Deadline": {"$lte": now}},
+                {
+                    "$set": {
+                        "Pay_Status": OrderModel.STATUS_CANCELLED,
+                        "Cancel_Time": now,
+                        "Cancel_Reason": "pay_timeout",
+                        "Seat_Release_Pending": True,
+                    }
+                },
+            )
+            # 认领：每个订单只会被一次执行认领到（含之前中断遗留的待归还订单）
+            token = uuid.uuid4().hex
+            col("orders").update_many(
+                {"_id": {"$in": order_ids}, "Seat_Release_Pending": True},
+                {"$unset": {"Seat_Release_Pending": ""}, "$set": {"Seat_Release_Claim": token}},
+            )
+            rows = list(
+                col("orders").find(
+                    {"_id": {"$in": order_ids}, "Seat_Release_Claim": token}, {"Schedule_ID": 1, "Player_ID": 1}
+                )
+            )
+            if rows:
+                per_schedule = Counter(int(row["Schedule_ID"]) for row in rows)
+                col("schedules").bulk_write(
+                    [UpdateOne({"_id": sid}, {"$inc": {"Booked_Count": -n}}) for sid, n in per_schedule.items()],
+                    ordered=False,
+                )
+                release_seats(per_schedule)
+                forget_buyers([(int(row["Schedule_ID"]), int(row["Player_ID"])) for row in rows])
+                col("orders").update_many(
+                    {"_id": {"$in": [row["_id"] for row in rows]}}, {"$unset": {"Seat_Release_Claim": ""}}
+                )
+                metric_inc("orders_auto_cancelled_total", len(rows))
+                logger.info(f"超时未支付订单已取消: {len(rows)} 个")
+
+            # 已支付/已取消/已处理的订单一并移出延迟队列
+            clear_deadlines(order_ids)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"超时订单取消失败: {str(e)}")
+            raise
+
+    @staticmethod
+    def get_orders_by_player(player_id: int, fields: Optional[List[str]] = None) -> List[dict]:
         try:
             player_id = InputValidator.validate_id(player_id, "玩家ID")
             orders = list(
                 col("orders")
-                .find({"Player_ID": int(player_id)}, {"_id": 0})
+                .find({"Player_ID": int(player_id)}, fields_projection(fields, {"_id": 0}))
                 .sort("Create_Time", -1)
             )
             return orders if orders else []
@@ -179,14 +325,27 @@ class OrderModel:
             raise
 
     @staticmethod
-    def get_all_orders(dm_id: Optional[int] = None) -> List[dict]:
+    def get_all_orders(dm_id: Optional[int] = None, fields: Optional[List[str]] = None) -> List[dict]:
         try:
             query = {}
             if dm_id is not None:
                 query["DM_ID"] = int(dm_id)
-            orders = list(col("orders").find(query, {"_id": 0}).sort("Create_Time", -1))
+            orders = list(col("orders").find(query, fields_projection(fields, {"_id": 0})).sort("Create_Time", -1))
             return orders if orders else []
         except Exception as e:
             logger.error(f"查询订单列表失败: {str(e)}")
             raise
 
+
+def run_order_expirer(stop: Optional[threading.Event] = None) -> None:
+    """
+    超时未支付订单取消循环：所有进程竞争同一 leader 租约，只有 leader 执行 cancel_overdue_orders。
+    阻塞运行，直到 stop 被设置。
+    """
+    run_as_leader(
+        "order_expirer",
+        lambda: OrderModel.cancel_overdue_orders(limit=ORDER_EXPIRE_BATCH),
+        interval=ORDER_EXPIRE_INTERVAL_SECONDS,
+        lease_ttl_ms=ORDER_EXPIRER_LEASE_MS,
+        stop=stop,
+    )
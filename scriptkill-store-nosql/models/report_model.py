@@ -9,7 +9,13 @@ import logging
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
+from nosql.executor import run_parallel, run_partitioned
 from nosql.mongo import col
+from nosql.report_cache import cached_report
+from nosql.unique_players import count_per_day, count_unique
+from nosql.unique_players import day_range as uv_day_range
 
 logger = logging.getLogger(__name__)
 
@@ -31,8 +37,34 @@ def _week_start_monday(dt: datetime) -> datetime:
     return base - timedelta(days=base.weekday())
 
 
+_TIMESERIES_UNITS = ("day", "week", "month")
+# split_by -> (分组字段, 名称字段)
+_TIMESERIES_SPLITS = {
+    "script": ("Script_ID", "Script_Title"),
+    "room": ("Room_ID", "Room_Name"),
+    "dm": ("DM_ID", "DM_Name"),
+}
+
+
+def _bucket_start(dt: datetime, unit: str) -> datetime:
+    if unit == "month":
+        return _month_start(dt)
+    if unit == "week":
+        return _week_start_monday(dt)
+    return _day_start(dt)
+
+
+def _next_bucket(dt: datetime, unit: str) -> datetime:
+    if unit == "month":
+        return (dt.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if unit == "week":
+        return dt + timedelta(days=7)
+    return dt + timedelta(days=1)
+
+
 class ReportModel:
     @staticmethod
+    @cached_report("dashboard", ttl=30)
     def get_dashboard_stats(dm_id: Optional[int] = None) -> dict:
         try:
             now = datetime.now()
@@ -52,15 +84,10 @@ class ReportModel:
                 row = next(iter(col("transactions").aggregate(pipeline)), None) or {}
                 return float(row.get("revenue") or 0), int(row.get("orders") or 0)
 
-            today_revenue, today_orders = _sum_count(today0)
-            week_revenue, week_orders = _sum_count(week0)
-            month_revenue, month_orders = _sum_count(month0)
-
             # 活跃锁位
             lock_query: Dict[str, Any] = {"Status": 0, "ExpireTime": {"$gt": now}}
             if dm_id is not None:
                 lock_query["DM_ID"] = int(dm_id)
-            active_locks = col("lock_records").count_documents(lock_query)
 
             # 未来 7 天上座率
             sch_query: Dict[str, Any] = {
@@ -69,68 +96,94 @@ class ReportModel:
             }
             if dm_id is not None:
                 sch_query["DM_ID"] = int(dm_id)
-            schedules = list(col("schedules").find(sch_query, {"Schedule_ID": 1, "Max_Players": 1}))
-            schedule_ids = [int(s["Schedule_ID"]) for s in schedules]
-            capacity = sum(int(s.get("Max_Players") or 0) for s in schedules)
-            occupied = 0
-            if schedule_ids:
-                occupied += col("orders").count_documents(
-                    {"Schedule_ID": {"$in": schedule_ids}, "Pay_Status": {"$in": [0, 1]}}
-                )
-                occupied += col("lock_records").count_documents(
-                    {"Schedule_ID": {"$in": schedule_ids}, "Status": 0, "ExpireTime": {"$gt": now}}
-                )
-            occupancy_rate = round((occupied / capacity) * 100, 2) if capacity > 0 else 0.0
+
+            def _occupancy() -> float:
+                schedules = list(col("schedules").find(sch_query, {"Schedule_ID": 1, "Max_Players": 1}))
+                schedule_ids = [int(s["Schedule_ID"]) for s in schedules]
+                capacity = sum(int(s.get("Max_Players") or 0) for s in schedules)
+                occupied = 0
+                if schedule_ids:
+                    occupied += col("orders").count_documents(
+                        {"Schedule_ID": {"$in": schedule_ids}, "Pay_Status": {"$in": [0, 1]}}
+                    )
+                    occupied += col("lock_records").count_documents(
+                        {"Schedule_ID": {"$in": schedule_ids}, "Status": 0, "ExpireTime": {"$gt": now}}
+                    )
+                return round((occupied / capacity) * 100, 2) if capacity > 0 else 0.0
 
             # 最近订单（10条）
             order_query: Dict[str, Any] = {}
             if dm_id is not None:
                 order_query["DM_ID"] = int(dm_id)
-            recent_orders = list(
-                col("orders")
-                .find(
-                    order_query,
-                    {
-                        "_id": 0,
-                        "Order_ID": 1,
-                        "Amount": 1,
-                        "Pay_Status": 1,
-                        "Create_Time": 1,
-                        "Script_Title": 1,
-                        "Start_Time": 1,
-                        "Room_Name": 1,
-                        "DM_ID": 1,
-                        "DM_Name": 1,
-                    },
+
+            def _recent_orders() -> List[dict]:
+                return list(
+                    col("orders")
+                    .find(
+                        order_query,
+                        {
+                            "_id": 0,
+                            "Order_ID": 1,
+                            "Amount": 1,
+                            "Pay_Status": 1,
+                            "Create_Time": 1,
+                            "Script_Title": 1,
+                            "Start_Time": 1,
+                            "Room_Name": 1,
+                            "DM_ID": 1,
+                            "DM_Name": 1,
+                        },
+                    )
+                    .sort("Create_Time", -1)
+                    .limit(10)
                 )
-                .sort("Create_Time", -1)
-                .limit(10)
-            )
 
             # 未来场次（10条）
             upcoming_query: Dict[str, Any] = {"Start_Time": {"$gt": now}, "Status": {"$in": [0, 1]}}
             if dm_id is not None:
                 upcoming_query["DM_ID"] = int(dm_id)
-            upcoming_schedules = list(
-                col("schedules")
-                .find(
-                    upcoming_query,
-                    {
-                        "_id": 0,
-                        "Schedule_ID": 1,
-                        "Start_Time": 1,
-                        "Real_Price": 1,
-                        "Room_Name": 1,
-                        "DM_ID": 1,
-                        "DM_Name": 1,
-                        "Script_ID": 1,
-                        "Script_Title": 1,
-                        "Max_Players": 1,
-                    },
+
+            def _upcoming_schedules() -> List[dict]:
+                return list(
+                    col("schedules")
+                    .find(
+                        upcoming_query,
+                        {
+                            "_id": 0,
+                            "Schedule_ID": 1,
+                            "Start_Time": 1,
+                            "Real_Price": 1,
+                            "Room_Name": 1,
+                            "DM_ID": 1,
+                            "DM_Name": 1,
+                            "Script_ID": 1,
+                            "Script_Title": 1,
+                            "Max_Players": 1,
+                        },
+                    )
+                    .sort("Start_Time", 1)
+                    .limit(10)
                 )
-                .sort("Start_Time", 1)
-                .limit(10)
+
+            # 各项查询互不依赖：并行执行，总耗时约等于最慢的一项
+            res = run_parallel(
+                {
+                    "today": lambda: _sum_count(today0),
+                    "week": lambda: _sum_count(week0),
+                    "month": lambda: _sum_count(month0),
+                    "active_locks": lambda: col("lock_records").count_documents(lock_query),
+                    "occupancy_rate": _occupancy,
+                    "recent_orders": _recent_orders,
+                    "upcoming_schedules": _upcoming_schedules,
+                }
             )
+            today_revenue, today_orders = res["today"]
+            week_revenue, week_orders = res["week"]
+            month_revenue, month_orders = res["month"]
+            active_locks = res["active_locks"]
+            occupancy_rate = res["occupancy_rate"]
+            recent_orders = res["recent_orders"]
+            upcoming_schedules = res["upcoming_schedules"]
 
             return {
                 "today_revenue": round(today_revenue, 2),
@@ -149,103 +202,96 @@ class ReportModel:
             raise
 
     @staticmethod
+    @cached_report("top_scripts", ttl=300)
     def get_top_scripts(
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         limit: int = 5,
         dm_id: Optional[int] = None,
     ) -> List[dict]:
+        """
+        热门剧本：有明确起止日期时按自然月切分、各分区并行聚合后在 Python 中合并；
+        分区内不做 $limit（Top-K 必须在合并后取，否则结果不准确）。
+        """
         try:
-            match: Dict[str, Any] = {"Script_ID": {"$ne": None}}
+            base_match: Dict[str, Any] = {"Script_ID": {"$ne": None}}
             if dm_id is not None:
-                match["DM_ID"] = int(dm_id)
-            if start_date:
-                match["Create_Time"] = {**match.get("Create_Time", {}), "$gte": _parse_date(start_date)}
-            if end_date:
-                match["Create_Time"] = {**match.get("Create_Time", {}), "$lte": _parse_date(end_date) + timedelta(days=1)}
+                base_match["DM_ID"] = int(dm_id)
+            start_dt = _parse_date(start_date) if start_date else None
+            end_dt = (_parse_date(end_date) + timedelta(days=1)) if end_date else None
 
-            pipeline = [
-                {"$match": match},
-                {
-                    "$group": {
-                        "_id": "$Script_ID",
-                        "Title": {"$first": "$Script_Title"},
-                        "order_count": {
-                            "$sum": {"$cond": [{"$in": ["$Pay_Status", [0, 1]]}, 1, 0]}
-                        },
-                        "total_revenue": {
-                            "$sum": {"$cond": [{"$eq": ["$Pay_Status", 1]}, "$Amount", 0]}
-                        },
-                    }
-                },
-                {"$sort": {"order_count": -1, "total_revenue": -1}},
-                {"$limit": int(limit)},
-            ]
-            rows = list(col("orders").aggregate(pipeline))
-            results = []
-            for r in rows:
-                results.append(
+            def _aggregate(lo: Optional[datetime], hi: Optional[datetime]) -> List[dict]:
+                match = dict(base_match)
+                time_cond: Dict[str, Any] = {}
+                if lo:
+                    time_cond["$gte"] = lo
+                if hi:
+                    time_cond["$lt"] = hi
+                if time_cond:
+                    match["Create_Time"] = time_cond
+                pipeline = [
+                    {"$match": match},
                     {
-                        "Script_ID": int(r["_id"]),
-                        "Title": r.get("Title") or "",
-                        "order_count": int(r.get("order_count") or 0),
-                        "total_revenue": float(r.get("total_revenue") or 0),
-                    }
-                )
-            return results
+                        "$group": {
+                            "_id": "$Script_ID",
+                            "Title": {"$first": "$Script_Title"},
+                            "order_count": {
+                                "$sum": {"$cond": [{"$in": ["$Pay_Status", [0, 1]]}, 1, 0]}
+                            },
+                            "total_revenue": {
+                                "$sum": {"$cond": [{"$eq": ["$Pay_Status", 1]}, "$Amount", 0]}
+                            },
+                        }
+                    },
+                ]
+                return list(col("orders").aggregate(pipeline))
+
+            if start_dt and end_dt and start_dt < end_dt:
+                partitions = run_partitioned(start_dt, end_dt, _aggregate)
+            else:
+                partitions = [_aggregate(start_dt, end_dt)]
+
+            merged: Dict[int, dict] = {}
+            for rows in partitions:
+                for r in rows:
+                    sid = int(r["_id"])
+                    acc = merged.setdefault(sid, {"Script_ID": sid, "Title": "", "order_count": 0, "total_revenue": 0.0})
+                    acc["Title"] = acc["Title"] or r.get("Title") or ""
+                    acc["order_count"] += int(r.get("order_count") or 0)
+                    acc["total_revenue"] += float(r.get("total_revenue") or 0)
+
+            results = sorted(merged.values(), key=lambda x: (x["order_count"], x["total_revenue"]), reverse=True)
+            return results[: int(limit)]
         except Exception as e:
             logger.error(f"查询热门剧本失败: {str(e)}")
             raise
 
     @staticmethod
+    @cached_report("room_utilization", ttl=300)
     def get_room_utilization(
         start_date: Optional[str] = None, end_date: Optional[str] = None, dm_id: Optional[int] = None
     ) -> List[dict]:
+        """
+        房间利用率：直接对 schedules 做一次 $group，已付订单数取场次上维护的 Paid_Count（无 $lookup）。
+        计数缺失/漂移时用 tools/rebuild_schedule_counters.py 重建。
+        """
         try:
             match: Dict[str, Any] = {}
             if start_date:
                 match["Start_Time"] = {**match.get("Start_Time", {}), "$gte": _parse_date(start_date)}
             if end_date:
-                match["Start_Time"] = {**match.get("Start_Time", {}), "$lte": _parse_date(end_date) + timedelta(days=1)}
+                match["Start_Time"] = {**match.get("Start_Time", {}), "$lt": _parse_date(end_date) + timedelta(days=1)}
             if dm_id is not None:
                 match["DM_ID"] = int(dm_id)
 
             pipeline = [
                 {"$match": match},
-                {
-                    "$lookup": {
-                        "from": "orders",
-                        "let": {"sid": "$Schedule_ID"},
-                        "pipeline": [
-                            {
-                                "$match": {
-                                    "$expr": {
-                                        "$and": [
-                                            {"$eq": ["$Schedule_ID", "$$sid"]},
-                                            {"$eq": ["$Pay_Status", 1]},
-                                        ]
-                                    }
-                                }
-                            },
-                            {"$project": {"_id": 0, "Order_ID": 1}},
-                        ],
-                        "as": "paid_orders",
-                    }
-                },
-                {
-                    "$project": {
-                        "Room_ID": 1,
-                        "Room_Name": 1,
-                        "Status": 1,
-                        "paid_count": {"$size": "$paid_orders"},
-                    }
-                },
                 {
                     "$group": {
                         "_id": {"Room_ID": "$Room_ID", "Room_Name": "$Room_Name"},
                         "total_schedules": {"$sum": 1},
                         "completed_schedules": {"$sum": {"$cond": [{"$eq": ["$Status", 1]}, 1, 0]}},
-                        "paid_orders": {"$sum": "$paid_count"},
+                        "paid_orders": {"$sum": {"$ifNull": ["$Paid_Count", 0]}},
                     }
                 },
                 {"$sort": {"paid_orders": -1, "completed_schedules": -1, "total_schedules": -1}},
@@ -272,6 +318,7 @@ class ReportModel:
             raise
 
     @staticmethod
+    @cached_report("lock_conversion", ttl=120)
     def get_lock_conversion_rate(
         start_date: Optional[str] = None, end_date: Optional[str] = None, dm_id: Optional[int] = None
     ) -> dict:
@@ -282,27 +329,75 @@ class ReportModel:
             if end_date:
                 match_locks["LockTime"] = {
                     **match_locks.get("LockTime", {}),
-                    "$lte": _parse_date(end_date) + timedelta(days=1),
+                    "$lt": _parse_date(end_date) + timedelta(days=1),
                 }
             if dm_id is not None:
                 match_locks["DM_ID"] = int(dm_id)
 
-            total_locks = col("lock_records").count_documents(match_locks)
-            converted_locks = col("lock_records").count_documents({**match_locks, "Status": 1})
-
             match_orders: Dict[str, Any] = {}
             if start_date:
                 match_orders["Create_Time"] = {**match_orders.get("Create_Time", {}), "$gte": _parse_date(start_date)}
             if end_date:
                 match_orders["Create_Time"] = {
                     **match_orders.get("Create_Time", {}),
-                    "$lte": _parse_date(end_date) + timedelta(days=1),
+                    "$lt": _parse_date(end_date) + timedelta(days=1),
                 }
             if dm_id is not None:
                 match_orders["DM_ID"] = int(dm_id)
 
-            total_orders = col("orders").count_documents(match_orders)
-            paid_orders = col("orders").count_documents({**match_orders, "Pay_Status": 1})
+            now = datetime.now()
+            lock_pipeline = [
+                {"$match": match_locks},
+                {
+                    "$group": {
+                        "_id": None,
+                        "total": {"$sum": 1},
+                        "converted": {"$sum": {"$cond": [{"$eq": ["$Status", 1]}, 1, 0]}},
+                        "cancelled": {"$sum": {"$cond": [{"$eq": ["$Status", 2]}, 1, 0]}},
+                        # 已过期：清理任务已标记（Status=3），或仍为锁定但已超过 ExpireTime
+                        "expired": {
+                            "$sum": {
+                                "$cond": [
+                                    {
+                                        "$or": [
+                                            {"$eq": ["$Status", 3]},
+                                            {"$and": [{"$eq": ["$Status", 0]}, {"$lte": ["$ExpireTime", now]}]},
+                                        ]
+                                    },
+                                    1,
+                                    0,
+                                ]
+                            }
+                        },
+                    }
+                },
+            ]
+            order_pipeline = [
+                {"$match": match_orders},
+                {
+                    "$group": {
+                        "_id": None,
+                        "total": {"$sum": 1},
+                        "paid": {"$sum": {"$cond": [{"$eq": ["$Pay_Status", 1]}, 1, 0]}},
+                    }
+                },
+            ]
+
+            # 每个集合只扫描一次，两个集合并行
+            res = run_parallel(
+                {
+                    "locks": lambda: next(iter(col("lock_records").aggregate(lock_pipeline)), None) or {},
+                    "orders": lambda: next(iter(col("orders").aggregate(order_pipeline)), None) or {},
+                }
+            )
+            lock_row = res["locks"]
+            order_row = res["orders"]
+            total_locks = int(lock_row.get("total") or 0)
+            converted_locks = int(lock_row.get("converted") or 0)
+            cancelled_locks = int(lock_row.get("cancelled") or 0)
+            expired_locks = int(lock_row.get("expired") or 0)
+            total_orders = int(order_row.get("total") or 0)
+            paid_orders = int(order_row.get("paid") or 0)
 
             lock_to_order_rate = round((converted_locks * 100.0 / total_locks), 2) if total_locks > 0 else 0
             order_to_pay_rate = round((paid_orders * 100.0 / total_orders), 2) if total_orders > 0 else 0
@@ -312,6 +407,8 @@ class ReportModel:
                 "converted_locks": int(converted_locks),
                 "total_orders": int(total_orders),
                 "paid_orders": int(paid_orders),
+                "cancelled_locks": cancelled_locks,
+                "expired_locks": expired_locks,
                 "lock_to_order_rate": lock_to_order_rate,
                 "order_to_pay_rate": order_to_pay_rate,
             }
@@ -320,7 +417,12 @@ class ReportModel:
             raise
 
     @staticmethod
+    @cached_report("dm_performance", ttl=300)
     def get_dm_performance(start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
+        """
+        DM 业绩：按 DM_ID 分组的 4 个固定聚合（场次/订单/流水/活跃锁位）并行执行后在 Python 中合并。
+        往返次数与 DM 数量无关（原实现为每个 DM 5 次往返）。
+        """
         try:
             dms = list(col("dms").find({}, {"_id": 0}))
             if not dms:
@@ -330,48 +432,57 @@ class ReportModel:
             start_dt = _parse_date(start_date) if start_date else None
             end_dt = (_parse_date(end_date) + timedelta(days=1)) if end_date else None
 
-            results = []
-            for dm in dms:
-                dm_id = int(dm.get("DM_ID") or 0)
-                if dm_id <= 0:
-                    continue
-
-                sch_match: Dict[str, Any] = {"DM_ID": dm_id}
+            def _range(field: str) -> Dict[str, Any]:
+                cond: Dict[str, Any] = {}
                 if start_dt:
-                    sch_match["Start_Time"] = {**sch_match.get("Start_Time", {}), "$gte": start_dt}
+                    cond["$gte"] = start_dt
                 if end_dt:
-                    sch_match["Start_Time"] = {**sch_match.get("Start_Time", {}), "$lt": end_dt}
+                    cond["$lt"] = end_dt
+                return {field: cond} if cond else {}
 
-                schedule_count = col("schedules").count_documents(sch_match)
-
-                order_match: Dict[str, Any] = {"DM_ID": dm_id}
-                if start_dt:
-                    order_match["Start_Time"] = {**order_match.get("Start_Time", {}), "$gte": start_dt}
-                if end_dt:
-                    order_match["Start_Time"] = {**order_match.get("Start_Time", {}), "$lt": end_dt}
+            def _grouped(collection: str, match: Dict[str, Any], group: Dict[str, Any]) -> Dict[int, dict]:
+                pipeline = [
+                    {"$match": {"DM_ID": {"$ne": None}, **match}},
+                    {"$group": {"_id": "$DM_ID", **group}},
+                ]
+                return {int(r["_id"]): r for r in col(collection).aggregate(pipeline) if r.get("_id") is not None}
 
-                order_count = col("orders").count_documents(order_match)
-                paid_orders = col("orders").count_documents({**order_match, "Pay_Status": 1})
+            jobs = {
+                "schedules": ("schedules", _range("Start_Time"), {"cnt": {"$sum": 1}}),
+                "orders": (
+                    "orders",
+                    _range("Start_Time"),
+                    {
+                        "cnt": {"$sum": 1},
+                        "paid": {"$sum": {"$cond": [{"$eq": ["$Pay_Status", 1]}, 1, 0]}},
+                    },
+                ),
+                "transactions": (
+                    "transactions",
+                    {"Trans_Type": 1, "Result": 1, **_range("Trans_Time")},
+                    {"revenue": {"$sum": "$Amount"}},
+                ),
+                "locks": (
+                    "lock_records",
+                    {"Status": 0, "ExpireTime": {"$gt": now}},
+                    {"cnt": {"$sum": 1}},
+                ),
+            }
+            grouped = run_parallel({name: (lambda args=args: _grouped(*args)) for name, args in jobs.items()})
 
-                tx_match: Dict[str, Any] = {"DM_ID": dm_id, "Trans_Type": 1, "Result": 1}
-                if start_dt:
-                    tx_match["Trans_Time"] = {**tx_match.get("Trans_Time", {}), "$gte": start_dt}
-                if end_dt:
-                    tx_match["Trans_Time"] = {**tx_match.get("Trans_Time", {}), "$lt": end_dt}
+            sch_map = grouped["schedules"]
+            order_map = grouped["orders"]
+            tx_map = grouped["transactions"]
+            lock_map = grouped["locks"]
 
-                revenue_row = next(
-                    iter(
-                        col("transactions").aggregate(
-                            [{"$match": tx_match}, {"$group": {"_id": None, "revenue": {"$sum": "$Amount"}}}]
-                        )
-                    ),
-                    None,
-                )
-                revenue = float((revenue_row or {}).get("revenue") or 0)
+            results = []
+            for dm in dms:
+                dm_id = int(dm.get("DM_ID") or 0)
+                if dm_id <= 0:
+                    continue
 
-                active_locks = col("lock_records").count_documents(
-                    {"DM_ID": dm_id, "Status": 0, "ExpireTime": {"$gt": now}}
-                )
+                order_row = order_map.get(dm_id) or {}
+                revenue = float((tx_map.get(dm_id) or {}).get("revenue") or 0)
 
                 results.append(
                     {
@@ -379,11 +490,11 @@ class ReportModel:
                         "DM_Name": dm.get("Name") or dm.get("DM_Name") or "",
                         "Phone": dm.get("Phone"),
                         "Star_Level": dm.get("Star_Level"),
-                        "schedule_count": int(schedule_count),
-                        "order_count": int(order_count),
-                        "paid_orders": int(paid_orders),
+                        "schedule_count": int((sch_map.get(dm_id) or {}).get("cnt") or 0),
+                        "order_count": int(order_row.get("cnt") or 0),
+                        "paid_orders": int(order_row.get("paid") or 0),
                         "revenue": round(revenue, 2),
-                        "active_locks": int(active_locks),
+                        "active_locks": int((lock_map.get(dm_id) or {}).get("cnt") or 0),
                     }
                 )
 
@@ -393,3 +504,283 @@ class ReportModel:
             logger.error(f"查询DM业绩失败: {str(e)}")
             raise
 
+    @staticmethod
+    @cached_report("timeseries", ttl=300)
+    def get_timeseries(
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        granularity: str = "day",
+        split_by: Optional[str] = None,
+        dm_id: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        营收/预约趋势：transactions 与 orders 各一次 $dateTrunc 分桶聚合（并行），可按剧本/房间/DM 拆分。
+        不拆分时补齐空桶，便于前端直接绘图。
+        """
+        try:
+            unit = (granularity or "day").lower()
+            if unit not in _TIMESERIES_UNITS:
+                raise ValueError("granularity 仅支持 day/week/month")
+            if split_by and split_by not in _TIMESERIES_SPLITS:
+                raise ValueError("split_by 仅支持 script/room/dm")
+
+            end_dt = (_parse_date(end_date) if end_date else _day_start(datetime.now())) + timedelta(days=1)
+            if start_date:
+                start_dt = _parse_date(start_date)
+            else:
+                default_days = {"day": 30, "week": 7 * 12, "month": 365}[unit]
+                start_dt = end_dt - timedelta(days=default_days)
+            if start_dt >= end_dt:
+                raise ValueError("开始日期不能晚于结束日期")
+
+            key_field, name_field = _TIMESERIES_SPLITS.get(split_by or "", (None, None))
+            trunc: Dict[str, Any] = {"unit": unit}
+            if unit == "week":
+                trunc["startOfWeek"] = "monday"
+
+            def _group_id(time_field: str) -> Dict[str, Any]:
+                gid: Dict[str, Any] = {"bucket": {"$dateTrunc": {"date": f"${time_field}", **trunc}}}
+                if key_field:
+                    gid["key"] = f"${key_field}"
+                return gid
+
+            tx_match: Dict[str, Any] = {"Trans_Type": 1, "Result": 1, "Trans_Time": {"$gte": start_dt, "$lt": end_dt}}
+            order_match: Dict[str, Any] = {"Pay_Status": {"$in": [0, 1]}, "Create_Time": {"$gte": start_dt, "$lt": end_dt}}
+            if dm_id is not None:
+                tx_match["DM_ID"] = int(dm_id)
+                order_match["DM_ID"] = int(dm_id)
+
+            tx_group: Dict[str, Any] = {"_id": _group_id("Trans_Time"), "revenue": {"$sum": "$Amount"}, "paid": {"$sum": 1}}
+            order_group: Dict[str, Any] = {"_id": _group_id("Create_Time"), "bookings": {"$sum": 1}}
+            if name_field:
+                order_group["name"] = {"$first": f"${name_field}"}
+
+            res = run_parallel(
+                {
+                    "transactions": lambda: list(
+                        col("transactions").aggregate([{"$match": tx_match}, {"$group": tx_group}])
+                    ),
+                    "orders": lambda: list(col("orders").aggregate([{"$match": order_match}, {"$group": order_group}])),
+                }
+            )
+
+            rows: Dict[tuple, dict] = {}
+
+            def _row(gid: dict) -> dict:
+                k = (gid["bucket"], gid.get("key"))
+                if k not in rows:
+                    row: Dict[str, Any] = {"bucket": gid["bucket"], "revenue": 0.0, "paid_count": 0, "bookings": 0}
+                    if key_field:
+                        row[key_field] = gid.get("key")
+                        row[name_field] = ""
+                    rows[k] = row
+                return rows[k]
+
+            for r in res["transactions"]:
+                row = _row(r["_id"])
+                row["revenue"] = round(float(r.get("revenue") or 0), 2)
+                row["paid_count"] = int(r.get("paid") or 0)
+            for r in res["orders"]:
+                row = _row(r["_id"])
+                row["bookings"] = int(r.get("bookings") or 0)
+                if name_field:
+                    row[name_field] = r.get("name") or ""
+
+            if not key_field:
+                cursor = _bucket_start(start_dt, unit)
+                while cursor < end_dt:
+                    _row({"bucket": cursor})
+                    cursor = _next_bucket(cursor, unit)
+
+            return sorted(rows.values(), key=lambda x: (x["bucket"], str(x.get(key_field) or "")))
+        except Exception as e:
+            logger.error(f"查询营收趋势失败: {str(e)}")
+            raise
+
+    @staticmethod
+    @cached_report("occupancy_heatmap", ttl=600)
+    def get_occupancy_heatmap(
+        start_date: Optional[str] = None, end_date: Optional[str] = None, dm_id: Optional[int] = None
+    ) -> dict:
+        """
+        房间 × 星期 × 小时 占用热力图（默认最近 4 周）。
+        把每个场次的 [Start_Time, End_Time) 按小时分箱（含首尾不满一小时的部分），全程 NumPy 向量化：
+          - busy_rate：该时段房间被排场的比例（%）
+          - occupancy_rate：按 Booked_Count/Max_Players 加权后的座位占用率（%）
+        分母为区间内该星期几出现的天数。
+        """
+        try:
+            end_dt = (_parse_date(end_date) if end_date else _day_start(datetime.now())) + timedelta(days=1)
+            start_dt = _parse_date(start_date) if start_date else end_dt - timedelta(days=28)
+            if start_dt >= end_dt:
+                raise ValueError("开始日期不能晚于结束日期")
+            if end_dt - start_dt > timedelta(days=366):
+                raise ValueError("热力图时间范围不能超过一年")
+
+            sch_query: Dict[str, Any] = {
+                "Start_Time": {"$lt": end_dt},
+                "End_Time": {"$gt": start_dt},
+                "Status": {"$in": [0, 1]},
+            }
+            if dm_id is not None:
+                sch_query["DM_ID"] = int(dm_id)
+
+            res = run_parallel(
+                {
+                    "rooms": lambda: list(col("rooms").find({}, {"_id": 0, "Room_ID": 1, "Room_Name": 1}).sort("Room_ID", 1)),
+                    "schedules": lambda: list(
+                        col("schedules").find(
+                            sch_query,
+                            {"_id": 0, "Room_ID": 1, "Room_Name": 1, "Start_Time": 1, "End_Time": 1, "Max_Players": 1, "Booked_Count": 1},
+                        )
+                    ),
+                }
+            )
+            rooms = [r for r in res["rooms"] if r.get("Room_ID") is not None]
+            schedules = [
+                s for s in res["schedules"] if isinstance(s.get("Start_Time"), datetime) and isinstance(s.get("End_Time"), datetime)
+            ]
+            # 场次里出现但 rooms 集合缺失的房间也要展示
+            known = {int(r["Room_ID"]) for r in rooms}
+            for s in schedules:
+                if s.get("Room_ID") is not None and int(s["Room_ID"]) not in known:
+                    known.add(int(s["Room_ID"]))
+                    rooms.append({"Room_ID": int(s["Room_ID"]), "Room_Name": s.get("Room_Name")})
+            room_index = {int(r["Room_ID"]): i for i, r in enumerate(rooms)}
+
+            n_rooms = len(rooms)
+            n_hours = int((end_dt - start_dt).total_seconds() // 3600)
+            busy = np.zeros((n_rooms, 7, 24))
+            seats = np.zeros((n_rooms, 7, 24))
+
+            schedules = [s for s in schedules if s.get("Room_ID") is not None]
+            if schedules and n_rooms:
+                base = np.datetime64(start_dt, "s")
+                room_idx = np.array([room_index[int(s["Room_ID"])] for s in schedules], dtype=np.int64)
+                start_h = (np.array([s["Start_Time"] for s in schedules], dtype="datetime64[s]") - base) / np.timedelta64(1, "h")
+                end_h = (np.array([s["End_Time"] for s in schedules], dtype="datetime64[s]") - base) / np.timedelta64(1, "h")
+                start_h = np.clip(start_h.astype(float), 0, n_hours)
+                end_h = np.clip(end_h.astype(float), 0, n_hours)
+                valid = end_h > start_h
+                cap = np.array([float(s.get("Max_Players") or 0) for s in schedules])
+                booked = np.array([float(s.get("Booked_Count") or 0) for s in schedules])
+                seat_w = np.divide(np.minimum(booked, cap), cap, out=np.zeros_like(cap), where=cap > 0)
+
+                room_idx, start_h, end_h, seat_w = room_idx[valid], start_h[valid], end_h[valid], seat_w[valid]
+                first = np.floor(start_h).astype(np.int64)
+                last = np.floor(end_h).astype(np.int64)
+                same = first == last
+
+                def _bin(weights: np.ndarray) -> np.ndarray:
+                    # 每个房间一条按小时的时间轴；多一个槽位承接 end 恰在区间末尾的情况
+                    cover = np.zeros((n_rooms, n_hours + 1))
+                    # 首尾同一小时：只贡献 end-start
+                    np.add.at(cover, (room_idx[same], first[same]), (end_h - start_h)[same] * weights[same])
+                    span = ~same
+                    r, f, l, w = room_idx[span], first[span], last[span], weights[span]
+                    # 首个不完整小时 + 末个不完整小时
+                    np.add.at(cover, (r, f), (f + 1 - start_h[span]) * w)
+                    np.add.at(cover, (r, l), (end_h[span] - l) * w)
+                    # 中间完整小时：差分数组 + 累加
+                    diff = np.zeros((n_rooms, n_hours + 2))
+                    np.add.at(diff, (r, f + 1), w)
+                    np.add.at(diff, (r, l), -w)
+                    cover += np.cumsum(diff, axis=1)[:, : n_hours + 1]
+                    return cover[:, :n_hours]
+
+                slot_times = base + np.arange(n_hours) * np.timedelta64(1, "h")
+                slot_days = slot_times.astype("datetime64[D]")
+                # 1970-01-01 是星期四：(days + 3) % 7 得到 Monday=0
+                weekday = ((slot_days.astype(np.int64) + 3) % 7).astype(np.int64)
+                hour = ((slot_times - slot_days) // np.timedelta64(1, "h")).astype(np.int64)
+                flat_slot = weekday * 24 + hour
+
+                for target, weights in ((busy, np.ones_like(seat_w)), (seats, seat_w)):
+                    cover = _bin(weights)
+                    acc = np.zeros((n_rooms, 7 * 24))
+                    np.add.at(acc, (slice(None), flat_slot), cover)
+                    target += acc.reshape(n_rooms, 7, 24)
+
+            day_starts = np.arange(np.datetime64(start_dt, "D"), np.datetime64(end_dt, "D"))
+            days_per_weekday = np.bincount((day_starts.astype(np.int64) + 3) % 7, minlength=7).astype(float)
+            denom = np.where(days_per_weekday > 0, days_per_weekday, 1.0)[None, :, None]
+
+            return {
+                "start": start_dt,
+                "end": end_dt - timedelta(days=1),
+                "rooms": [{"Room_ID": int(r["Room_ID"]), "Room_Name": r.get("Room_Name") or ""} for r in rooms],
+                "weekdays": ["周一", "周二", "周三", "周四", "周五", "周六", "周日"],
+                "hours": list(range(24)),
+                "days_per_weekday": days_per_weekday.astype(int).tolist(),
+                "busy_rate": np.round(busy / denom * 100, 2).tolist(),
+                "occupancy_rate": np.round(seats / denom * 100, 2).tolist(),
+            }
+        except Exception as e:
+            logger.error(f"查询房间占用热力图失败: {str(e)}")
+            raise
+
+    @staticmethod
+    def get_unique_players(
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        by: str = "day",
+        dm_id: Optional[int] = None,
+    ) -> dict:
+        """
+        去重玩家数（HyperLogLog 近似值，误差约 0.81%），按天/剧本/DM 拆分；默认最近 30 天。
+        数据由下单/支付时 PFADD 写入，历史数据用 tools/backfill_unique_players.py 回填。
+        """
+        try:
+            end_day = (_parse_date(end_date) if end_date else datetime.now()).date()
+            start_day = _parse_date(start_date).date() if start_date else end_day - timedelta(days=29)
+            if start_day > end_day:
+                raise ValueError("开始日期不能晚于结束日期")
+            if (end_day - start_day).days >= 366:
+                raise ValueError("时间范围不能超过一年")
+            days = uv_day_range(start_day, end_day)
+
+            if dm_id is not None:
+                total = count_unique(days, "dm", [int(dm_id)])[int(dm_id)]
+            else:
+                total = count_unique(days, "all")[None]
+
+            rows: List[dict] = []
+            if by == "day":
+                dim, ref = ("dm", int(dm_id)) if dm_id is not None else ("all", None)
+                for day, n in zip(days, count_per_day(days, dim, ref)):
+                    rows.append({"date": datetime.strptime(day, "%Y%m%d").date(), "unique_players": n})
+            elif by == "script":
+                if dm_id is not None:
+                    raise ValueError("按剧本去重仅老板可查看")
+                scripts = list(col("scripts").find({}, {"_id": 0, "Script_ID": 1, "Title": 1}))
+                counts = count_unique(days, "script", [int(x["Script_ID"]) for x in scripts])
+                for x in scripts:
+                    rows.append(
+                        {"Script_ID": int(x["Script_ID"]), "Title": x.get("Title") or "", "unique_players": counts[int(x["Script_ID"])]}
+                    )
+                rows.sort(key=lambda x: x["unique_players"], reverse=True)
+            elif by == "dm":
+                dm_query: Dict[str, Any] = {} if dm_id is None else {"DM_ID": int(dm_id)}
+                dms = list(col("dms").find(dm_query, {"_id": 0, "DM_ID": 1, "Name": 1}))
+                counts = count_unique(days, "dm", [int(x["DM_ID"]) for x in dms])
+                for x in dms:
+                    rows.append({"DM_ID": int(x["DM_ID"]), "DM_Name": x.get("Name") or "", "unique_players": counts[int(x["DM_ID"])]})
+                rows.sort(key=lambda x: x["unique_players"], reverse=True)
+            else:
+                raise ValueError("by 仅支持 day/script/dm")
+
+            return {"start": start_day, "end": end_day, "by": by, "total_unique_players": total, "rows": rows}
+        except Exception as e:
+            logger.error(f"查询去重玩家数失败: {str(e)}")
+            raise
+
+
+# 可提交为异步任务的报表：名称 -> (方法, 允许的参数)
+REPORT_JOBS = {
+    "top_scripts": (ReportModel.get_top_scripts, ("start_date", "end_date", "limit", "dm_id")),
+    "room_utilization": (ReportModel.get_room_utilization, ("start_date", "end_date", "dm_id")),
+    "lock_conversion": (ReportModel.get_lock_conversion_rate, ("start_date", "end_date", "dm_id")),
+    "dm_performance": (ReportModel.get_dm_performance, ("start_date", "end_date")),
+    "occupancy_heatmap": (ReportModel.get_occupancy_heatmap, ("start_date", "end_date", "dm_id")),
+    "timeseries": (ReportModel.get_timeseries, ("start_date", "end_date", "granularity", "split_by", "dm_id")),
+}
@@ -9,6 +9,8 @@ import logging
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
+from pymongo import UpdateOne
+
 from nosql.mongo import col, get_next_sequence
 from nosql.seat_lock_service import ensure_seats_initialized
 from security_utils import InputValidator
@@ -30,6 +32,29 @@ def _parse_dt(value) -> datetime:
 
 
 class ScheduleModel:
+    # 管理端列表 ?fields= 允许选择的字段（Booked_Count / Locked_Count 为实时统计值）
+    LIST_FIELDS = frozenset(
+        {
+            "Schedule_ID",
+            "Script_ID",
+            "Script_Title",
+            "Script_Cover",
+            "Room_ID",
+            "Room_Name",
+            "DM_ID",
+            "DM_Name",
+            "Start_Time",
+            "End_Time",
+            "Real_Price",
+            "Status",
+            "Max_Players",
+            "Pay_Timeout_Minutes",
+            "Booked_Count",
+            "Locked_Count",
+        }
+    )
+    _COMPUTED_FIELDS = ("Booked_Count", "Locked_Count")
+
     @staticmethod
     def get_schedules_by_script(script_id: int, player_id: Optional[int] = None) -> List[dict]:
         try:
@@ -130,6 +155,7 @@ class ScheduleModel:
         script_id: Optional[int] = None,
         status: Optional[int] = None,
         dm_id: Optional[int] = None,
+        fields: Optional[List[str]] = None,
     ) -> List[dict]:
         try:
             query: Dict[str, Any] = {}
@@ -145,7 +171,12 @@ class ScheduleModel:
             if dm_id is not None:
                 query["DM_ID"] = int(dm_id)
 
-            schedules_raw = list(col("schedules").find(query).sort("Start_Time", -1))
+            # 实时统计字段不在文档中投影；_id/Schedule_ID 用于兼容旧数据的 ID 回填
+            projection = None
+            if fields:
+                projection = {"_id": 1, "Schedule_ID": 1}
+                projection.update({f: 1 for f in fields if f not in ScheduleModel._COMPUTED_FIELDS})
+            schedules_raw = list(col("schedules").find(query, projection).sort("Start_Time", -1))
             if not schedules_raw:
                 return []
 
@@ -164,36 +195,41 @@ class ScheduleModel:
             now = datetime.now()
             schedule_ids = [int(s["Schedule_ID"]) for s in schedules]
 
+            # 未选择的统计字段不再执行对应聚合
             booked_map = {}
-            for row in col("orders").aggregate(
-                [
-                    {"$match": {"Schedule_ID": {"$in": schedule_ids}, "Pay_Status": {"$in": [0, 1]}}},
-                    {"$group": {"_id": "$Schedule_ID", "cnt": {"$sum": 1}}},
-                ]
-            ):
-                booked_map[int(row["_id"])] = int(row["cnt"])
+            if not fields or "Booked_Count" in fields:
+                for row in col("orders").aggregate(
+                    [
+                        {"$match": {"Schedule_ID": {"$in": schedule_ids}, "Pay_Status": {"$in": [0, 1]}}},
+                        {"$group": {"_id": "$Schedule_ID", "cnt": {"$sum": 1}}},
+                    ]
+                ):
+                    booked_map[int(row["_id"])] = int(row["cnt"])
 
             locked_map = {}
-            for row in col("lock_records").aggregate(
-                [
-                    {"$match": {"Schedule_ID": {"$in": schedule_ids}, "Status": 0, "ExpireTime": {"$gt": now}}},
-                    {"$group": {"_id": "$Schedule_ID", "cnt": {"$sum": 1}}},
-                ]
-            ):
-                locked_map[int(row["_id"])] = int(row["cnt"])
+            if not fields or "Locked_Count" in fields:
+                for row in col("lock_records").aggregate(
+                    [
+                        {"$match": {"Schedule_ID": {"$in": schedule_ids}, "Status": 0, "ExpireTime": {"$gt": now}}},
+                        {"$group": {"_id": "$Schedule_ID", "cnt": {"$sum": 1}}},
+                    ]
+                ):
+                    locked_map[int(row["_id"])] = int(row["cnt"])
 
             for sch in schedules:
                 sid = int(sch["Schedule_ID"])
                 sch["Booked_Count"] = booked_map.get(sid, 0)
                 sch["Locked_Count"] = locked_map.get(sid, 0)
 
+            if fields:
+                schedules = [{f: sch[f] for f in fields if f in sch} for sch in schedules]
             return schedules
         except Exception as e:
             logger.error(f"查询所有场次失败: {str(e)}")
             raise
 
     @staticmethod
-    def create_schedule(script_id, room_id, dm_id, start_time, end_time, real_price) -> int:
+    def create_schedule(script_id, room_id, dm_id, start_time, end_time, real_price, pay_timeout_minutes=None) -> int:
         try:
             script_id = InputValidator.validate_id(script_id, "剧本ID")
             room_id = InputValidator.validate_id(room_id, "房间ID")
@@ -223,6 +259,9 @@ class ScheduleModel:
                 "Max_Players": int(script.get("Max_Players") or 0),
                 "Script_Cover": script.get("Cover_Image"),
             }
+            # 该场次订单的支付时限（分钟），未设置时使用 ORDER_PAY_TIMEOUT_MINUTES
+            if pay_timeout_minutes is not None:
+                doc["Pay_Timeout_Minutes"] = InputValidator.validate_id(pay_timeout_minutes, "支付时限（分钟）")
             col("schedules").insert_one(doc)
             ensure_seats_initialized(int(schedule_id))
             return int(schedule_id)
@@ -240,6 +279,7 @@ class ScheduleModel:
         end_time=None,
         real_price=None,
         status=None,
+        pay_timeout_minutes=None,
     ) -> int:
         try:
             schedule_id = InputValidator.validate_id(schedule_id, "场次ID")
@@ -281,6 +321,9 @@ class ScheduleModel:
                 updates["Real_Price"] = float(real_price)
             if status is not None:
                 updates["Status"] = int(status)
+            if pay_timeout_minutes is not None:
+                # 只影响之后创建的订单
+                updates["Pay_Timeout_Minutes"] = InputValidator.validate_id(pay_timeout_minutes, "支付时限（分钟）")
 
             if not updates:
                 raise ValueError("没有需要更新的字段")
@@ -312,6 +355,56 @@ class ScheduleModel:
             logger.error(f"取消场次失败: {str(e)}")
             raise
 
+    @staticmethod
+    def rebuild_order_counters(schedule_ids: Optional[List[int]] = None, batch_size: int = 1000) -> int:
+        """
+        按 orders 全量重算场次上的反范式计数：Booked_Count（未付+已付）、Paid_Count（已付）。
+        日常由 OrderModel 用 $inc 维护，本方法用于迁移/造数后或计数漂移时修复。
+        """
+        try:
+            order_match: Dict[str, Any] = {"Pay_Status": {"$in": [0, 1]}}
+            sch_query: Dict[str, Any] = {}
+            if schedule_ids is not None:
+                ids = [int(x) for x in schedule_ids]
+                order_match["Schedule_ID"] = {"$in": ids}
+                sch_query["_id"] = {"$in": ids}
+
+            counts: Dict[int, dict] = {}
+            for row in col("orders").aggregate(
+                [
+                    {"$match": order_match},
+                    {
+                        "$group": {
+                            "_id": "$Schedule_ID",
+                            "booked": {"$sum": 1},
+                            "paid": {"$sum": {"$cond": [{"$eq": ["$Pay_Status", 1]}, 1, 0]}},
+                        }
+                    },
+                ]
+            ):
+                if row.get("_id") is not None:
+                    counts[int(row["_id"])] = row
+
+            updated = 0
+            ops: List[UpdateOne] = []
+            for sch in col("schedules").find(sch_query, {"_id": 1}):
+                row = counts.get(int(sch["_id"])) or {}
+                ops.append(
+                    UpdateOne(
+                        {"_id": sch["_id"]},
+                        {"$set": {"Booked_Count": int(row.get("booked") or 0), "Paid_Count": int(row.get("paid") or 0)}},
+                    )
+                )
+                if len(ops) >= batch_size:
+                    updated += col("schedules").bulk_write(ops, ordered=False).modified_count
+                    ops = []
+            if ops:
+                updated += col("schedules").bulk_write(ops, ordered=False).modified_count
+            return int(updated)
+        except Exception as e:
+            logger.error(f"重建场次订单计数失败: {str(e)}")
+            raise
+
     @staticmethod
     def get_schedule_basic(schedule_id: int) -> dict:
         schedule_id = InputValidator.validate_id(schedule_id, "场次ID")
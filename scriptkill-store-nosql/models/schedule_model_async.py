@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+场次模型 - 异步版本（ASGI 模式使用），返回结构与 ScheduleModel.get_schedules_by_script 一致
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from nosql.mongo_async import col
+from security_utils import InputValidator
+
+logger = logging.getLogger(__name__)
+
+
+async def _count_by_schedule(collection: str, match: dict) -> Dict[int, int]:
+    cursor = await col(collection).aggregate(
+        [{"$match": match}, {"$group": {"_id": "$Schedule_ID", "cnt": {"$sum": 1}}}]
+    )
+    return {int(row["_id"]): int(row["cnt"]) async for row in cursor}
+
+
+class AsyncScheduleModel:
+    @staticmethod
+    async def get_schedules_by_script(script_id: int, player_id: Optional[int] = None) -> List[dict]:
+        try:
+            script_id = InputValidator.validate_id(script_id, "剧本ID")
+            now = datetime.now()
+
+            schedules = await (
+                col("schedules")
+                .find(
+                    {"Script_ID": int(script_id), "Start_Time": {"$gt": now}, "Status": {"$in": [0, 1]}},
+                    {"_id": 0},
+                )
+                .sort("Start_Time", 1)
+                .to_list()
+            )
+            if not schedules:
+                return []
+
+            schedule_ids = [int(s["Schedule_ID"]) for s in schedules]
+            booked_match = {"Schedule_ID": {"$in": schedule_ids}, "Pay_Status": {"$in": [0, 1]}}
+            locked_match = {"Schedule_ID": {"$in": schedule_ids}, "Status": 0, "ExpireTime": {"$gt": now}}
+
+            # 各项计数互不依赖，并发下发
+            tasks = [_count_by_schedule("orders", booked_match), _count_by_schedule("lock_records", locked_match)]
+            if player_id:
+                player_id = InputValidator.validate_id(player_id, "玩家ID")
+                tasks.append(_count_by_schedule("orders", {**booked_match, "Player_ID": int(player_id)}))
+                tasks.append(_count_by_schedule("lock_records", {**locked_match, "Player_ID": int(player_id)}))
+            counts = await asyncio.gather(*tasks)
+            booked_map, locked_map = counts[0], counts[1]
+
+            for sch in schedules:
+                sid = int(sch["Schedule_ID"])
+                sch["Booked_Count"] = booked_map.get(sid, 0)
+                sch["Locked_Count"] = locked_map.get(sid, 0)
+                if player_id:
+                    sch["User_Booked"] = counts[2].get(sid, 0)
+                    sch["User_Locked"] = counts[3].get(sid, 0)
+
+            return schedules
+        except Exception as e:
+            logger.error(f"查询剧本场次失败: {str(e)}")
+            raise
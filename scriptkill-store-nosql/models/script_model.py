@@ -6,41 +6,41 @@
 from __future__ import annotations
 
 import logging
-from typing import List
+from typing import List, Optional
 
-from nosql.mongo import col, project
+from nosql.mongo import col, fields_projection, project
 from security_utils import InputValidator
 
 logger = logging.getLogger(__name__)
 
 
 class ScriptModel:
+    # 列表接口默认返回的字段，也是 ?fields= 允许选择的范围
+    LIST_FIELDS = (
+        "Script_ID",
+        "Title",
+        "Type",
+        "Min_Players",
+        "Max_Players",
+        "Duration",
+        "Base_Price",
+        "Status",
+        "Cover_Image",
+        "Group_Category",
+        "Difficulty",
+        "Gender_Config",
+    )
+
     @staticmethod
-    def get_all_scripts(status=None) -> List[dict]:
+    def get_all_scripts(status=None, fields: Optional[List[str]] = None) -> List[dict]:
         try:
             query = {}
             if status is not None:
                 status = InputValidator.validate_enum(status, [0, 1], "剧本状态")
                 query["Status"] = int(status)
 
-            cursor = col("scripts").find(
-                query,
-                {
-                    "_id": 0,
-                    "Script_ID": 1,
-                    "Title": 1,
-                    "Type": 1,
-                    "Min_Players": 1,
-                    "Max_Players": 1,
-                    "Duration": 1,
-                    "Base_Price": 1,
-                    "Status": 1,
-                    "Cover_Image": 1,
-                    "Group_Category": 1,
-                    "Difficulty": 1,
-                    "Gender_Config": 1,
-                },
-            ).sort("Script_ID", 1)
+            projection = fields_projection(fields or ScriptModel.LIST_FIELDS, {"_id": 0})
+            cursor = col("scripts").find(query, projection).sort("Script_ID", 1)
             return list(cursor)
         except Exception as e:
             logger.error(f"获取剧本列表失败: {str(e)}")
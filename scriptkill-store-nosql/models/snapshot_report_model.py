@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+报表模型 - 列式快照（NumPy）版本
+
+与 ReportModel 的方法名、参数、返回结构一致，但数据来自 tools/export_columnar_snapshot.py 导出的快照，
+所有分组统计均为向量化计算（np.unique + np.bincount），不访问线上 Mongo。
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from nosql.columnar import NULL_INT, ColumnarSnapshot, to_datetime64
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_date(date_str: str) -> datetime:
+    return datetime.strptime(date_str, "%Y-%m-%d")
+
+
+def _range_mask(values: np.ndarray, start: Optional[datetime], end: Optional[datetime]) -> np.ndarray:
+    """半开区间 [start, end)，与 ReportModel 的 Mongo 查询一致（end 为结束日期次日 0 点）。"""
+    if not (start or end):
+        return np.ones(values.shape[0], dtype=bool)
+    mask = ~np.isnat(values)
+    if start:
+        mask &= values >= to_datetime64(start)
+    if end:
+        mask &= values < to_datetime64(end)
+    return mask
+
+
+def _group_sum(keys: np.ndarray, mask: np.ndarray, weights: Optional[np.ndarray] = None) -> Dict[int, float]:
+    """按 keys 分组求和（weights 为空时计数），返回 {key: sum}。"""
+    k = keys[mask]
+    if k.size == 0:
+        return {}
+    uniq, inv = np.unique(k, return_inverse=True)
+    w = None if weights is None else np.asarray(weights)[mask]
+    sums = np.bincount(inv, weights=w, minlength=uniq.size)
+    return dict(zip(uniq.tolist(), sums.tolist()))
+
+
+class SnapshotReportModel:
+    def __init__(self, snapshot_path: str):
+        self.snapshot = ColumnarSnapshot(snapshot_path)
+
+    def get_top_scripts(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 5,
+        dm_id: Optional[int] = None,
+    ) -> List[dict]:
+        try:
+            o = self.snapshot.table("orders")
+            script_ids = np.asarray(o["Script_ID"])
+            pay = np.asarray(o["Pay_Status"])
+            amount = np.nan_to_num(np.asarray(o["Amount"]))
+
+            mask = script_ids != NULL_INT
+            if dm_id is not None:
+                mask &= np.asarray(o["DM_ID"]) == int(dm_id)
+            start_dt = _parse_date(start_date) if start_date else None
+            end_dt = (_parse_date(end_date) + timedelta(days=1)) if end_date else None
+            if start_dt or end_dt:
+                mask &= _range_mask(np.asarray(o["Create_Time"]), start_dt, end_dt)
+
+            keys = script_ids[mask]
+            if keys.size == 0:
+                return []
+            uniq, first_idx, inv = np.unique(keys, return_index=True, return_inverse=True)
+            order_count = np.bincount(inv, weights=np.isin(pay[mask], (0, 1)), minlength=uniq.size)
+            revenue = np.bincount(inv, weights=np.where(pay[mask] == 1, amount[mask], 0.0), minlength=uniq.size)
+            title_codes = np.asarray(o["Script_Title"])[mask][first_idx]
+
+            order = np.lexsort((-revenue, -order_count))[: int(limit)]
+            return [
+                {
+                    "Script_ID": int(uniq[i]),
+                    "Title": o.decode("Script_Title", title_codes[i]) or "",
+                    "order_count": int(order_count[i]),
+                    "total_revenue": float(revenue[i]),
+                }
+                for i in order
+            ]
+        except Exception as e:
+            logger.error(f"快照查询热门剧本失败: {str(e)}")
+            raise
+
+    def get_room_utilization(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None, dm_id: Optional[int] = None
+    ) -> List[dict]:
+        try:
+            s = self.snapshot.table("schedules")
+            o = self.snapshot.table("orders")
+
+            mask = np.ones(s.rows, dtype=bool)
+            start_dt = _parse_date(start_date) if start_date else None
+            end_dt = (_parse_date(end_date) + timedelta(days=1)) if end_date else None
+            if start_dt or end_dt:
+                mask &= _range_mask(np.asarray(s["Start_Time"]), start_dt, end_dt)
+            if dm_id is not None:
+                mask &= np.asarray(s["DM_ID"]) == int(dm_id)
+            if not mask.any():
+                return []
+
+            # 每个场次的已付订单数：对 orders.Schedule_ID 做 bincount 后按场次位置取值
+            sch_ids = np.asarray(s["Schedule_ID"])
+            sorter = np.argsort(sch_ids)
+            order_sids = np.asarray(o["Schedule_ID"])
+            paid_mask = np.asarray(o["Pay_Status"]) == 1
+            pos = np.searchsorted(sch_ids, order_sids[paid_mask], sorter=sorter)
+            pos = np.clip(pos, 0, max(sch_ids.size - 1, 0))
+            matched = sch_ids[sorter][pos] == order_sids[paid_mask]
+            paid_per_schedule = np.bincount(sorter[pos[matched]], minlength=sch_ids.size)
+
+            room_ids = np.asarray(s["Room_ID"])[mask]
+            name_codes = np.asarray(s["Room_Name"])[mask].astype(np.int64)
+            status = np.asarray(s["Status"])[mask]
+            keys = np.stack([room_ids, name_codes], axis=1)
+            uniq, inv = np.unique(keys, axis=0, return_inverse=True)
+            inv = inv.reshape(-1)
+            total = np.bincount(inv, minlength=len(uniq))
+            completed = np.bincount(inv, weights=status == 1, minlength=len(uniq))
+            paid = np.bincount(inv, weights=paid_per_schedule[mask], minlength=len(uniq))
+
+            order = np.lexsort((-total, -completed, -paid))
+            results = []
+            for i in order:
+                t = int(total[i])
+                c = int(completed[i])
+                room_id = int(uniq[i][0])
+                results.append(
+                    {
+                        "Room_ID": None if room_id == NULL_INT else room_id,
+                        "Room_Name": s.decode("Room_Name", uniq[i][1]) or "",
+                        "total_schedules": t,
+                        "completed_schedules": c,
+                        "paid_orders": int(paid[i]),
+                        "utilization_rate": round((c * 100.0 / t), 2) if t > 0 else 0,
+                    }
+                )
+            return results
+        except Exception as e:
+            logger.error(f"快照查询房间利用率失败: {str(e)}")
+            raise
+
+    def get_lock_conversion_rate(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None, dm_id: Optional[int] = None
+    ) -> dict:
+        try:
+            locks = self.snapshot.table("lock_records")
+            o = self.snapshot.table("orders")
+            start_dt = _parse_date(start_date) if start_date else None
+            end_dt = (_parse_date(end_date) + timedelta(days=1)) if end_date else None
+            now = to_datetime64(datetime.now())
+
+            lock_mask = np.ones(locks.rows, dtype=bool)
+            order_mask = np.ones(o.rows, dtype=bool)
+            if start_dt or end_dt:
+                lock_mask &= _range_mask(np.asarray(locks["LockTime"]), start_dt, end_dt)
+                order_mask &= _range_mask(np.asarray(o["Create_Time"]), start_dt, end_dt)
+            if dm_id is not None:
+                lock_mask &= np.asarray(locks["DM_ID"]) == int(dm_id)
+                order_mask &= np.asarray(o["DM_ID"]) == int(dm_id)
+
+            lock_status = np.asarray(locks["Status"])[lock_mask]
+            expire = np.asarray(locks["ExpireTime"])[lock_mask]
+            pay = np.asarray(o["Pay_Status"])[order_mask]
+
+            total_locks = int(lock_status.size)
+            converted_locks = int(np.count_nonzero(lock_status == 1))
+            cancelled_locks = int(np.count_nonzero(lock_status == 2))
+            expired_locks = int(np.count_nonzero((lock_status == 3) | ((lock_status == 0) & (expire <= now))))
+            total_orders = int(pay.size)
+            paid_orders = int(np.count_nonzero(pay == 1))
+
+            return {
+                "total_locks": total_locks,
+                "converted_locks": converted_locks,
+                "total_orders": total_orders,
+                "paid_orders": paid_orders,
+                "cancelled_locks": cancelled_locks,
+                "expired_locks": expired_locks,
+                "lock_to_order_rate": round((converted_locks * 100.0 / total_locks), 2) if total_locks > 0 else 0,
+                "order_to_pay_rate": round((paid_orders * 100.0 / total_orders), 2) if total_orders > 0 else 0,
+            }
+        except Exception as e:
+            logger.error(f"快照查询锁位转化率失败: {str(e)}")
+            raise
+
+    def get_dm_performance(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
+        try:
+            dms = self.snapshot.table("dms")
+            if dms.rows == 0:
+                return []
+            s = self.snapshot.table("schedules")
+            o = self.snapshot.table("orders")
+            tx = self.snapshot.table("transactions")
+            locks = self.snapshot.table("lock_records")
+
+            start_dt = _parse_date(start_date) if start_date else None
+            end_dt = (_parse_date(end_date) + timedelta(days=1)) if end_date else None
+            now = to_datetime64(datetime.now())
+
+            sch_mask = _range_mask(np.asarray(s["Start_Time"]), start_dt, end_dt)
+            order_mask = _range_mask(np.asarray(o["Start_Time"]), start_dt, end_dt)
+            tx_mask = (np.asarray(tx["Trans_Type"]) == 1) & (np.asarray(tx["Result"]) == 1)
+            tx_mask &= _range_mask(np.asarray(tx["Trans_Time"]), start_dt, end_dt)
+            lock_mask = (np.asarray(locks["Status"]) == 0) & (np.asarray(locks["ExpireTime"]) > now)
+
+            schedule_count = _group_sum(np.asarray(s["DM_ID"]), sch_mask)
+            order_count = _group_sum(np.asarray(o["DM_ID"]), order_mask)
+            paid_orders = _group_sum(np.asarray(o["DM_ID"]), order_mask, np.asarray(o["Pay_Status"]) == 1)
+            revenue = _group_sum(np.asarray(tx["DM_ID"]), tx_mask, np.nan_to_num(np.asarray(tx["Amount"])))
+            active_locks = _group_sum(np.asarray(locks["DM_ID"]), lock_mask)
+
+            dm_ids = np.asarray(dms["DM_ID"])
+            names = np.asarray(dms["Name"])
+            phones = np.asarray(dms["Phone"])
+            stars = np.asarray(dms["Star_Level"])
+
+            results = []
+            for i in range(dms.rows):
+                dm_id = int(dm_ids[i])
+                if dm_id <= 0:
+                    continue
+                star = int(stars[i])
+                results.append(
+                    {
+                        "DM_ID": dm_id,
+                        "DM_Name": dms.decode("Name", names[i]) or "",
+                        "Phone": dms.decode("Phone", phones[i]),
+                        "Star_Level": None if star == NULL_INT else star,
+                        "schedule_count": int(schedule_count.get(dm_id, 0)),
+                        "order_count": int(order_count.get(dm_id, 0)),
+                        "paid_orders": int(paid_orders.get(dm_id, 0)),
+                        "revenue": round(float(revenue.get(dm_id, 0)), 2),
+                        "active_locks": int(active_locks.get(dm_id, 0)),
+                    }
+                )
+
+            results.sort(key=lambda x: (x.get("revenue", 0), x.get("paid_orders", 0), x.get("order_count", 0)), reverse=True)
+            return results
+        except Exception as e:
+            logger.error(f"快照查询DM业绩失败: {str(e)}")
+            raise
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+座位余量实时推送：每个进程只订阅一次 Redis 频道 seats:events，再按剧本分发给本进程内的 SSE 连接。
+
+- 事件由 seat_lock_service 在锁位/取消/转订单/下单占座/归还/过期回收时发布
+- 场次 -> 剧本 的映射按需查询 Mongo 并缓存（场次创建后不会换剧本）
+- 每个连接一个有界队列；客户端读得慢导致队列满时丢弃最旧事件，不阻塞分发线程
+- 每条连接占用一个 worker 线程，仅在 SSE_IN_WSGI=1 时提供，单进程连接数以 SSE_MAX_STREAMS_PER_PROCESS 为上限
+  （acquire_slot/release_slot）；ASGI 模式使用 availability_stream_async，不占线程
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from nosql.config import SSE_HEARTBEAT_SECONDS, SSE_MAX_STREAMS_PER_PROCESS
+from nosql.mongo import col
+from nosql.redis_client import get_redis
+from nosql.seat_lock_service import SEATS_CHANNEL, _seats_key, ensure_seats_initialized
+
+logger = logging.getLogger(__name__)
+
+_CLIENT_QUEUE_SIZE = 100
+_SCRIPT_CACHE_MAX = 20000
+
+_lock = threading.Lock()
+_subscribers: Dict[int, Set[queue.Queue]] = {}
+_script_of_schedule: Dict[int, Optional[int]] = {}
+_listener_pid: Optional[int] = None
+_active_streams = 0
+
+
+def acquire_slot() -> bool:
+    """占用一个 SSE 连接名额，已满时返回 False。"""
+    global _active_streams
+    with _lock:
+        if _active_streams >= SSE_MAX_STREAMS_PER_PROCESS:
+            return False
+        _active_streams += 1
+        return True
+
+
+def release_slot() -> None:
+    global _active_streams
+    with _lock:
+        _active_streams = max(0, _active_streams - 1)
+
+
+def _script_id_of(schedule_id: int) -> Optional[int]:
+    if schedule_id in _script_of_schedule:
+        return _script_of_schedule[schedule_id]
+    doc = col("schedules").find_one({"_id": int(schedule_id)}, {"Script_ID": 1})
+    script_id = int(doc["Script_ID"]) if doc and doc.get("Script_ID") is not None else None
+    if len(_script_of_schedule) >= _SCRIPT_CACHE_MAX:
+        _script_of_schedule.clear()
+    _script_of_schedule[schedule_id] = script_id
+    return script_id
+
+
+def _dispatch(raw: str) -> None:
+    try:
+        sid_text, seats_text, event = raw.split(":", 2)
+        schedule_id = int(sid_text)
+        seats = int(seats_text)
+    except ValueError:
+        return
+    with _lock:
+        if not _subscribers:
+            return
+    script_id = _script_id_of(schedule_id)
+    payload = {"schedule_id": schedule_id, "seats": seats if seats >= 0 else None, "event": event}
+    with _lock:
+        targets = list(_subscribers.get(script_id, ()))
+    for q in targets:
+        _offer(q, ("seats", payload))
+
+
+def _offer(q: queue.Queue, item) -> None:
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+
+
+def _listen_forever() -> None:
+    backoff = 0.5
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(SEATS_CHANNEL)
+            backoff = 0.5
+            while True:
+                msg = pubsub.get_message(timeout=1.0)
+                if msg and msg.get("type") == "message":
+                    try:
+                        _dispatch(msg["data"])
+                    except Exception as e:
+                        logger.warning(f"seats event dispatch failed: {e}")
+        except (RedisError, OSError) as e:
+            logger.warning(f"seats subscription lost, retrying in {backoff:.1f}s: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def _ensure_listener() -> None:
+    global _listener_pid
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    threading.Thread(target=_listen_forever, name="seats-subscriber", daemon=True).start()
+
+
+def snapshot(script_id: int) -> List[dict]:
+    """剧本下未开始场次的当前剩余座位（连接建立时先推送一次全量）。"""
+    now = datetime.now()
+    sids = [
+        int(doc["_id"])
+        for doc in col("schedules").find(
+            {"Script_ID": int(script_id), "Start_Time": {"$gt": now}, "Status": {"$in": [0, 1]}}, {"_id": 1}
+        )
+    ]
+    if not sids:
+        return []
+    for sid in sids:
+        ensure_seats_initialized(sid)
+        _script_of_schedule.setdefault(sid, int(script_id))
+    values = get_redis().mget([_seats_key(sid) for sid in sids])
+    return [
+        {"schedule_id": sid, "seats": int(v) if v is not None else None} for sid, v in zip(sids, values)
+    ]
+
+
+def _format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream(script_id: int) -> Iterator[str]:
+    """SSE 生成器：先推送 snapshot，之后推送座位变化；空闲时发送注释行保活。"""
+    script_id = int(script_id)
+    _ensure_listener()
+    q: queue.Queue = queue.Queue(maxsize=_CLIENT_QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(script_id, set()).add(q)
+    try:
+        yield "retry: 3000\n\n"
+        yield _format_event("snapshot", snapshot(script_id))
+        while True:
+            try:
+                event, data = q.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format_event(event, data)
+    finally:
+        with _lock:
+            subs = _subscribers.get(script_id)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    _subscribers.pop(script_id, None)
+
+
+def _reset_after_fork() -> None:
+    global _lock, _subscribers, _active_streams
+    _lock = threading.Lock()
+    _subscribers = {}
+    _active_streams = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
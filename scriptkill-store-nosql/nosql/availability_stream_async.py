@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+availability_stream 的异步版本（ASGI 模式使用）：SSE 连接只占用一个协程，不占线程。
+事件格式、频道与分发规则与同步版一致：每个进程（事件循环）只订阅一次 seats:events，再按剧本分发。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from nosql import availability_stream as sync_stream
+from nosql.config import SSE_HEARTBEAT_SECONDS
+from nosql.mongo_async import col
+from nosql.redis_async import get_redis
+from nosql.seat_lock_service import SEATS_CHANNEL
+from nosql.seat_lock_service_async import _seats_key, ensure_seats_initialized
+
+logger = logging.getLogger(__name__)
+
+_format_event = sync_stream._format_event
+
+_subscribers: Dict[int, Set[asyncio.Queue]] = {}
+_script_of_schedule: Dict[int, Optional[int]] = {}
+_listener: Optional[asyncio.Task] = None
+
+
+async def _script_id_of(schedule_id: int) -> Optional[int]:
+    if schedule_id in _script_of_schedule:
+        return _script_of_schedule[schedule_id]
+    doc = await col("schedules").find_one({"_id": int(schedule_id)}, {"Script_ID": 1})
+    script_id = int(doc["Script_ID"]) if doc and doc.get("Script_ID") is not None else None
+    if len(_script_of_schedule) >= sync_stream._SCRIPT_CACHE_MAX:
+        _script_of_schedule.clear()
+    _script_of_schedule[schedule_id] = script_id
+    return script_id
+
+
+def _offer(q: asyncio.Queue, item) -> None:
+    if q.full():
+        q.get_nowait()
+    q.put_nowait(item)
+
+
+async def _dispatch(raw: str) -> None:
+    try:
+        sid_text, seats_text, event = raw.split(":", 2)
+        schedule_id = int(sid_text)
+        seats = int(seats_text)
+    except ValueError:
+        return
+    if not _subscribers:
+        return
+    script_id = await _script_id_of(schedule_id)
+    payload = {"schedule_id": schedule_id, "seats": seats if seats >= 0 else None, "event": event}
+    for q in list(_subscribers.get(script_id, ())):
+        _offer(q, ("seats", payload))
+
+
+async def _listen_forever() -> None:
+    backoff = 0.5
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(SEATS_CHANNEL)
+            backoff = 0.5
+            while True:
+                # 等待时长需小于 Redis 客户端 socket_timeout
+                msg = await pubsub.get_message(timeout=1.0)
+                if msg and msg.get("type") == "message":
+                    try:
+                        await _dispatch(msg["data"])
+                    except Exception as e:
+                        logger.warning(f"seats event dispatch failed: {e}")
+        except (RedisError, OSError) as e:
+            logger.warning(f"seats subscription lost, retrying in {backoff:.1f}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def _ensure_listener() -> None:
+    global _listener
+    if _listener is None or _listener.done():
+        _listener = asyncio.get_running_loop().create_task(_listen_forever())
+
+
+async def snapshot(script_id: int) -> List[dict]:
+    now = datetime.now()
+    sids = [
+        int(doc["_id"])
+        async for doc in col("schedules").find(
+            {"Script_ID": int(script_id), "Start_Time": {"$gt": now}, "Status": {"$in": [0, 1]}}, {"_id": 1}
+        )
+    ]
+    if not sids:
+        return []
+    for sid in sids:
+        await ensure_seats_initialized(sid)
+        _script_of_schedule.setdefault(sid, int(script_id))
+    values = await get_redis().mget([_seats_key(sid) for sid in sids])
+    return [
+        {"schedule_id": sid, "seats": int(v) if v is not None else None} for sid, v in zip(sids, values)
+    ]
+
+
+async def stream(script_id: int) -> AsyncIterator[str]:
+    """SSE 异步生成器：先推送 snapshot，之后推送座位变化；空闲时发送注释行保活。"""
+    script_id = int(script_id)
+    _ensure_listener()
+    q: asyncio.Queue = asyncio.Queue(maxsize=sync_stream._CLIENT_QUEUE_SIZE)
+    _subscribers.setdefault(script_id, set()).add(q)
+    try:
+        yield "retry: 3000\n\n"
+        yield _format_event("snapshot", await snapshot(script_id))
+        while True:
+            try:
+                event, data = await asyncio.wait_for(q.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format_event(event, data)
+    finally:
+        subs = _subscribers.get(script_id)
+        if subs is not None:
+            subs.discard(q)
+            if not subs:
+                _subscribers.pop(script_id, None)
+
+
+async def close() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except (asyncio.CancelledError, Exception):
+            pass
+        _listener = None
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+列式分析快照：把 Mongo 集合导出为按列存储的 .npy 文件（字符串做字典编码），
+读取时以 mmap 方式加载，供离线分析引擎做向量化计算，不再访问线上 Mongo。
+
+目录结构：
+  <snapshot>/manifest.json
+  <snapshot>/<collection>/<Field>.npy          数值/时间列，或字符串列的编码（int32）
+  <snapshot>/<collection>/<Field>.dict.json    字符串列的字典（编码 -> 原值）
+
+Web 服务不导入本模块。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 缺失值约定：整数列 -1，浮点列 NaN，时间列 NaT，字符串编码 -1
+NULL_INT = -1
+NULL_CODE = -1
+
+SNAPSHOT_SCHEMA: Dict[str, Dict[str, str]] = {
+    "orders": {
+        "Order_ID": "int",
+        "Player_ID": "int",
+        "Schedule_ID": "int",
+        "Script_ID": "int",
+        "Script_Title": "str",
+        "Room_ID": "int",
+        "DM_ID": "int",
+        "Amount": "float",
+        "Pay_Status": "int",
+        "Create_Time": "datetime",
+        "Start_Time": "datetime",
+    },
+    "transactions": {
+        "Order_ID": "int",
+        "DM_ID": "int",
+        "Schedule_ID": "int",
+        "Amount": "float",
+        "Trans_Type": "int",
+        "Result": "int",
+        "Trans_Time": "datetime",
+    },
+    "lock_records": {
+        "Schedule_ID": "int",
+        "Player_ID": "int",
+        "DM_ID": "int",
+        "Status": "int",
+        "LockTime": "datetime",
+        "ExpireTime": "datetime",
+    },
+    "schedules": {
+        "Schedule_ID": "int",
+        "Script_ID": "int",
+        "Room_ID": "int",
+        "Room_Name": "str",
+        "DM_ID": "int",
+        "Status": "int",
+        "Max_Players": "int",
+        "Start_Time": "datetime",
+        "End_Time": "datetime",
+    },
+    "dms": {
+        "DM_ID": "int",
+        "Name": "str",
+        "Phone": "str",
+        "Star_Level": "int",
+    },
+}
+
+
+def to_datetime64(dt: datetime) -> np.datetime64:
+    return np.datetime64(dt, "ms")
+
+
+def _encode_column(values: List[Any], kind: str):
+    if kind == "int":
+        return np.array([NULL_INT if v is None else int(v) for v in values], dtype=np.int64), None
+    if kind == "float":
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64), None
+    if kind == "datetime":
+        return np.array([v if isinstance(v, datetime) else None for v in values], dtype="datetime64[ms]"), None
+    if kind == "str":
+        vocab: Dict[str, int] = {}
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is None:
+                codes[i] = NULL_CODE
+                continue
+            codes[i] = vocab.setdefault(str(v), len(vocab))
+        return codes, list(vocab)
+    raise ValueError(f"unknown column type: {kind}")
+
+
+def write_table(out_dir: str, name: str, docs: Iterable[dict], schema: Dict[str, str]) -> int:
+    columns: Dict[str, List[Any]] = {field: [] for field in schema}
+    rows = 0
+    for doc in docs:
+        for field in schema:
+            columns[field].append(doc.get(field))
+        rows += 1
+
+    table_dir = os.path.join(out_dir, name)
+    os.makedirs(table_dir, exist_ok=True)
+    for field, kind in schema.items():
+        arr, vocab = _encode_column(columns[field], kind)
+        np.save(os.path.join(table_dir, f"{field}.npy"), arr)
+        if vocab is not None:
+            with open(os.path.join(table_dir, f"{field}.dict.json"), "w", encoding="utf-8") as f:
+                json.dump(vocab, f, ensure_ascii=False)
+    return rows
+
+
+def write_snapshot(out_dir: str, sources: Dict[str, Iterable[dict]]) -> Dict[str, Any]:
+    """
+    写入完整快照：先写到临时目录，全部成功后再替换目标目录，避免读到半成品。
+    sources: {集合名: 文档迭代器}，集合须在 SNAPSHOT_SCHEMA 中。
+    """
+    tmp_dir = out_dir.rstrip("/\\") + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    manifest: Dict[str, Any] = {"exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "tables": {}}
+    for name, docs in sources.items():
+        schema = SNAPSHOT_SCHEMA[name]
+        rows = write_table(tmp_dir, name, docs, schema)
+        manifest["tables"][name] = {"rows": rows, "columns": schema}
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+class ColumnarTable:
+    def __init__(self, path: str, rows: int, columns: Dict[str, str]):
+        self.path = path
+        self.rows = int(rows)
+        self.columns = dict(columns)
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._vocabs: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """数值/时间列返回原值；字符串列返回编码（配合 decode 使用）。"""
+        if field not in self._arrays:
+            if field not in self.columns:
+                raise KeyError(field)
+            self._arrays[field] = np.load(os.path.join(self.path, f"{field}.npy"), mmap_mode="r")
+        return self._arrays[field]
+
+    def vocab(self, field: str) -> np.ndarray:
+        if field not in self._vocabs:
+            with open(os.path.join(self.path, f"{field}.dict.json"), encoding="utf-8") as f:
+                self._vocabs[field] = np.array(json.load(f), dtype=object)
+        return self._vocabs[field]
+
+    def decode(self, field: str, code: int) -> Optional[str]:
+        code = int(code)
+        return None if code == NULL_CODE else str(self.vocab(field)[code])
+
+
+class ColumnarSnapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.exported_at = datetime.strptime(self.manifest["exported_at"], "%Y-%m-%d %H:%M:%S")
+        self._tables: Dict[str, ColumnarTable] = {}
+
+    def table(self, name: str) -> ColumnarTable:
+        if name not in self._tables:
+            meta = self.manifest["tables"][name]
+            self._tables[name] = ColumnarTable(os.path.join(self.path, name), meta["rows"], meta["columns"])
+        return self._tables[name]
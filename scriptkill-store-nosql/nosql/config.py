@@ -18,3 +18,101 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD") or None
 # 锁位默认时长（分钟）
 LOCK_MINUTES_DEFAULT = int(_env("LOCK_MINUTES_DEFAULT", "15"))
 
+
+# 报表/仪表盘并行查询线程池
+QUERY_POOL_SIZE = int(_env("QUERY_POOL_SIZE", "16"))
+# 并行查询的单次超时（秒）
+QUERY_TIMEOUT_SECONDS = float(_env("QUERY_TIMEOUT_SECONDS", "10"))
+# /api/batch 子请求使用独立线程池，页面批量读取不挤占报表查询
+BATCH_POOL_SIZE = int(_env("BATCH_POOL_SIZE", "4"))
+
+# 报表结果缓存（Redis），设为 0 关闭
+REPORT_CACHE_ENABLED = _env("REPORT_CACHE_ENABLED", "1") == "1"
+
+# 异步报表任务结果保留时长（秒）
+REPORT_JOB_TTL_SECONDS = int(_env("REPORT_JOB_TTL_SECONDS", "3600"))
+# 报表 worker 心跳过期秒数：worker 心跳过期后，其未完成的任务由存活的 worker 重新入队
+REPORT_WORKER_HEARTBEAT_SECONDS = int(_env("REPORT_WORKER_HEARTBEAT_SECONDS", "30"))
+
+# 去重玩家数 HyperLogLog 保留天数
+UNIQUE_PLAYERS_RETENTION_DAYS = int(_env("UNIQUE_PLAYERS_RETENTION_DAYS", "400"))
+
+# 锁位过期清理：Web 进程内是否参与 leader 选举执行清理（独立运行 tools/lock_sweeper.py 时可设为 0）
+LOCK_SWEEPER_IN_WEB = _env("LOCK_SWEEPER_IN_WEB", "1") == "1"
+# 清理间隔（秒）与 leader 租约时长（毫秒，决定 leader 故障后的最长接管时间）
+LOCK_SWEEP_INTERVAL_SECONDS = float(_env("LOCK_SWEEP_INTERVAL_SECONDS", "5"))
+LOCK_SWEEPER_LEASE_MS = int(_env("LOCK_SWEEPER_LEASE_MS", "5000"))
+
+# API 日志：异步队列写出，按大小轮转；LOG_FILE 置空则只输出到控制台
+LOG_LEVEL = _env("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "api.log")
+LOG_MAX_BYTES = int(_env("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(_env("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(_env("LOG_QUEUE_SIZE", "10000"))
+# 相同日志限流：窗口秒数内最多输出 burst 条（任一为 0 关闭限流）
+LOG_RATE_LIMIT_WINDOW_SECONDS = float(_env("LOG_RATE_LIMIT_WINDOW_SECONDS", "10"))
+LOG_RATE_LIMIT_BURST = int(_env("LOG_RATE_LIMIT_BURST", "5"))
+
+# 指标：各进程向 Redis 汇总增量的间隔（秒）；METRICS_TOKEN 非空时 /metrics 需携带 Bearer token
+METRICS_FLUSH_SECONDS = float(_env("METRICS_FLUSH_SECONDS", "2"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+
+# JSON 响应压缩（gzip/br）：响应体超过阈值才压缩；等级越高压缩率越高、CPU 开销越大
+RESPONSE_COMPRESSION_ENABLED = _env("RESPONSE_COMPRESSION_ENABLED", "1") == "1"
+RESPONSE_COMPRESSION_MIN_BYTES = int(_env("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(_env("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(_env("RESPONSE_BROTLI_QUALITY", "5"))
+# 进程内缓存的压缩结果条数（相同响应体复用）
+RESPONSE_COMPRESSION_CACHE_ENTRIES = int(_env("RESPONSE_COMPRESSION_CACHE_ENTRIES", "256"))
+
+# /api/batch 单次最多合并的子请求数
+BATCH_MAX_REQUESTS = int(_env("BATCH_MAX_REQUESTS", "10"))
+
+# 座位余量 SSE 推送：空闲时的保活间隔（秒）
+SSE_HEARTBEAT_SECONDS = float(_env("SSE_HEARTBEAT_SECONDS", "15"))
+# WSGI（gthread）模式下每条 SSE 连接占一个 worker 线程，默认不提供（返回 503，页面改为轮询）；
+# 实时推送应由 ASGI 模式或单独部署的进程提供，确需在 WSGI 进程内提供时设为 1
+SSE_IN_WSGI = _env("SSE_IN_WSGI", "0") == "1"
+# SSE_IN_WSGI=1 时每个进程最多同时保持的 SSE 连接数，按 gunicorn 线程数取值：默认为线程数的 1/4，
+# 且至少给其余接口留一个线程；ASGI 模式不受限
+_GUNICORN_THREADS = int(_env("GUNICORN_THREADS", "8"))
+SSE_MAX_STREAMS_PER_PROCESS = max(
+    1, min(int(_env("SSE_MAX_STREAMS_PER_PROCESS", str(_GUNICORN_THREADS // 4))), _GUNICORN_THREADS - 1)
+)
+
+# 写接口幂等（Idempotency-Key）：成功响应保留秒数；处理中占位的最长持有秒数
+IDEMPOTENCY_TTL_SECONDS = int(_env("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = int(_env("IDEMPOTENCY_LOCK_SECONDS", "30"))
+
+# 读请求合并（single-flight）：相同参数的并发查询只执行一次
+SINGLE_FLIGHT_ENABLED = _env("SINGLE_FLIGHT_ENABLED", "1") == "1"
+# 跨进程合并（经 Redis 共享结果）；结果在 Redis 中保留的毫秒数
+SINGLE_FLIGHT_REDIS = _env("SINGLE_FLIGHT_REDIS", "0") == "1"
+SINGLE_FLIGHT_RESULT_TTL_MS = int(_env("SINGLE_FLIGHT_RESULT_TTL_MS", "500"))
+# 等待其他请求计算结果的最长秒数，超时后自行查询
+SINGLE_FLIGHT_WAIT_SECONDS = float(_env("SINGLE_FLIGHT_WAIT_SECONDS", "5"))
+
+# 秒杀模式：下单只做 Redis 准入并写入 Stream，订单由 tools/order_worker.py 批量落库
+SECKILL_MODE = _env("SECKILL_MODE", "0") == "1"
+ORDER_STREAM_BATCH = int(_env("ORDER_STREAM_BATCH", "200"))
+# 其他 consumer 的消息空闲超过该毫秒数视为其已崩溃，由存活的 worker 认领
+ORDER_STREAM_CLAIM_IDLE_MS = int(_env("ORDER_STREAM_CLAIM_IDLE_MS", "60000"))
+# 同一条消息投递（落库尝试）达到该次数仍失败时放弃：订单置为 failed 并归还座位
+ORDER_STREAM_MAX_DELIVERIES = int(_env("ORDER_STREAM_MAX_DELIVERIES", "5"))
+# 秒杀订单处理状态（供客户端轮询）在 Redis 中保留的秒数
+ORDER_STATUS_TTL_SECONDS = int(_env("ORDER_STATUS_TTL_SECONDS", "3600"))
+
+# 锁位历史（lock_records）写后批量落库：单批最多条数；不足一批时的攒批等待毫秒数
+LOCK_HISTORY_BATCH = int(_env("LOCK_HISTORY_BATCH", "500"))
+LOCK_HISTORY_FLUSH_MS = int(_env("LOCK_HISTORY_FLUSH_MS", "5"))
+# Web 进程是否参与锁位历史写入的 leader 选举（设为 0 时需单独运行 tools/lock_history_writer.py）
+LOCK_HISTORY_IN_WEB = _env("LOCK_HISTORY_IN_WEB", "1") == "1"
+LOCK_HISTORY_LEASE_MS = int(_env("LOCK_HISTORY_LEASE_MS", "5000"))
+
+# 未支付订单自动取消：默认支付时限（分钟，场次可用 Pay_Timeout_Minutes 单独设置）
+ORDER_PAY_TIMEOUT_MINUTES = int(_env("ORDER_PAY_TIMEOUT_MINUTES", "30"))
+# Web 进程是否参与超时取消的 leader 选举（设为 0 时需单独运行 tools/order_expirer.py）
+ORDER_EXPIRER_IN_WEB = _env("ORDER_EXPIRER_IN_WEB", "1") == "1"
+ORDER_EXPIRE_INTERVAL_SECONDS = float(_env("ORDER_EXPIRE_INTERVAL_SECONDS", "5"))
+ORDER_EXPIRE_BATCH = int(_env("ORDER_EXPIRE_BATCH", "500"))
+ORDER_EXPIRER_LEASE_MS = int(_env("ORDER_EXPIRER_LEASE_MS", "5000"))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import pymongo
+
+from nosql.config import BATCH_POOL_SIZE, QUERY_POOL_SIZE, QUERY_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 线程池按用途隔离：query（报表/仪表盘并行查询）、batch（/api/batch 子请求）
+_POOL_SIZES = {"query": QUERY_POOL_SIZE, "batch": BATCH_POOL_SIZE}
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executor_guard = threading.Lock()
+_local = threading.local()
+
+
+def get_executor(name: str = "query") -> ThreadPoolExecutor:
+    pool = _executors.get(name)
+    if pool is None:
+        with _executor_guard:
+            pool = _executors.get(name)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=_POOL_SIZES[name], thread_name_prefix=name)
+                _executors[name] = pool
+    return pool
+
+
+def reset_executor() -> None:
+    """fork 后子进程中父进程的池线程已不存在，丢弃旧线程池，下次使用时重建。"""
+    global _executors, _executor_guard
+    _executors = {}
+    _executor_guard = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_executor)
+
+
+def _run_task(fn: Callable[[], Any], seconds: float) -> Any:
+    _local.in_pool = True
+    try:
+        # pymongo.timeout 让服务端查询在超时后同样放弃，避免占住池内线程
+        with pymongo.timeout(seconds):
+            return fn()
+    finally:
+        _local.in_pool = False
+
+
+def run_parallel(
+    tasks: Mapping[str, Callable[[], Any]], timeout: Optional[float] = None, pool: str = "query"
+) -> Dict[str, Any]:
+    """
+    并行执行互不依赖的查询，返回 {name: result}。
+    - timeout：每个查询自提交起允许的最长秒数（默认 QUERY_TIMEOUT_SECONDS），超时抛 TimeoutError
+    - 任一查询抛异常则原样抛出，其余未开始的查询被取消
+    - 若已在池内线程中调用（嵌套），改为顺序执行，避免线程池被自身占满而死锁
+    - pool：使用的线程池（query / batch），不同用途互不挤占
+    """
+    if not tasks:
+        return {}
+    seconds = QUERY_TIMEOUT_SECONDS if timeout is None else float(timeout)
+
+    if getattr(_local, "in_pool", False):
+        with pymongo.timeout(seconds):
+            return {name: fn() for name, fn in tasks.items()}
+
+    executor = get_executor(pool)
+    deadline = time.monotonic() + seconds
+    futures = {name: executor.submit(_run_task, fn, seconds) for name, fn in tasks.items()}
+    results: Dict[str, Any] = {}
+    try:
+        for name, fut in futures.items():
+            try:
+                results[name] = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                logger.warning(f"parallel query timeout: {name} (>{seconds}s)")
+                raise TimeoutError(f"查询超时: {name}")
+    finally:
+        for fut in futures.values():
+            fut.cancel()
+    return results
+
+
+def month_partitions(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """把 [start, end) 按自然月边界切成若干左闭右开区间。"""
+    parts: List[Tuple[datetime, datetime]] = []
+    lo = start
+    while lo < end:
+        month0 = lo.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month0.replace(day=28) + timedelta(days=4)).replace(day=1)
+        hi = min(next_month, end)
+        parts.append((lo, hi))
+        lo = hi
+    return parts
+
+
+def run_partitioned(
+    start: datetime,
+    end: datetime,
+    fn: Callable[[datetime, datetime], Any],
+    timeout: Optional[float] = None,
+) -> List[Any]:
+    """
+    把时间范围按月切分后在线程池中并行执行 fn(lo, hi)，按时间顺序返回各分区结果。
+    合并由调用方负责：求和/计数可直接相加，Top-K 必须在合并后再取（分区内不能先截断）。
+    """
+    parts = month_partitions(start, end)
+    tasks = {f"{lo:%Y-%m-%d}~{hi:%Y-%m-%d}": (lambda lo=lo, hi=hi: fn(lo, hi)) for lo, hi in parts}
+    results = run_parallel(tasks, timeout)
+    return [results[name] for name in tasks]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+写接口幂等：客户端在请求头 Idempotency-Key 中携带同一个值重试时，直接返回首次成功的响应。
+
+- key = idem:{用户ID}:{Idempotency-Key}；同一个 key 只能用于同一个请求（方法 + 路径 + 请求体摘要）
+- 处理中：先写入 "P|{owner}|{摘要}" 占位（IDEMPOTENCY_LOCK_SECONDS 过期，防止进程崩溃后永远卡住）
+- 成功（2xx）：用首个响应覆盖占位，保留 IDEMPOTENCY_TTL_SECONDS
+- 失败：删除占位，允许客户端用同一个 key 重试（业务校验失败不会产生副作用）
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import re
+import uuid
+from typing import Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from nosql.config import IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_TTL_SECONDS
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_.:\-]{1,128}$")
+_PENDING_PREFIX = "P|"
+
+# 不存在则写入占位并返回 nil；存在则原样返回已有值（单次往返完成“检查 + 占位”）
+_LUA_BEGIN = r"""
+local v = redis.call('GET', KEYS[1])
+if v then
+  return v
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', tonumber(ARGV[2]))
+return false
+"""
+
+# 只有占位的持有者才能写入结果/删除占位（占位过期后被他人接手的情况）
+_LUA_FINISH = r"""
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+  return 0
+end
+if ARGV[2] == '' then
+  redis.call('DEL', KEYS[1])
+else
+  redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+end
+return 1
+"""
+
+# begin() 的结果
+ACQUIRED = "acquired"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+UNAVAILABLE = "unavailable"
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY_PATTERN.match(key or ""))
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha1(f"{method} {path}\n".encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+def _redis_key(user_id: int, key: str) -> str:
+    return f"idem:{int(user_id)}:{key}"
+
+
+def begin(user_id: int, key: str, fp: str) -> Tuple[str, Optional[object]]:
+    """
+    尝试占用幂等 key，返回 (状态, 附加值)：
+    - ACQUIRED：首次请求，附加值为占位 token（交给 finish）
+    - REPLAY：已有成功结果，附加值为缓存的响应 dict
+    - IN_PROGRESS：同一 key 的请求正在处理
+    - MISMATCH：同一 key 被用于不同的请求
+    - UNAVAILABLE：Redis 不可用，按普通请求处理
+    """
+    token = f"{_PENDING_PREFIX}{uuid.uuid4().hex}|{fp}"
+    try:
+        existing = get_redis().eval(_LUA_BEGIN, 1, _redis_key(user_id, key), token, IDEMPOTENCY_LOCK_SECONDS)
+    except RedisError as e:
+        logger.warning(f"idempotency store unavailable, processing without it: {e}")
+        return UNAVAILABLE, None
+    if existing is None:
+        return ACQUIRED, token
+    if existing.startswith(_PENDING_PREFIX):
+        return (IN_PROGRESS if existing.rsplit("|", 1)[-1] == fp else MISMATCH), None
+    record = json.loads(existing)
+    if record.get("fp") != fp:
+        return MISMATCH, None
+    return REPLAY, record
+
+
+def finish(user_id: int, key: str, token: str, status: int, body: bytes, headers: dict) -> None:
+    """2xx 保存响应供重试复用，其余状态删除占位。"""
+    if 200 <= int(status) < 300:
+        fp = token.rsplit("|", 1)[-1]
+        value = json.dumps(
+            {
+                "fp": fp,
+                "status": int(status),
+                "body": base64.b64encode(body).decode("ascii"),
+                "headers": headers,
+            }
+        )
+    else:
+        value = ""
+    try:
+        get_redis().eval(_LUA_FINISH, 1, _redis_key(user_id, key), token, value, IDEMPOTENCY_TTL_SECONDS)
+    except RedisError as e:
+        logger.warning(f"idempotency result not stored: {e}")
+
+
+def decode_body(record: dict) -> bytes:
+    return base64.b64decode(record.get("body") or "")
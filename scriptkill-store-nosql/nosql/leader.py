@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+基于 Redis 租约的 leader 选举：多个进程/主机竞争同一个 key，只有持有租约者执行后台任务。
+
+- 获取：SET key owner NX PX ttl
+- 续约：仅当 key 仍属于自己时 PEXPIRE（Lua 原子判断）
+- leader 崩溃或失联后租约在 ttl 内自然过期，其余候选者下一次 tick 即可接管
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from redis.exceptions import RedisError
+
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_LUA_RENEW = r"""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_LUA_RELEASE = r"""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    def __init__(self, name: str, ttl_ms: int):
+        self.key = f"leader:{name}"
+        self.ttl_ms = int(ttl_ms)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def acquire_or_renew(self) -> bool:
+        """尝试成为/保持 leader；Redis 不可用时视为失去租约。"""
+        r = get_redis()
+        try:
+            if self.is_leader and int(r.eval(_LUA_RENEW, 1, self.key, self.owner, self.ttl_ms)) == 1:
+                return True
+            acquired = bool(r.set(self.key, self.owner, nx=True, px=self.ttl_ms))
+        except RedisError as e:
+            logger.warning(f"leader 租约续期失败: {self.key}: {e}")
+            acquired = False
+
+        if acquired != self.is_leader:
+            logger.info(f"{'成为' if acquired else '失去'} leader: {self.key} ({self.owner})")
+        self.is_leader = acquired
+        return acquired
+
+    def renew(self) -> bool:
+        """仅续约（不重新竞争）：租约中途失效过则返回 False，调用方应放弃基于旧租约读取的数据。"""
+        if not self.is_leader:
+            return False
+        try:
+            renewed = int(get_redis().eval(_LUA_RENEW, 1, self.key, self.owner, self.ttl_ms)) == 1
+        except RedisError as e:
+            logger.warning(f"leader 租约续期失败: {self.key}: {e}")
+            renewed = False
+        if not renewed:
+            logger.info(f"失去 leader: {self.key} ({self.owner})")
+            self.is_leader = False
+        return renewed
+
+    def release(self) -> None:
+        if not self.is_leader:
+            return
+        try:
+            get_redis().eval(_LUA_RELEASE, 1, self.key, self.owner)
+        except RedisError as e:
+            logger.warning(f"释放 leader 租约失败: {self.key}: {e}")
+        self.is_leader = False
+
+
+def run_as_leader(
+    name: str,
+    task: Callable[[], object],
+    interval: float,
+    lease_ttl_ms: int,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    循环：每秒续约一次租约，持有租约时每 interval 秒执行一次 task。
+    租约 ttl 应大于续约间隔（1s）的数倍，避免抖动导致频繁换主。
+    """
+    stop = stop or threading.Event()
+    lease = LeaderLease(name, lease_ttl_ms)
+    tick = min(1.0, float(interval))
+    next_run = 0.0
+    try:
+        while not stop.is_set():
+            if lease.acquire_or_renew() and time.monotonic() >= next_run:
+                try:
+                    task()
+                except Exception as e:
+                    logger.warning(f"{name} 执行失败: {e}")
+                next_run = time.monotonic() + float(interval)
+            stop.wait(tick)
+    finally:
+        lease.release()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+锁位历史写后（write-behind）：lock_records 的新增与状态变更不在请求中直接写 Mongo，
+而是由锁位 Lua 脚本（与 Redis 锁位同一原子操作）追加到 Stream lockhist:stream，再批量写入。
+
+- 消息：insert（锁位）/ cancel（取消）/ convert（转订单）/ expire（过期回收）
+- 写入者：所有进程竞争 leader 租约，只有 leader 消费（同一锁位的变更必须按顺序落库），
+  每次最多取 LOCK_HISTORY_BATCH 条，不足时再等待 LOCK_HISTORY_FLUSH_MS 攒批，以一次有序 bulk_write 写入后 XACK
+- 每批写入前确认仍持有租约（仅续约，不重新竞争），失去租约则放弃本批不 ACK；
+  写入耗时以半个租约为上限（超时后服务端同样放弃），避免与新 leader 并发写入导致乱序
+- 崩溃恢复：消费组内固定使用同一个 consumer 名，新 leader 先重放已投递未 ACK 的消息；
+  所有操作都可重复执行，且与到达顺序无关：insert 只 $set 锁位字段、Status 用 $setOnInsert，
+  取消/转订单为按 _id 的 upsert（先于 insert 到达时留下只有 Status 的墓碑，insert 补全字段但不覆盖状态）
+- 有效锁位以 Redis 为准，lock_records 相对 Redis 最多延迟一个批次
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pymongo
+from pymongo import UpdateMany, UpdateOne
+from redis.exceptions import ResponseError
+
+from nosql.config import LOCK_HISTORY_BATCH, LOCK_HISTORY_FLUSH_MS, LOCK_HISTORY_LEASE_MS
+from nosql.leader import LeaderLease
+from nosql.mongo import col
+from nosql.redis_client import get_redis
+from nosql.seat_lock_service import LOCK_HISTORY_STREAM
+
+logger = logging.getLogger(__name__)
+
+GROUP = "lockhist-writers"
+# 有序消费：只有 leader 读取，所有 leader 共用同一个 consumer 名以继承未 ACK 的消息
+_CONSUMER = "leader"
+
+# lock_records.Status
+STATUS_CONVERTED = 1
+STATUS_CANCELLED = 2
+STATUS_EXPIRED = 3
+
+_SCHEDULE_FIELDS = {
+    "Script_ID": 1,
+    "Script_Title": 1,
+    "Start_Time": 1,
+    "Room_ID": 1,
+    "Room_Name": 1,
+    "DM_ID": 1,
+    "DM_Name": 1,
+}
+
+Entry = Tuple[str, Dict[str, str]]
+
+
+def _from_ms(value: str) -> datetime:
+    return datetime.fromtimestamp(int(value) / 1000.0)
+
+
+def _build_requests(entries: List[Entry]) -> list:
+    sids = {int(f["schedule_id"]) for _, f in entries if f.get("op") == "insert"}
+    schedules = (
+        {int(s["_id"]): s for s in col("schedules").find({"_id": {"$in": sorted(sids)}}, _SCHEDULE_FIELDS)}
+        if sids
+        else {}
+    )
+
+    requests = []
+    for entry_id, f in entries:
+        op = f.get("op")
+        if op == "insert":
+            lock_id = int(f["lock_id"])
+            schedule_id = int(f["schedule_id"])
+            sch = schedules.get(schedule_id, {})
+            doc = {
+                "LockID": lock_id,
+                "Schedule_ID": schedule_id,
+                "Player_ID": int(f["player_id"]),
+                "LockTime": _from_ms(f["lock_ms"]),
+                "ExpireTime": _from_ms(f["expire_ms"]),
+                "Status": 0,
+                # 反范式字段
+                "Script_ID": sch.get("Script_ID"),
+                "Script_Title": sch.get("Script_Title"),
+                "Start_Time": sch.get("Start_Time"),
+                "Room_ID": sch.get("Room_ID"),
+                "Room_Name": sch.get("Room_Name"),
+                "DM_ID": sch.get("DM_ID"),
+                "DM_Name": sch.get("DM_Name"),
+            }
+            # Status 只在新建时写入：取消/转订单先到时不会被覆盖回 0
+            status = doc.pop("Status")
+            requests.append(UpdateOne({"_id": lock_id}, {"$set": doc, "$setOnInsert": {"Status": status}}, upsert=True))
+        elif op in ("cancel", "convert"):
+            status = STATUS_CANCELLED if op == "cancel" else STATUS_CONVERTED
+            requests.append(UpdateOne({"_id": int(f["lock_id"])}, {"$set": {"Status": status}}, upsert=True))
+        elif op == "expire":
+            requests.append(
+                UpdateMany(
+                    {
+                        "Schedule_ID": int(f["schedule_id"]),
+                        "Player_ID": int(f["player_id"]),
+                        "Status": 0,
+                        "ExpireTime": {"$lte": _from_ms(f["at_ms"])},
+                    },
+                    {"$set": {"Status": STATUS_EXPIRED}},
+                )
+            )
+        else:
+            logger.warning(f"unknown lock history op {op!r} in {entry_id}, skipped")
+    return requests
+
+
+def _ensure_group(r) -> None:
+    try:
+        r.xgroup_create(LOCK_HISTORY_STREAM, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _read(r, stream_id: str, count: int, block: Optional[int] = None) -> List[Entry]:
+    resp = r.xreadgroup(GROUP, _CONSUMER, {LOCK_HISTORY_STREAM: stream_id}, count=count, block=block)
+    return [(entry_id, fields) for entry_id, fields in (resp[0][1] if resp else [])]
+
+
+def _write(r, entries: List[Entry], lease: LeaderLease) -> bool:
+    """写入一批并 ACK；写入前租约已失效则放弃本批（不 ACK，由新 leader 重放），返回是否写入。"""
+    if not lease.renew():
+        logger.warning(f"lock history lease lost, dropped batch of {len(entries)}")
+        return False
+    requests = _build_requests([(entry_id, fields) for entry_id, fields in entries if fields])
+    if requests:
+        with pymongo.timeout(lease.ttl_ms / 2000.0):
+            col("lock_records").bulk_write(requests, ordered=True)
+    ids = [entry_id for entry_id, _ in entries]
+    pipe = r.pipeline(transaction=False)
+    pipe.xack(LOCK_HISTORY_STREAM, GROUP, *ids)
+    pipe.xdel(LOCK_HISTORY_STREAM, *ids)
+    pipe.execute()
+    return True
+
+
+def flush_pending(lease: LeaderLease, r=None) -> int:
+    """重放已投递但未 ACK 的消息（上一任 leader 崩溃遗留），返回处理条数。"""
+    r = r or get_redis()
+    _ensure_group(r)
+    total = 0
+    while True:
+        entries = _read(r, "0", LOCK_HISTORY_BATCH)
+        if not entries or not _write(r, entries, lease):
+            return total
+        total += len(entries)
+
+
+def flush_once(lease: LeaderLease, r=None, block_ms: int = 500) -> int:
+    """读取一批新消息写入 Mongo：最多 LOCK_HISTORY_BATCH 条，不足时再等待 LOCK_HISTORY_FLUSH_MS 攒批。"""
+    r = r or get_redis()
+    entries = _read(r, ">", LOCK_HISTORY_BATCH, block=block_ms)
+    if not entries:
+        return 0
+    if len(entries) < LOCK_HISTORY_BATCH and LOCK_HISTORY_FLUSH_MS > 0:
+        time.sleep(LOCK_HISTORY_FLUSH_MS / 1000.0)
+        entries += _read(r, ">", LOCK_HISTORY_BATCH - len(entries))
+    return len(entries) if _write(r, entries, lease) else 0
+
+
+def run_writer(stop: Optional[threading.Event] = None) -> None:
+    """
+    写入循环：每秒续约一次 leader 租约，持有租约期间持续消费。阻塞运行，直到 stop 被设置。
+    写入失败的批次不 ACK，下一轮先作为未 ACK 消息重放，保证顺序。
+    """
+    stop = stop or threading.Event()
+    lease = LeaderLease("lock_history", LOCK_HISTORY_LEASE_MS)
+    try:
+        while not stop.is_set():
+            if not lease.acquire_or_renew():
+                stop.wait(1.0)
+                continue
+            renew_at = time.monotonic() + 1.0
+            try:
+                r = get_redis()
+                flush_pending(lease, r)
+                while lease.is_leader and not stop.is_set() and time.monotonic() < renew_at:
+                    flush_once(lease, r)
+            except Exception as e:
+                logger.warning(f"lock history flush failed: {e}")
+                stop.wait(1.0)
+    finally:
+        lease.release()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+进程内指标 + Redis 汇总，按 Prometheus 文本格式输出。
+
+- 计数器/直方图：请求线程只改进程内字典，后台线程每 METRICS_FLUSH_SECONDS 把增量
+  用 HINCRBYFLOAT 合并到 Redis hash（metrics:counters），因此多进程、多主机的数值天然相加
+- 仪表（in-flight）：每个进程把当前值写到 metrics:gauges:{instance}（带过期），输出时对存活实例求和
+- Mongo 耗时：pymongo CommandListener 按上下文（线程或协程）累计当前请求内的命令耗时（不含并行查询池线程）
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+from redis.exceptions import RedisError
+
+from nosql.config import METRICS_FLUSH_SECONDS
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS_KEY = "metrics:counters"
+_GAUGE_KEY_PREFIX = "metrics:gauges:"
+_INSTANCES_KEY = "metrics:instances"
+_REPORT_CACHE_KEY = "rpt:metrics"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 指标族 -> (类型, 说明)
+_FAMILIES: Dict[str, Tuple[str, str]] = {
+    "api_requests_total": ("counter", "HTTP requests by route, method and status"),
+    "api_request_duration_seconds": ("histogram", "HTTP request latency by route"),
+    "api_request_mongo_seconds_total": ("counter", "Time spent in MongoDB commands while serving requests"),
+    "api_requests_in_flight": ("gauge", "Requests currently being served"),
+    "seat_locks_total": ("counter", "Seat lock attempts by result"),
+    "seat_locks_reclaimed_total": ("counter", "Expired seat locks whose seat was returned"),
+    "orders_auto_cancelled_total": ("counter", "Unpaid orders cancelled after their payment deadline"),
+    "orders_dead_lettered_total": ("counter", "Seckill orders given up after repeated persistence failures"),
+    "report_cache_events_total": ("counter", "Report cache lookups by report and result"),
+}
+
+_lock = threading.Lock()
+_pending: Dict[str, float] = defaultdict(float)
+_in_flight = 0
+_flusher_pid: Optional[int] = None
+_instance = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+# 用可变列表承载累计值：ASGI 下子任务复制上下文后仍累加到同一个对象
+_mongo_spent: ContextVar[Optional[List[float]]] = ContextVar("metrics_mongo_spent", default=None)
+
+
+def _labels(**labels: object) -> str:
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _add(series: Iterable[Tuple[str, float]]) -> None:
+    with _lock:
+        for field, value in series:
+            _pending[field] += value
+    _ensure_flusher()
+
+
+def inc(name: str, amount: float = 1.0, **labels: object) -> None:
+    _add([(name + (_labels(**labels) if labels else ""), amount)])
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, mongo_seconds: float) -> None:
+    base = _labels(method=method, route=route)
+    series: List[Tuple[str, float]] = [
+        ("api_requests_total" + _labels(method=method, route=route, status=status), 1),
+        ("api_request_duration_seconds_sum" + base, seconds),
+        ("api_request_duration_seconds_count" + base, 1),
+        ("api_request_mongo_seconds_total" + base, mongo_seconds),
+    ]
+    for le in LATENCY_BUCKETS:
+        if seconds <= le:
+            series.append((f"api_request_duration_seconds_bucket{base[:-1]},le=\"{le:g}\"}}", 1))
+    series.append((f"api_request_duration_seconds_bucket{base[:-1]},le=\"+Inf\"}}", 1))
+    _add(series)
+
+
+def request_started() -> None:
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+    _mongo_spent.set([0.0])
+
+
+def request_finished() -> float:
+    """结束请求计时，返回本请求内 Mongo 命令累计耗时（秒）。"""
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+    spent = _mongo_spent.get()
+    _mongo_spent.set(None)
+    return spent[0] if spent else 0.0
+
+
+class _MongoTimer(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._add(event.duration_micros)
+
+    def failed(self, event):
+        self._add(event.duration_micros)
+
+    @staticmethod
+    def _add(micros: int) -> None:
+        spent = _mongo_spent.get()
+        if spent is not None:
+            spent[0] += micros / 1_000_000.0
+
+
+# 必须在创建 MongoClient 之前注册（客户端是懒加载的，导入本模块即可）
+monitoring.register(_MongoTimer())
+
+
+def flush() -> None:
+    """把本进程的增量与当前 in-flight 写入 Redis；失败时增量保留到下次。"""
+    with _lock:
+        deltas = dict(_pending)
+        _pending.clear()
+        in_flight = _in_flight
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for field, value in deltas.items():
+            if value:
+                pipe.hincrbyfloat(_COUNTERS_KEY, field, value)
+        gauge_key = _GAUGE_KEY_PREFIX + _instance
+        pipe.hset(gauge_key, "api_requests_in_flight", in_flight)
+        pipe.expire(gauge_key, max(10, int(METRICS_FLUSH_SECONDS * 3)))
+        pipe.sadd(_INSTANCES_KEY, _instance)
+        pipe.execute()
+    except RedisError as e:
+        with _lock:
+            for field, value in deltas.items():
+                _pending[field] += value
+        logger.warning(f"metrics flush failed: {e}")
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        flush()
+
+
+def _ensure_flusher() -> None:
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+def _reset_after_fork() -> None:
+    # 父进程的增量不属于子进程；子进程使用独立的实例名与锁，刷新线程在首次记录时重新启动
+    global _lock, _pending, _in_flight, _instance
+    _lock = threading.Lock()
+    _pending = defaultdict(float)
+    _in_flight = 0
+    _instance = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _family(field: str) -> str:
+    name = field.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in _FAMILIES:
+            return name[: -len(suffix)]
+    return name
+
+
+def _format_value(raw: str) -> str:
+    value = float(raw)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _sort_key(line: str):
+    """同一标签组的 bucket（按 le 升序）/sum/count 相邻输出。"""
+    field = line.rsplit(" ", 1)[0]
+    name, _, labels = field.partition("{")
+    le = float("inf")
+    parts = []
+    for part in labels.rstrip("}").split(","):
+        if part.startswith("le="):
+            le_text = part[4:-1]
+            le = float("inf") if le_text == "+Inf" else float(le_text)
+        else:
+            parts.append(part)
+    return ",".join(parts), name, le
+
+
+def render() -> str:
+    """汇总所有进程的指标，输出 Prometheus 文本格式。"""
+    flush()
+    r = get_redis()
+    grouped: Dict[str, List[str]] = defaultdict(list)
+
+    for field, value in r.hgetall(_COUNTERS_KEY).items():
+        grouped[_family(field)].append(f"{field} {_format_value(value)}")
+
+    in_flight = 0
+    for inst in r.smembers(_INSTANCES_KEY):
+        value = r.hget(_GAUGE_KEY_PREFIX + inst, "api_requests_in_flight")
+        if value is None:
+            r.srem(_INSTANCES_KEY, inst)
+            continue
+        in_flight += int(value)
+    grouped["api_requests_in_flight"].append(f"api_requests_in_flight {in_flight}")
+
+    # 报表缓存命中统计（report_cache 直接写在 rpt:metrics，字段为 name:hit|stale|miss）
+    for field, value in r.hgetall(_REPORT_CACHE_KEY).items():
+        report, _, result = field.rpartition(":")
+        grouped["report_cache_events_total"].append(
+            f"report_cache_events_total{_labels(report=report, result=result)} {int(value)}"
+        )
+
+    lines: List[str] = []
+    for family in sorted(grouped):
+        kind, help_text = _FAMILIES.get(family, ("untyped", ""))
+        if help_text:
+            lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        lines.extend(sorted(grouped[family], key=_sort_key))
+    return "\n".join(lines) + "\n"
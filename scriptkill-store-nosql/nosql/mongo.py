@@ -2,8 +2,9 @@
 from __future__ import annotations
 
 import logging
+import os
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional
 
 from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo import ReturnDocument
@@ -26,6 +27,20 @@ def get_client() -> MongoClient:
     return _client
 
 
+def reset_client() -> None:
+    """
+    丢弃当前进程持有的客户端（不 close：fork 后的子进程与父进程共享底层 socket，close 会影响父进程）。
+    下次 get_client() 时按需重建。
+    """
+    global _client, _db
+    _client = None
+    _db = None
+
+
+# MongoClient 不是 fork 安全的：子进程（gunicorn worker 等）必须使用自己的连接池
+os.register_at_fork(after_in_child=reset_client)
+
+
 def get_db() -> Database:
     global _db
     if _db is None:
@@ -87,6 +102,7 @@ def ensure_indexes() -> None:
     db["orders"].create_index([("Schedule_ID", ASCENDING)], name="idx_orders_schedule")
     db["orders"].create_index([("DM_ID", ASCENDING)], name="idx_orders_dm")
     db["orders"].create_index([("Pay_Status", ASCENDING)], name="idx_orders_pay_status")
+    db["orders"].create_index([("Create_Time", ASCENDING)], name="idx_orders_create_time")
     db["orders"].create_index(
         [("Player_ID", ASCENDING), ("Schedule_ID", ASCENDING), ("Pay_Status", ASCENDING)],
         name="idx_orders_player_schedule_status",
@@ -94,6 +110,11 @@ def ensure_indexes() -> None:
 
     db["transactions"].create_index([("Order_ID", ASCENDING)], name="idx_tx_order")
     db["transactions"].create_index([("Trans_Time", DESCENDING)], name="idx_tx_time")
+    # 营收趋势/仪表盘：等值条件在前、时间范围在后
+    db["transactions"].create_index(
+        [("Trans_Type", ASCENDING), ("Result", ASCENDING), ("Trans_Time", ASCENDING)],
+        name="idx_tx_type_result_time",
+    )
 
     db["lock_records"].create_index([("Player_ID", ASCENDING), ("LockTime", DESCENDING)], name="idx_locks_player_time")
     db["lock_records"].create_index([("Schedule_ID", ASCENDING)], name="idx_locks_schedule")
@@ -104,6 +125,16 @@ def ensure_indexes() -> None:
     logger.info("MongoDB indexes ensured.")
 
 
+def fields_projection(fields: Optional[Iterable[str]], default: Dict[str, Any]) -> Dict[str, Any]:
+    """把已校验的字段列表转成 Mongo projection；未指定字段时使用 default。"""
+    if not fields:
+        return default
+    projection: Dict[str, Any] = {"_id": 0}
+    for name in fields:
+        projection[name] = 1
+    return projection
+
+
 def project(doc: Dict[str, Any]) -> Dict[str, Any]:
     if not doc:
         return {}
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import PyMongoError
+
+from nosql.config import MONGO_DB_NAME, MONGO_URI
+
+logger = logging.getLogger(__name__)
+
+# PyMongo 原生异步客户端（4.13+，取代 Motor）；需在事件循环内首次使用
+_client: Optional[AsyncMongoClient] = None
+
+
+def get_client() -> AsyncMongoClient:
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(MONGO_URI, serverSelectionTimeoutMS=3000)
+    return _client
+
+
+def get_db() -> AsyncDatabase:
+    return get_client()[MONGO_DB_NAME]
+
+
+def col(name: str) -> AsyncCollection:
+    return get_db()[name]
+
+
+async def ping() -> bool:
+    try:
+        await get_client().admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def reset_client() -> None:
+    """丢弃当前进程持有的客户端（fork 后的子进程中调用，不做 close）。"""
+    global _client
+    _client = None
+
+
+os.register_at_fork(after_in_child=reset_client)
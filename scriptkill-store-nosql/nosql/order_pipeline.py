@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+"""
+秒杀模式下单（SECKILL_MODE=1）：请求线程只执行一次 Redis 准入脚本，订单由后台 worker 批量落库。
+
+准入（admit，单个 Lua 原子完成）：
+  - 去重：orderq:buyers:{schedule_id} 集合记录该场次已有有效订单的玩家（首次使用时从 Mongo 构建）
+  - 占座：有本人锁位则直接转订单（锁位记录的状态变更写入锁位历史 Stream），否则扣减 seats:{schedule_id}
+  - 分配订单号（独立号段，从 ORDER_ID_BASE 起递增，与同步下单的时间戳号不重叠）
+  - XADD 到 Stream orders:stream，写入订单状态 orderq:status:{order_id}=queued
+落库（run_worker，消费组 order-writers）：
+  - XREADGROUP 一次取一批，按场次一次查询反范式字段，insert_many(ordered=False) 写入订单
+  - 订单号随准入确定，重放时重复键即视为已写入，处理完成后 XACK
+  - worker 崩溃后未 ACK 的消息由同名 consumer 重启时重新处理，或被其他 consumer 按空闲时间认领
+  - 整批失败时逐条重试以定位问题消息；某条消息投递 ORDER_STREAM_MAX_DELIVERIES 次仍失败则放弃：
+    订单置为 failed、归还座位与去重名额后 XACK（已写入 Mongo 的订单直接置为 done）
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from redis.exceptions import RedisError, ResponseError
+
+from nosql.config import (
+    ORDER_STATUS_TTL_SECONDS,
+    ORDER_STREAM_BATCH,
+    ORDER_STREAM_CLAIM_IDLE_MS,
+    ORDER_STREAM_MAX_DELIVERIES,
+)
+from nosql.metrics import inc as metric_inc
+from nosql.mongo import col
+from nosql.pay_deadline import add_deadlines, deadline_for
+from nosql.redis_client import get_redis
+from nosql.seat_lock_service import (
+    LOCK_HISTORY_STREAM,
+    SEATS_CHANNEL,
+    _LOCK_EXP_ZSET,
+    _lock_key,
+    _seats_key,
+    ensure_seats_initialized,
+)
+from nosql.unique_players import record_player
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "orders:stream"
+GROUP = "order-writers"
+_ORDER_ID_KEY = "orderq:id"
+# 秒杀订单号起点：同步下单的号为 YYYYMMDDhhmmss + 随机数（约 2e13），且需小于 JS 安全整数 9e15
+ORDER_ID_BASE = 900_000_000_000_000
+
+STATUS_QUEUED = "queued"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def _buyers_key(schedule_id: int) -> str:
+    return f"orderq:buyers:{schedule_id}"
+
+
+def _status_key(order_id: int) -> str:
+    return f"orderq:status:{order_id}"
+
+
+_LUA_ADMIT = r"""
+local seatsKey = KEYS[1]
+local buyersKey = KEYS[2]
+local lockKey = KEYS[3]
+local expZset = KEYS[4]
+local streamKey = KEYS[5]
+local idKey = KEYS[6]
+local historyStream = KEYS[7]
+
+local playerId = ARGV[1]
+local channel = ARGV[2]
+local idBase = tonumber(ARGV[3])
+local statusTtl = tonumber(ARGV[4])
+local now = ARGV[5]
+
+if redis.call('EXISTS', seatsKey) == 0 or redis.call('EXISTS', buyersKey) == 0 then
+  return {-3, 0}
+end
+if redis.call('SISMEMBER', buyersKey, playerId) == 1 then
+  return {-1, 0}
+end
+
+local viaLock = 0
+local left
+local event
+local lockId = redis.call('GET', lockKey)
+if lockId and redis.call('DEL', lockKey) == 1 then
+  redis.call('ZREM', expZset, lockKey)
+  redis.call('XADD', historyStream, '*', 'op', 'convert', 'lock_id', lockId)
+  viaLock = 1
+  left = redis.call('GET', seatsKey) or '-1'
+  event = 'convert'
+else
+  if tonumber(redis.call('GET', seatsKey)) <= 0 then
+    return {-2, 0}
+  end
+  left = redis.call('DECR', seatsKey)
+  event = 'take'
+end
+
+if redis.call('EXISTS', idKey) == 0 then
+  redis.call('SET', idKey, idBase)
+end
+-- 15 位订单号：拼接字符串时需用 %d，避免 Lua 数字转字符串变成科学计数法
+local orderId = string.format('%d', redis.call('INCR', idKey))
+local scheduleId = string.sub(seatsKey, 7)
+
+redis.call('SADD', buyersKey, playerId)
+redis.call('XADD', streamKey, '*', 'order_id', orderId, 'schedule_id', scheduleId,
+  'player_id', playerId, 'via_lock', viaLock, 'created_at', now)
+local statusKey = 'orderq:status:' .. orderId
+redis.call('HSET', statusKey, 'status', 'queued', 'player_id', playerId, 'schedule_id', scheduleId)
+redis.call('EXPIRE', statusKey, statusTtl)
+redis.call('PUBLISH', channel, scheduleId .. ':' .. left .. ':' .. event)
+return {1, orderId}
+"""
+
+# 只有集合已构建时才更新（集合不存在时由 ensure_buyers_initialized 从 Mongo 完整构建）
+_LUA_ADD_BUYER = r"""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return redis.call('SADD', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+# 订单置为 failed 并归还座位与去重名额：仅当状态仍为 queued 时执行（消息重放时不会重复归还）
+_LUA_FAIL = r"""
+local statusKey = KEYS[1]
+local seatsKey = KEYS[2]
+local buyersKey = KEYS[3]
+if redis.call('HGET', statusKey, 'status') ~= 'queued' then
+  return 0
+end
+redis.call('HSET', statusKey, 'status', 'failed', 'error', ARGV[1])
+redis.call('EXPIRE', statusKey, tonumber(ARGV[2]))
+redis.call('SREM', buyersKey, ARGV[5])
+if redis.call('EXISTS', seatsKey) == 1 then
+  local left = redis.call('INCR', seatsKey)
+  redis.call('PUBLISH', ARGV[3], ARGV[4] .. ':' .. left .. ':release')
+end
+return 1
+"""
+
+
+def ensure_buyers_initialized(schedule_id: int) -> None:
+    """从 Mongo 构建场次的有效订单玩家集合（含占位成员 0，保证空场次也视为已构建）。"""
+    r = get_redis()
+    key = _buyers_key(schedule_id)
+    if r.exists(key):
+        return
+    players = col("orders").distinct(
+        "Player_ID", {"Schedule_ID": int(schedule_id), "Pay_Status": {"$in": [0, 1]}}
+    )
+    r.sadd(key, 0, *[int(p) for p in players])
+
+
+def remember_buyer(schedule_id: int, player_id: int) -> None:
+    """同步下单成功后登记玩家（切换到秒杀模式后仍能去重）。"""
+    try:
+        get_redis().eval(_LUA_ADD_BUYER, 1, _buyers_key(schedule_id), int(player_id))
+    except RedisError as e:
+        logger.warning(f"remember buyer failed: {e}")
+
+
+def forget_buyers(pairs: List[Tuple[int, int]]) -> None:
+    """订单取消后移除 (schedule_id, player_id)，玩家可重新预约。"""
+    if not pairs:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    for schedule_id, player_id in pairs:
+        pipe.srem(_buyers_key(schedule_id), int(player_id))
+    pipe.execute()
+
+
+def admit(player_id: int, schedule_id: int) -> int:
+    """秒杀准入：成功返回订单号（订单稍后由 worker 落库），失败抛出 ValueError。"""
+    r = get_redis()
+    keys = [
+        _seats_key(schedule_id),
+        _buyers_key(schedule_id),
+        _lock_key(schedule_id, player_id),
+        _LOCK_EXP_ZSET,
+        STREAM_KEY,
+        _ORDER_ID_KEY,
+        LOCK_HISTORY_STREAM,
+    ]
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for _ in range(2):
+        code, order_id = r.eval(
+            _LUA_ADMIT, len(keys), *keys, int(player_id), SEATS_CHANNEL, ORDER_ID_BASE, ORDER_STATUS_TTL_SECONDS, now
+        )
+        if int(code) != -3:
+            break
+        ensure_seats_initialized(int(schedule_id))
+        ensure_buyers_initialized(int(schedule_id))
+    if int(code) == -1:
+        raise ValueError("您已经预约过该场次，请勿重复预约")
+    if int(code) == -2:
+        raise ValueError("该场次已满")
+    if int(code) != 1:
+        raise ValueError("下单失败，请稍后重试")
+    return int(order_id)
+
+
+def get_status(order_id: int) -> Optional[dict]:
+    row = get_redis().hgetall(_status_key(order_id))
+    if not row:
+        return None
+    return {
+        "order_id": int(order_id),
+        "status": row.get("status"),
+        "player_id": int(row.get("player_id") or 0),
+        "schedule_id": int(row.get("schedule_id") or 0),
+        "error": row.get("error"),
+    }
+
+
+def _set_status(pipe, order_id: int, status: str, error: Optional[str] = None) -> None:
+    mapping = {"status": status}
+    if error:
+        mapping["error"] = error
+    pipe.hset(_status_key(order_id), mapping=mapping)
+    pipe.expire(_status_key(order_id), ORDER_STATUS_TTL_SECONDS)
+
+
+def _fail(r, order_id: int, schedule_id: int, player_id: int, error: str) -> bool:
+    """准入成功但无法落库的订单：置为 failed 并归还座位/去重名额，返回是否实际归还。"""
+    keys = [_status_key(order_id), _seats_key(schedule_id), _buyers_key(schedule_id)]
+    released = r.eval(
+        _LUA_FAIL, len(keys), *keys, error, ORDER_STATUS_TTL_SECONDS, SEATS_CHANNEL, int(schedule_id), int(player_id)
+    )
+    return bool(released)
+
+
+def _persist(entries: List[Tuple[str, Dict[str, str]]]) -> None:
+    """把一批准入消息写入 Mongo；抛出异常时整批不 ACK，稍后重试（订单号固定，重放是幂等的）。"""
+    items = []
+    for entry_id, fields in entries:
+        items.append(
+            {
+                "entry_id": entry_id,
+                "order_id": int(fields["order_id"]),
+                "schedule_id": int(fields["schedule_id"]),
+                "player_id": int(fields["player_id"]),
+                "created_at": datetime.strptime(fields["created_at"], "%Y-%m-%d %H:%M:%S"),
+            }
+        )
+
+    sids = sorted({it["schedule_id"] for it in items})
+    schedules = {int(s["_id"]): s for s in col("schedules").find({"_id": {"$in": sids}})}
+
+    docs = []
+    missing = []
+    for it in items:
+        sch = schedules.get(it["schedule_id"])
+        if sch is None:
+            missing.append(it)
+            continue
+        docs.append(
+            {
+                "_id": it["order_id"],
+                "Order_ID": it["order_id"],
+                "Player_ID": it["player_id"],
+                "Schedule_ID": it["schedule_id"],
+                "Amount": float(sch.get("Real_Price") or 0),
+                "Pay_Status": 0,
+                "Create_Time": it["created_at"],
+                "Pay_Deadline": deadline_for(sch, it["created_at"]),
+                # 反范式字段（用于列表/报表）
+                "Script_ID": sch.get("Script_ID"),
+                "Script_Title": sch.get("Script_Title"),
+                "Room_ID": sch.get("Room_ID"),
+                "Room_Name": sch.get("Room_Name"),
+                "DM_ID": sch.get("DM_ID"),
+                "DM_Name": sch.get("DM_Name"),
+                "Start_Time": sch.get("Start_Time"),
+            }
+        )
+
+    inserted = list(range(len(docs)))
+    if docs:
+        try:
+            col("orders").insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            # 重复键：上次处理到一半（已写入未 ACK），这些订单不再重复计数
+            duplicated = {err["index"] for err in errors}
+            inserted = [i for i in inserted if i not in duplicated]
+
+    # 支付时限：重放时重复 ZADD 无副作用
+    add_deadlines([(doc["_id"], doc["Pay_Deadline"]) for doc in docs])
+
+    booked: Dict[int, int] = {}
+    for i in inserted:
+        sid = docs[i]["Schedule_ID"]
+        booked[sid] = booked.get(sid, 0) + 1
+    ops = [UpdateOne({"_id": sid}, {"$inc": {"Booked_Count": n}}) for sid, n in booked.items()]
+    if ops:
+        col("schedules").bulk_write(ops, ordered=False)
+
+    for i in inserted:
+        doc = docs[i]
+        record_player(doc["Player_ID"], doc.get("Script_ID"), doc.get("DM_ID"), doc["Create_Time"])
+
+    r = get_redis()
+    pipe = r.pipeline(transaction=False)
+    for doc in docs:
+        _set_status(pipe, doc["_id"], STATUS_DONE)
+    pipe.execute()
+    for it in missing:
+        # 场次已被删除：归还座位与去重名额
+        _fail(r, it["order_id"], it["schedule_id"], it["player_id"], f"场次 {it['schedule_id']} 不存在")
+
+    logger.info(f"order pipeline persisted {len(inserted)} orders ({len(items)} messages)")
+
+
+def _ensure_group(r) -> None:
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _ack(r, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+    ids = [entry_id for entry_id, _ in entries]
+    pipe = r.pipeline(transaction=False)
+    pipe.xack(STREAM_KEY, GROUP, *ids)
+    pipe.xdel(STREAM_KEY, *ids)
+    pipe.execute()
+
+
+def _delivery_counts(r, entry_ids: List[str]) -> Dict[str, int]:
+    pipe = r.pipeline(transaction=False)
+    for entry_id in entry_ids:
+        pipe.xpending_range(STREAM_KEY, GROUP, min=entry_id, max=entry_id, count=1)
+    return {
+        entry_id: int(rows[0]["times_delivered"]) if rows else 0
+        for entry_id, rows in zip(entry_ids, pipe.execute())
+    }
+
+
+def _dead_letter(r, entries: List[Tuple[str, Dict[str, str]]], error: str) -> None:
+    """放弃多次落库失败的消息：未写入 Mongo 的订单置为 failed 并归还座位，之后 XACK。"""
+    parsed = []
+    for entry_id, fields in entries:
+        try:
+            parsed.append((int(fields["order_id"]), int(fields["schedule_id"]), int(fields["player_id"])))
+        except (KeyError, TypeError, ValueError):
+            logger.error(f"order pipeline dropped malformed message {entry_id}: {fields}")
+    order_ids = [order_id for order_id, _, _ in parsed]
+    persisted = {int(d["_id"]) for d in col("orders").find({"_id": {"$in": order_ids}}, {"_id": 1})} if order_ids else set()
+
+    pipe = r.pipeline(transaction=False)
+    for order_id in persisted:
+        _set_status(pipe, order_id, STATUS_DONE)
+    pipe.execute()
+    for order_id, schedule_id, player_id in parsed:
+        if order_id not in persisted:
+            _fail(r, order_id, schedule_id, player_id, "订单处理失败，请重新下单")
+    _ack(r, entries)
+    metric_inc("orders_dead_lettered_total", len(entries))
+    logger.error(f"order pipeline gave up {len(entries)} messages after {ORDER_STREAM_MAX_DELIVERIES} deliveries: {error}")
+
+
+def _process(r, entries: List[Tuple[str, Dict[str, str]]]) -> bool:
+    """处理一批消息，返回是否全部处理完毕（已落库或已放弃并 ACK）。"""
+    entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+    if not entries:
+        return True
+    try:
+        _persist(entries)
+        _ack(r, entries)
+        return True
+    except ConnectionFailure as e:
+        # Mongo 不可用：不是消息本身的问题，整批留在 pending 中等待恢复
+        logger.error(f"订单批量落库失败: {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"订单批量落库失败: {str(e)}")
+
+    # 逐条重试，定位无法落库的消息，其余消息正常落库
+    failed = []
+    for entry in entries:
+        try:
+            _persist([entry])
+            _ack(r, [entry])
+        except ConnectionFailure as e:
+            logger.error(f"订单落库失败: {str(e)}")
+            return False
+        except Exception as e:
+            failed.append((entry, str(e)))
+    if not failed:
+        return True
+
+    try:
+        counts = _delivery_counts(r, [entry_id for (entry_id, _), _ in failed])
+        exhausted = [(entry, error) for entry, error in failed if counts[entry[0]] >= ORDER_STREAM_MAX_DELIVERIES]
+        if exhausted:
+            _dead_letter(r, [entry for entry, _ in exhausted], exhausted[0][1])
+        return len(exhausted) == len(failed)
+    except Exception as e:
+        logger.error(f"订单消息放弃处理失败: {str(e)}")
+        return False
+
+
+def run_worker(consumer: str, batch: int = ORDER_STREAM_BATCH, stop: Optional[threading.Event] = None) -> None:
+    """
+    订单落库消费循环（独立进程运行，可启动多个，consumer 名称各不相同）。
+    启动时先处理本 consumer 未 ACK 的消息；运行中定期认领其他 consumer 空闲过久的消息。
+    """
+    pending_first = True
+    last_claim = 0.0
+    while not (stop and stop.is_set()):
+        try:
+            r = get_redis()
+            _ensure_group(r)
+
+            if pending_first:
+                # "0"：读取本 consumer 已投递未 ACK 的消息（上次崩溃遗留）
+                resp = r.xreadgroup(GROUP, consumer, {STREAM_KEY: "0"}, count=batch)
+                entries = resp[0][1] if resp else []
+                if not entries:
+                    pending_first = False
+                    continue
+                if not _process(r, entries):
+                    # 失败的消息留在 pending 中，每次重读投递次数 +1，达到上限后放弃
+                    time.sleep(1)
+                continue
+
+            if time.monotonic() - last_claim >= ORDER_STREAM_CLAIM_IDLE_MS / 1000.0:
+                last_claim = time.monotonic()
+                claimed = r.xautoclaim(STREAM_KEY, GROUP, consumer, ORDER_STREAM_CLAIM_IDLE_MS, count=batch)
+                if claimed and claimed[1]:
+                    # 认领后的消息归本 consumer 所有，失败时同样回到 pending 处理
+                    pending_first = not _process(r, claimed[1])
+                    continue
+
+            # 阻塞时长需小于 Redis 客户端 socket_timeout
+            resp = r.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=batch, block=1000)
+            if resp and not _process(r, resp[0][1]):
+                # 落库失败：回到 pending 处理，重试失败的消息直到成功或放弃
+                pending_first = True
+                time.sleep(1)
+        except RedisError as e:
+            logger.warning(f"order worker redis error: {e}")
+            time.sleep(1)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+未支付订单的支付时限（Redis 延迟队列）：zset orders:pay_deadline，member=订单号，score=截止时间（毫秒）。
+
+- 下单时写入（时限 = 场次 Pay_Timeout_Minutes，未设置时取 ORDER_PAY_TIMEOUT_MINUTES），支付/取消时移除
+- 取到期订单时不直接删除，而是把 score 推后 _CLAIM_RETRY_MS 作为“认领”：
+  处理完成后再移除；处理者中途崩溃则到期后被重新取出（取消操作是幂等的）
+- 批量取消逻辑见 OrderModel.cancel_overdue_orders
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from nosql.config import ORDER_PAY_TIMEOUT_MINUTES
+from nosql.redis_client import get_redis
+
+DEADLINE_ZSET = "orders:pay_deadline"
+_CLAIM_RETRY_MS = 60000
+
+_LUA_CLAIM_DUE = r"""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+  redis.call('ZADD', KEYS[1], tonumber(ARGV[3]), member)
+end
+return due
+"""
+
+
+def _ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def deadline_for(schedule: dict, created_at: datetime) -> datetime:
+    minutes = int(schedule.get("Pay_Timeout_Minutes") or ORDER_PAY_TIMEOUT_MINUTES)
+    return created_at + timedelta(minutes=minutes)
+
+
+def add_deadlines(items: Iterable[Tuple[int, datetime]]) -> None:
+    mapping = {str(int(order_id)): _ms(deadline) for order_id, deadline in items}
+    if mapping:
+        get_redis().zadd(DEADLINE_ZSET, mapping)
+
+
+def clear_deadlines(order_ids: Iterable[int]) -> None:
+    members = [str(int(x)) for x in order_ids]
+    if members:
+        get_redis().zrem(DEADLINE_ZSET, *members)
+
+
+def claim_due(limit: int) -> List[int]:
+    """认领最多 limit 个已到期的订单号（score 推后，处理完成后需 clear_deadlines）。"""
+    now_ms = _ms(datetime.now())
+    members = get_redis().eval(_LUA_CLAIM_DUE, 1, DEADLINE_ZSET, now_ms, int(limit), now_ms + _CLAIM_RETRY_MS)
+    return [int(m) for m in members]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from nosql.config import REDIS_DB, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
+
+logger = logging.getLogger(__name__)
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+        )
+    return _redis
+
+
+async def ping() -> bool:
+    try:
+        return bool(await get_redis().ping())
+    except Exception:
+        return False
+
+
+async def close() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+def reset_client() -> None:
+    """丢弃当前进程持有的客户端（fork 后的子进程中调用，不做 close）。"""
+    global _redis
+    _redis = None
+
+
+os.register_at_fork(after_in_child=reset_client)
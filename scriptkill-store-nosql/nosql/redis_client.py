@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import logging
+import os
 from typing import Optional
 
 import redis
@@ -28,6 +29,15 @@ def get_redis() -> redis.Redis:
     return _redis
 
 
+def reset_client() -> None:
+    """丢弃当前进程持有的客户端，下次 get_redis() 时重建（用于 fork 后的子进程）。"""
+    global _redis
+    _redis = None
+
+
+os.register_at_fork(after_in_child=reset_client)
+
+
 def ping() -> bool:
     try:
         return bool(get_redis().ping())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+import time
+import uuid
+from functools import wraps
+from typing import Any, Callable, Dict
+
+from redis.exceptions import RedisError
+
+from nosql.config import REPORT_CACHE_ENABLED
+from nosql.json_utils import to_jsonable
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_METRICS_KEY = "rpt:metrics"
+# 重算锁最长持有时间（毫秒），防止持锁进程崩溃后永远无人重算
+_RECOMPUTE_LOCK_MS = 30000
+# 既无当前值也无旧值时，等待持锁者写入的最长时间（秒）
+_WAIT_SECONDS = 3.0
+
+_LUA_UNLOCK = r"""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _cache_key(name: str, bucket: int, digest: str) -> str:
+    return f"rpt:{name}:{bucket}:{digest}"
+
+
+def _params_digest(params: Dict[str, Any]) -> str:
+    raw = json.dumps(to_jsonable(params), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _record(r, name: str, kind: str) -> None:
+    try:
+        r.hincrby(_METRICS_KEY, f"{name}:{kind}", 1)
+    except RedisError:
+        pass
+
+
+def get_or_compute(name: str, params: Dict[str, Any], ttl: int, compute: Callable[[], Any]) -> Any:
+    """
+    时间分桶缓存：key = rpt:{name}:{floor(now/ttl)}:{参数摘要}，Redis 过期时间为 2*ttl。
+    - 当前桶命中：直接返回（hit）
+    - 当前桶未命中：只有拿到重算锁的进程去计算（miss），其余进程返回上一个桶的旧值（stale）
+    - 连旧值也没有：短暂等待持锁者写入，超时则自行计算
+    Redis 不可用时直接计算，不影响报表可用性。
+    """
+    try:
+        r = get_redis()
+        digest = _params_digest(params)
+        bucket = int(time.time() // ttl)
+        key = _cache_key(name, bucket, digest)
+
+        raw = r.get(key)
+        if raw is not None:
+            _record(r, name, "hit")
+            return json.loads(raw)
+
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        if r.set(lock_key, token, nx=True, px=_RECOMPUTE_LOCK_MS):
+            _record(r, name, "miss")
+            try:
+                value = to_jsonable(compute())
+                try:
+                    r.set(key, json.dumps(value, ensure_ascii=False), ex=int(ttl) * 2)
+                except RedisError as e:
+                    logger.warning(f"report cache write failed: {name}: {e}")
+                return value
+            finally:
+                try:
+                    r.eval(_LUA_UNLOCK, 1, lock_key, token)
+                except RedisError:
+                    pass
+
+        stale = r.get(_cache_key(name, bucket - 1, digest))
+        if stale is not None:
+            _record(r, name, "stale")
+            return json.loads(stale)
+
+        deadline = time.monotonic() + _WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            raw = r.get(key)
+            if raw is not None:
+                _record(r, name, "hit")
+                return json.loads(raw)
+        _record(r, name, "miss")
+    except RedisError as e:
+        logger.warning(f"report cache unavailable, computing directly: {name}: {e}")
+    return to_jsonable(compute())
+
+
+def cached_report(name: str, ttl: int):
+    """
+    报表方法缓存装饰器：按方法名 + 全部参数（含 dm_id）生成缓存键。
+    原始函数保留在 wrapper.uncached，便于基准测试/后台任务绕过缓存。
+    """
+
+    def decorator(fn):
+        sig = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not REPORT_CACHE_ENABLED:
+                return fn(*args, **kwargs)
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return get_or_compute(name, dict(bound.arguments), ttl, lambda: fn(*args, **kwargs))
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    raw = get_redis().hgetall(_METRICS_KEY) or {}
+    stats: Dict[str, Dict[str, Any]] = {}
+    for field, value in raw.items():
+        name, _, kind = field.rpartition(":")
+        stats.setdefault(name, {"hit": 0, "stale": 0, "miss": 0})[kind] = int(value)
+    for row in stats.values():
+        total = row["hit"] + row["stale"] + row["miss"]
+        row["hit_rate"] = round((row["hit"] + row["stale"]) * 100.0 / total, 2) if total else 0.0
+    return stats
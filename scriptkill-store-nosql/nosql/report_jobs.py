@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from redis.exceptions import RedisError
+
+from nosql.config import REPORT_JOB_TTL_SECONDS, REPORT_WORKER_HEARTBEAT_SECONDS
+from nosql.json_utils import to_jsonable
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_KEY = "rptjob:queue"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def _job_key(job_id: str) -> str:
+    return f"rptjob:{job_id}"
+
+
+_PROCESSING_PREFIX = "rptjob:processing:"
+
+
+def _processing_key(worker_id: str) -> str:
+    return f"{_PROCESSING_PREFIX}{worker_id}"
+
+
+def _heartbeat_key(worker_id: str) -> str:
+    return f"rptjob:worker:{worker_id}"
+
+
+def _now_str() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def submit_job(report: str, params: Dict[str, Any], owner_id: int) -> str:
+    job_id = uuid.uuid4().hex
+    key = _job_key(job_id)
+    pipe = get_redis().pipeline()
+    pipe.hset(
+        key,
+        mapping={
+            "job_id": job_id,
+            "report": report,
+            "params": json.dumps(to_jsonable(params), ensure_ascii=False),
+            "owner_id": int(owner_id),
+            "status": STATUS_QUEUED,
+            "created_at": _now_str(),
+        },
+    )
+    pipe.expire(key, REPORT_JOB_TTL_SECONDS)
+    pipe.lpush(_QUEUE_KEY, job_id)
+    pipe.execute()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    row = get_redis().hgetall(_job_key(job_id))
+    if not row:
+        return None
+    job: Dict[str, Any] = dict(row)
+    job["owner_id"] = int(job.get("owner_id") or 0)
+    job["params"] = json.loads(job["params"]) if job.get("params") else {}
+    job["result"] = json.loads(job["result"]) if job.get("result") else None
+    return job
+
+
+def _run_job(r, job_id: str, handlers: Mapping[str, Callable[..., Any]]) -> None:
+    key = _job_key(job_id)
+    row = r.hgetall(key)
+    if not row:
+        # 已过期或被删除
+        return
+
+    report = row.get("report")
+    handler = handlers.get(report)
+    r.hset(key, mapping={"status": STATUS_RUNNING, "started_at": _now_str()})
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise ValueError(f"未知报表: {report}")
+        params = json.loads(row.get("params") or "{}")
+        result = to_jsonable(handler(**params))
+        r.hset(
+            key,
+            mapping={
+                "status": STATUS_DONE,
+                "result": json.dumps(result, ensure_ascii=False),
+                "finished_at": _now_str(),
+            },
+        )
+        logger.info(f"report job done: {job_id} {report} in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        r.hset(key, mapping={"status": STATUS_FAILED, "error": str(e), "finished_at": _now_str()})
+        logger.warning(f"report job failed: {job_id} {report}: {e}")
+    r.expire(key, REPORT_JOB_TTL_SECONDS)
+
+
+def _heartbeat_loop(worker_id: str, stop: threading.Event) -> None:
+    """独立线程定期刷新心跳（长任务执行期间主循环不会刷新）。"""
+    while not stop.is_set():
+        try:
+            get_redis().set(_heartbeat_key(worker_id), _now_str(), ex=REPORT_WORKER_HEARTBEAT_SECONDS)
+        except RedisError as e:
+            logger.warning(f"report worker heartbeat failed: {e}")
+        stop.wait(REPORT_WORKER_HEARTBEAT_SECONDS / 3.0)
+
+
+def _requeue(r, processing: str) -> int:
+    moved = 0
+    while r.rpoplpush(processing, _QUEUE_KEY):
+        moved += 1
+    return moved
+
+
+def requeue_orphaned_jobs(r, worker_id: str) -> int:
+    """把心跳已过期的 worker（已崩溃）的未完成任务重新入队，返回入队数量。"""
+    moved = 0
+    for processing in r.scan_iter(match=f"{_PROCESSING_PREFIX}*", count=100):
+        other = processing[len(_PROCESSING_PREFIX):]
+        if other == worker_id or r.exists(_heartbeat_key(other)):
+            continue
+        # RPOPLPUSH 逐条原子移动：多个 worker 同时回收同一列表时每个任务只入队一次
+        n = _requeue(r, processing)
+        if n:
+            logger.warning(f"requeued {n} report jobs from dead worker {other}")
+        moved += n
+    return moved
+
+
+def run_worker(
+    handlers: Mapping[str, Callable[..., Any]],
+    worker_id: str,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    报表任务消费循环（独立进程运行，与 Web 进程隔离）。
+    取任务用 BRPOPLPUSH 移入本 worker 的 processing 列表，完成后移除；
+    worker 以心跳 key 表明存活，启动时及每个心跳周期回收心跳已过期 worker 的 processing 列表，
+    以相同 worker_id 重启时本 worker 未完成的任务也会重新入队。
+    """
+    stop = stop or threading.Event()
+    processing = _processing_key(worker_id)
+    threading.Thread(target=_heartbeat_loop, args=(worker_id, stop), name="report-heartbeat", daemon=True).start()
+    while not stop.is_set():
+        try:
+            r = get_redis()
+            r.set(_heartbeat_key(worker_id), _now_str(), ex=REPORT_WORKER_HEARTBEAT_SECONDS)
+            _requeue(r, processing)
+            break
+        except RedisError as e:
+            logger.warning(f"report worker waiting for redis: {e}")
+            time.sleep(1)
+
+    next_recover = 0.0
+    while not stop.is_set():
+        try:
+            r = get_redis()
+            if time.monotonic() >= next_recover:
+                next_recover = time.monotonic() + REPORT_WORKER_HEARTBEAT_SECONDS
+                requeue_orphaned_jobs(r, worker_id)
+            # 阻塞时长需小于 Redis 客户端 socket_timeout
+            job_id = r.brpoplpush(_QUEUE_KEY, processing, timeout=1)
+            if not job_id:
+                continue
+            _run_job(r, job_id, handlers)
+            r.lrem(processing, 1, job_id)
+        except RedisError as e:
+            logger.warning(f"report worker redis error: {e}")
+            time.sleep(1)
@@ -2,10 +2,15 @@
 from __future__ import annotations
 
 import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
-from nosql.config import LOCK_MINUTES_DEFAULT
+from redis.exceptions import RedisError
+
+from nosql.config import LOCK_MINUTES_DEFAULT, LOCK_SWEEP_INTERVAL_SECONDS, LOCK_SWEEPER_LEASE_MS
+from nosql.leader import run_as_leader
+from nosql.metrics import inc as metric_inc
 from nosql.mongo import col
 from nosql.redis_client import get_redis
 
@@ -13,6 +18,10 @@ logger = logging.getLogger(__name__)
 
 _LOCK_ID_KEY = "lock:id"
 _LOCK_EXP_ZSET = "locks:exp"
+# 座位变化事件（pub/sub），消息格式：{schedule_id}:{剩余座位}:{事件}
+SEATS_CHANNEL = "seats:events"
+# 锁位历史变更（Redis Stream，由 nosql.lock_history 批量写入 Mongo lock_records）
+LOCK_HISTORY_STREAM = "lockhist:stream"
 
 
 def _lock_key(schedule_id: int, player_id: int) -> str:
@@ -23,6 +32,11 @@ def _seats_key(schedule_id: int) -> str:
     return f"seats:{schedule_id}"
 
 
+def _lock_index_key(lock_id: int) -> str:
+    # 锁位号 -> "{schedule_id}:{player_id}"，与锁位同时过期（取消锁位时按锁位号定位，不依赖 lock_records）
+    return f"lockid:{lock_id}"
+
+
 def get_active_lock_id(player_id: int, schedule_id: int) -> Optional[int]:
     r = get_redis()
     value = r.get(_lock_key(int(schedule_id), int(player_id)))
@@ -34,9 +48,14 @@ local lockKey = KEYS[1]
 local seatsKey = KEYS[2]
 local expZset = KEYS[3]
 local lockIdKey = KEYS[4]
+local historyStream = KEYS[5]
 
 local ttlMs = tonumber(ARGV[1])
 local expAtMs = tonumber(ARGV[2])
+local channel = ARGV[3]
+local scheduleId = ARGV[4]
+local playerId = ARGV[5]
+local lockAtMs = ARGV[6]
 
 if redis.call('EXISTS', lockKey) == 1 then
   return -1
@@ -48,9 +67,13 @@ if seats <= 0 then
 end
 
 local newId = redis.call('INCR', lockIdKey)
-redis.call('DECR', seatsKey)
+local left = redis.call('DECR', seatsKey)
 redis.call('SET', lockKey, newId, 'PX', ttlMs)
+redis.call('SET', 'lockid:' .. string.format('%d', newId), scheduleId .. ':' .. playerId, 'PX', ttlMs)
 redis.call('ZADD', expZset, expAtMs, lockKey)
+redis.call('XADD', historyStream, '*', 'op', 'insert', 'lock_id', newId, 'schedule_id', scheduleId,
+  'player_id', playerId, 'lock_ms', lockAtMs, 'expire_ms', ARGV[2])
+redis.call('PUBLISH', channel, string.sub(seatsKey, 7) .. ':' .. left .. ':lock')
 return newId
 """
 
@@ -58,10 +81,18 @@ _LUA_CANCEL_LOCK = r"""
 local lockKey = KEYS[1]
 local seatsKey = KEYS[2]
 local expZset = KEYS[3]
-
-if redis.call('DEL', lockKey) == 1 then
-  redis.call('INCR', seatsKey)
+local historyStream = KEYS[4]
+local channel = ARGV[1]
+local expectedId = ARGV[2]
+
+local lockId = redis.call('GET', lockKey)
+-- 指定锁位号时必须与当前锁位一致（同一玩家同一场次取消后重新锁位会得到新的锁位号）
+if lockId and (expectedId == '' or lockId == expectedId) and redis.call('DEL', lockKey) == 1 then
+  local left = redis.call('INCR', seatsKey)
   redis.call('ZREM', expZset, lockKey)
+  redis.call('DEL', 'lockid:' .. lockId)
+  redis.call('XADD', historyStream, '*', 'op', 'cancel', 'lock_id', lockId)
+  redis.call('PUBLISH', channel, string.sub(seatsKey, 7) .. ':' .. left .. ':cancel')
   return 1
 end
 return 0
@@ -70,9 +101,17 @@ return 0
 _LUA_CONVERT_LOCK = r"""
 local lockKey = KEYS[1]
 local expZset = KEYS[2]
+local seatsKey = KEYS[3]
+local historyStream = KEYS[4]
+local channel = ARGV[1]
 
-if redis.call('DEL', lockKey) == 1 then
+local lockId = redis.call('GET', lockKey)
+if lockId and redis.call('DEL', lockKey) == 1 then
   redis.call('ZREM', expZset, lockKey)
+  redis.call('XADD', historyStream, '*', 'op', 'convert', 'lock_id', lockId)
+  -- 锁位转订单不改变剩余座位，仍通知订阅方（锁定 -> 已预订）
+  local left = redis.call('GET', seatsKey) or '-1'
+  redis.call('PUBLISH', channel, string.sub(seatsKey, 7) .. ':' .. left .. ':convert')
   return 1
 end
 return 0
@@ -80,11 +119,13 @@ return 0
 
 _LUA_TAKE_SEAT = r"""
 local seatsKey = KEYS[1]
+local channel = ARGV[1]
 local seats = tonumber(redis.call('GET', seatsKey) or '-1')
 if seats <= 0 then
   return 0
 end
-redis.call('DECR', seatsKey)
+local left = redis.call('DECR', seatsKey)
+redis.call('PUBLISH', channel, string.sub(seatsKey, 7) .. ':' .. left .. ':take')
 return 1
 """
 
@@ -125,45 +166,114 @@ def create_lock(player_id: int, schedule_id: int, lock_minutes: Optional[int] =
     lock_key = _lock_key(schedule_id, player_id)
     seats_key = _seats_key(schedule_id)
 
-    new_id = r.eval(_LUA_LOCK, 4, lock_key, seats_key, _LOCK_EXP_ZSET, _LOCK_ID_KEY, ttl_ms, exp_at_ms)
+    new_id = r.eval(
+        _LUA_LOCK,
+        5,
+        lock_key,
+        seats_key,
+        _LOCK_EXP_ZSET,
+        _LOCK_ID_KEY,
+        LOCK_HISTORY_STREAM,
+        ttl_ms,
+        exp_at_ms,
+        SEATS_CHANNEL,
+        int(schedule_id),
+        int(player_id),
+        exp_at_ms - ttl_ms,
+    )
     if int(new_id) == -1:
+        metric_inc("seat_locks_total", result="duplicate")
         raise ValueError("您已经锁定了该场次")
     if int(new_id) == -2:
+        metric_inc("seat_locks_total", result="full")
         raise ValueError("该场次已满")
 
+    metric_inc("seat_locks_total", result="success")
     return int(new_id), expire_time
 
 
-def cancel_lock(player_id: int, schedule_id: int) -> bool:
+def _parse_lock_index(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not value:
+        return None
+    schedule_id, _, player_id = value.partition(":")
+    return int(schedule_id), int(player_id)
+
+
+def resolve_lock(lock_id: int) -> Optional[Tuple[int, int]]:
+    """有效锁位号 -> (schedule_id, player_id)；锁位已过期/取消/转订单或为旧版本创建时返回 None。"""
+    return _parse_lock_index(get_redis().get(_lock_index_key(int(lock_id))))
+
+
+def cancel_lock(player_id: int, schedule_id: int, lock_id: Optional[int] = None) -> bool:
+    """取消玩家在场次上的锁位；指定 lock_id 时只有当前锁位号一致才取消。"""
     r = get_redis()
     lock_key = _lock_key(schedule_id, player_id)
     seats_key = _seats_key(schedule_id)
-    ok = r.eval(_LUA_CANCEL_LOCK, 3, lock_key, seats_key, _LOCK_EXP_ZSET)
+    expected = str(int(lock_id)) if lock_id is not None else ""
+    ok = r.eval(_LUA_CANCEL_LOCK, 4, lock_key, seats_key, _LOCK_EXP_ZSET, LOCK_HISTORY_STREAM, SEATS_CHANNEL, expected)
     return bool(int(ok) == 1)
 
 
 def convert_lock_to_order(player_id: int, schedule_id: int) -> bool:
     r = get_redis()
     lock_key = _lock_key(schedule_id, player_id)
-    ok = r.eval(_LUA_CONVERT_LOCK, 2, lock_key, _LOCK_EXP_ZSET)
+    ok = r.eval(
+        _LUA_CONVERT_LOCK, 4, lock_key, _LOCK_EXP_ZSET, _seats_key(schedule_id), LOCK_HISTORY_STREAM, SEATS_CHANNEL
+    )
     return bool(int(ok) == 1)
 
 
 def take_seat(schedule_id: int) -> bool:
     ensure_seats_initialized(schedule_id)
     r = get_redis()
-    ok = r.eval(_LUA_TAKE_SEAT, 1, _seats_key(schedule_id))
+    ok = r.eval(_LUA_TAKE_SEAT, 1, _seats_key(schedule_id), SEATS_CHANNEL)
     return bool(int(ok) == 1)
 
 
+def publish_seats(schedule_id: int, seats: int, event: str) -> None:
+    """Lua 之外的座位变化（归还座位等）同样发布事件；发布失败不影响业务。"""
+    try:
+        get_redis().publish(SEATS_CHANNEL, f"{int(schedule_id)}:{int(seats)}:{event}")
+    except RedisError as e:
+        logger.warning(f"publish seats event failed: {e}")
+
+
 def release_seat(schedule_id: int) -> None:
     ensure_seats_initialized(schedule_id)
-    get_redis().incr(_seats_key(schedule_id))
+    seats = get_redis().incr(_seats_key(schedule_id))
+    publish_seats(schedule_id, seats, "release")
+
+
+_LUA_RELEASE_SEATS = r"""
+local channel = ARGV[1]
+for i, seatsKey in ipairs(KEYS) do
+  -- 未初始化的场次跳过：之后按 Mongo 中的有效订单重新计算，已包含本次归还
+  if redis.call('EXISTS', seatsKey) == 1 then
+    local left = redis.call('INCRBY', seatsKey, tonumber(ARGV[i + 1]))
+    redis.call('PUBLISH', channel, string.sub(seatsKey, 7) .. ':' .. left .. ':release')
+  end
+end
+return #KEYS
+"""
+
+
+def release_seats(counts: Dict[int, int]) -> None:
+    """批量归还座位（{schedule_id: 数量}），一次往返完成。"""
+    if not counts:
+        return
+    sids = sorted(counts)
+    get_redis().eval(
+        _LUA_RELEASE_SEATS,
+        len(sids),
+        *[_seats_key(sid) for sid in sids],
+        SEATS_CHANNEL,
+        *[int(counts[sid]) for sid in sids],
+    )
 
 
 def cleanup_expired_locks(limit: int = 200) -> int:
     """
-    处理 Redis 中过期锁位对应的“座位归还”，并同步 Mongo 历史状态。
+    处理 Redis 中过期锁位对应的“座位归还”，并记录 Mongo 历史状态变更，返回回收的锁位数。
     说明：Redis key TTL 到期后会自动删除 lockKey，但 seats 不会自动 +1，因此需要清理任务。
     """
     r = get_redis()
@@ -172,7 +282,7 @@ def cleanup_expired_locks(limit: int = 200) -> int:
     if not members:
         return 0
 
-    updated = 0
+    reclaimed = 0
     for lock_key in members:
         # lockKey 格式：lock:{schedule_id}:{player_id}
         parts = lock_key.split(":")
@@ -183,27 +293,39 @@ def cleanup_expired_locks(limit: int = 200) -> int:
         schedule_id = int(parts[1])
         player_id = int(parts[2])
 
+        # 先 ZREM 认领：只有移除成功的一方负责归还座位，避免多个清理者（换主瞬间）重复 +1
+        if not r.zrem(_LOCK_EXP_ZSET, lock_key):
+            continue
+
         # 若 key 仍存在，说明还未到期（或被重置），跳过
         if r.exists(lock_key):
-            r.zrem(_LOCK_EXP_ZSET, lock_key)
             continue
 
         # seats +1
         ensure_seats_initialized(schedule_id)
-        r.incr(_seats_key(schedule_id))
-        r.zrem(_LOCK_EXP_ZSET, lock_key)
-
-        # Mongo：把对应的“仍为锁定且已过期”的记录标为过期（Status=3）
-        now = datetime.now()
-        res = col("lock_records").update_many(
-            {
-                "Schedule_ID": schedule_id,
-                "Player_ID": player_id,
-                "Status": 0,
-                "ExpireTime": {"$lte": now},
-            },
-            {"$set": {"Status": 3}},
+        seats = r.incr(_seats_key(schedule_id))
+        metric_inc("seat_locks_reclaimed_total")
+        publish_seats(schedule_id, seats, "reclaim")
+
+        # Mongo：“仍为锁定且已过期”的记录标为过期（Status=3），经锁位历史 Stream 批量写入
+        r.xadd(
+            LOCK_HISTORY_STREAM,
+            {"op": "expire", "schedule_id": schedule_id, "player_id": player_id, "at_ms": now_ms},
         )
-        updated += int(res.modified_count)
+        reclaimed += 1
+
+    return reclaimed
+
 
-    return updated
+def run_lock_sweeper(stop: Optional[threading.Event] = None) -> None:
+    """
+    锁位过期清理循环：所有进程竞争同一 leader 租约，同一时刻只有 leader 执行 cleanup_expired_locks。
+    leader 失联后其余进程在 LOCK_SWEEPER_LEASE_MS 内接管。阻塞运行，直到 stop 被设置。
+    """
+    run_as_leader(
+        "lock_sweeper",
+        lambda: cleanup_expired_locks(limit=200),
+        interval=LOCK_SWEEP_INTERVAL_SECONDS,
+        lease_ttl_ms=LOCK_SWEEPER_LEASE_MS,
+        stop=stop,
+    )
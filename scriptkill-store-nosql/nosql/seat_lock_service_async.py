@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+seat_lock_service 的异步版本（ASGI 模式使用）：Lua 脚本与 key 规则与同步版完全共用，
+两种部署模式可同时访问同一份 Redis 数据。
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from nosql import seat_lock_service as sync_service
+from nosql.config import LOCK_MINUTES_DEFAULT
+from nosql.metrics import inc as metric_inc
+from nosql.mongo_async import col
+from nosql.redis_async import get_redis
+
+logger = logging.getLogger(__name__)
+
+_lock_key = sync_service._lock_key
+_seats_key = sync_service._seats_key
+
+
+async def get_active_lock_id(player_id: int, schedule_id: int) -> Optional[int]:
+    value = await get_redis().get(_lock_key(int(schedule_id), int(player_id)))
+    return int(value) if value is not None else None
+
+
+async def ensure_seats_initialized(schedule_id: int) -> None:
+    r = get_redis()
+    seats_key = _seats_key(schedule_id)
+    if await r.exists(seats_key):
+        return
+
+    sch = await col("schedules").find_one({"_id": schedule_id}, {"Max_Players": 1})
+    if not sch:
+        raise ValueError("场次不存在")
+    max_players = int(sch.get("Max_Players") or 0)
+
+    now = datetime.now()
+    booked = await col("orders").count_documents({"Schedule_ID": schedule_id, "Pay_Status": {"$in": [0, 1]}})
+    locked = await col("lock_records").count_documents(
+        {"Schedule_ID": schedule_id, "Status": 0, "ExpireTime": {"$gt": now}}
+    )
+    seats = max_players - int(booked) - int(locked)
+    if seats < 0:
+        seats = 0
+    await r.set(seats_key, seats)
+
+
+async def create_lock(player_id: int, schedule_id: int, lock_minutes: Optional[int] = None) -> Tuple[int, datetime]:
+    await ensure_seats_initialized(schedule_id)
+
+    minutes = int(lock_minutes or LOCK_MINUTES_DEFAULT)
+    expire_time = datetime.now() + timedelta(minutes=minutes)
+    ttl_ms = int(minutes * 60 * 1000)
+    exp_at_ms = int(expire_time.timestamp() * 1000)
+
+    new_id = await get_redis().eval(
+        sync_service._LUA_LOCK,
+        5,
+        _lock_key(schedule_id, player_id),
+        _seats_key(schedule_id),
+        sync_service._LOCK_EXP_ZSET,
+        sync_service._LOCK_ID_KEY,
+        sync_service.LOCK_HISTORY_STREAM,
+        ttl_ms,
+        exp_at_ms,
+        sync_service.SEATS_CHANNEL,
+        int(schedule_id),
+        int(player_id),
+        exp_at_ms - ttl_ms,
+    )
+    if int(new_id) == -1:
+        metric_inc("seat_locks_total", result="duplicate")
+        raise ValueError("您已经锁定了该场次")
+    if int(new_id) == -2:
+        metric_inc("seat_locks_total", result="full")
+        raise ValueError("该场次已满")
+    metric_inc("seat_locks_total", result="success")
+    return int(new_id), expire_time
+
+
+async def resolve_lock(lock_id: int) -> Optional[Tuple[int, int]]:
+    return sync_service._parse_lock_index(await get_redis().get(sync_service._lock_index_key(int(lock_id))))
+
+
+async def cancel_lock(player_id: int, schedule_id: int, lock_id: Optional[int] = None) -> bool:
+    ok = await get_redis().eval(
+        sync_service._LUA_CANCEL_LOCK,
+        4,
+        _lock_key(schedule_id, player_id),
+        _seats_key(schedule_id),
+        sync_service._LOCK_EXP_ZSET,
+        sync_service.LOCK_HISTORY_STREAM,
+        sync_service.SEATS_CHANNEL,
+        str(int(lock_id)) if lock_id is not None else "",
+    )
+    return bool(int(ok) == 1)
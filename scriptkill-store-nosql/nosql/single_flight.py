@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+读请求合并（single-flight）：同一时刻参数相同的查询只计算一次，其余请求等待并共享结果。
+
+- 进程内：第一个请求负责计算，并发的相同请求等待它完成（等待超过 SINGLE_FLIGHT_WAIT_SECONDS 则自行计算）
+- 跨进程（SINGLE_FLIGHT_REDIS=1）：计算者持有 Redis 锁，结果写回 Redis 并保留 SINGLE_FLIGHT_RESULT_TTL_MS，
+  其他进程的相同请求轮询取结果；Redis 不可用时退化为仅进程内合并
+- 返回值统一经过 to_jsonable，进程内与跨进程两条路径结果一致
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from nosql.config import (
+    SINGLE_FLIGHT_ENABLED,
+    SINGLE_FLIGHT_REDIS,
+    SINGLE_FLIGHT_RESULT_TTL_MS,
+    SINGLE_FLIGHT_WAIT_SECONDS,
+)
+from nosql.json_utils import to_jsonable
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_POLL_SECONDS = 0.02
+
+_LUA_UNLOCK = r"""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_lock = threading.Lock()
+_calls: Dict[str, _Call] = {}
+_async_calls: Dict[str, "asyncio.Task"] = {}
+
+
+def request_key(rule: str, path_params: Dict[str, Any], params: Dict[str, Any]) -> str:
+    """由路由模板、路径参数和已规范化的查询参数生成合并键；Flask 与 ASGI 两个入口共用，保证相同请求落到同一个键。"""
+    return json.dumps([rule, path_params, params], sort_keys=True, default=str)
+
+
+def _redis_key(key: str) -> str:
+    return "sf:" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _compute_shared(key: str, compute: Callable[[], Any]) -> Any:
+    """跨进程合并：拿到 Redis 锁的进程计算并写回结果，其余进程轮询结果。"""
+    if not SINGLE_FLIGHT_REDIS:
+        return to_jsonable(compute())
+    try:
+        r = get_redis()
+        result_key = _redis_key(key)
+        raw = r.get(result_key)
+        if raw is not None:
+            return json.loads(raw)
+
+        lock_key = f"{result_key}:lock"
+        token = uuid.uuid4().hex
+        if r.set(lock_key, token, nx=True, px=int(SINGLE_FLIGHT_WAIT_SECONDS * 1000)):
+            try:
+                value = to_jsonable(compute())
+                try:
+                    r.set(result_key, json.dumps(value, ensure_ascii=False), px=SINGLE_FLIGHT_RESULT_TTL_MS)
+                except RedisError as e:
+                    logger.warning(f"single-flight result not shared: {e}")
+                return value
+            finally:
+                try:
+                    r.eval(_LUA_UNLOCK, 1, lock_key, token)
+                except RedisError:
+                    pass
+
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_SECONDS)
+            raw = r.get(result_key)
+            if raw is not None:
+                return json.loads(raw)
+            if not r.exists(lock_key):
+                break
+    except RedisError as e:
+        logger.warning(f"single-flight redis unavailable, computing locally: {e}")
+    return to_jsonable(compute())
+
+
+def do(key: str, compute: Callable[[], Any]) -> Any:
+    """执行 compute()；同一 key 的并发调用只执行一次并共享结果（异常同样共享）。"""
+    if not SINGLE_FLIGHT_ENABLED:
+        return to_jsonable(compute())
+
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _calls[key] = call
+
+    if not leader:
+        if call.done.wait(SINGLE_FLIGHT_WAIT_SECONDS):
+            if call.error is not None:
+                raise call.error
+            return call.value
+        return to_jsonable(compute())
+
+    try:
+        call.value = _compute_shared(key, compute)
+        return call.value
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+async def do_async(key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """异步版本（仅进程内合并）：相同 key 共享同一个任务，发起者断开连接不会取消其他等待者的计算。"""
+    if not SINGLE_FLIGHT_ENABLED:
+        return to_jsonable(await compute())
+
+    task = _async_calls.get(key)
+    if task is None:
+
+        async def run():
+            return to_jsonable(await compute())
+
+        task = asyncio.ensure_future(run())
+        _async_calls[key] = task
+        task.add_done_callback(lambda t: _async_calls.pop(key, None) if _async_calls.get(key) is t else None)
+    return await asyncio.shield(task)
+
+
+def _reset_after_fork() -> None:
+    global _lock, _calls, _async_calls
+    _lock = threading.Lock()
+    _calls = {}
+    _async_calls = {}
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from nosql.config import UNIQUE_PLAYERS_RETENTION_DAYS
+from nosql.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 维度：all（全店）/ script / dm；每天每个维度一个 HyperLogLog（约 12KB，误差 ~0.81%）
+DIMENSIONS = ("all", "script", "dm")
+
+
+def _day(value) -> str:
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.strftime("%Y%m%d")
+
+
+def _uv_key(day: str, dim: str, ref_id: Optional[int] = None) -> str:
+    if dim == "all":
+        return f"uv:{day}:all"
+    return f"uv:{day}:{dim}:{int(ref_id)}"
+
+
+def keys_for(player_day, script_id: Optional[int], dm_id: Optional[int]) -> List[str]:
+    day = _day(player_day)
+    keys = [_uv_key(day, "all")]
+    if script_id is not None:
+        keys.append(_uv_key(day, "script", script_id))
+    if dm_id is not None:
+        keys.append(_uv_key(day, "dm", dm_id))
+    return keys
+
+
+def record_player(player_id: int, script_id: Optional[int], dm_id: Optional[int], when: Optional[datetime] = None) -> None:
+    """把玩家计入当天的全店/剧本/DM 去重计数。统计失败不影响下单/支付。"""
+    try:
+        ttl = int(UNIQUE_PLAYERS_RETENTION_DAYS) * 86400
+        pipe = get_redis().pipeline(transaction=False)
+        for key in keys_for(when or datetime.now(), script_id, dm_id):
+            pipe.pfadd(key, int(player_id))
+            pipe.expire(key, ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"unique player record failed: {e}")
+
+
+def add_players(key: str, player_ids: Iterable[int], pipe=None) -> None:
+    """批量写入（回填工具使用）。"""
+    ids = [int(x) for x in player_ids]
+    if not ids:
+        return
+    target = pipe if pipe is not None else get_redis()
+    target.pfadd(key, *ids)
+    target.expire(key, int(UNIQUE_PLAYERS_RETENTION_DAYS) * 86400)
+
+
+def day_range(start: date, end: date) -> List[str]:
+    days = []
+    cur = start
+    while cur <= end:
+        days.append(_day(cur))
+        cur += timedelta(days=1)
+    return days
+
+
+def count_unique(days: List[str], dim: str, ref_ids: Optional[Iterable[int]] = None) -> Dict[Optional[int], int]:
+    """
+    区间去重数：对每个维度值，PFCOUNT 该区间内所有天的 key（Redis 服务端合并），复杂度 O(天数)。
+    dim=all 时返回 {None: n}。
+    """
+    if dim not in DIMENSIONS:
+        raise ValueError(f"不支持的维度: {dim}")
+    r = get_redis()
+    pipe = r.pipeline(transaction=False)
+    refs: List[Optional[int]] = [None] if dim == "all" else [int(x) for x in (ref_ids or [])]
+    for ref in refs:
+        pipe.pfcount(*[_uv_key(day, dim, ref) for day in days])
+    return {ref: int(n) for ref, n in zip(refs, pipe.execute())}
+
+
+def count_per_day(days: List[str], dim: str = "all", ref_id: Optional[int] = None) -> List[int]:
+    pipe = get_redis().pipeline(transaction=False)
+    for day in days:
+        pipe.pfcount(_uv_key(day, dim, ref_id))
+    return [int(n) for n in pipe.execute()]
@@ -37,6 +37,21 @@ class InputValidator:
         except (TypeError, ValueError):
             raise ValueError(f"{field_name}格式错误，必须是正整数")
 
+    @staticmethod
+    def optional_int(value):
+        """
+        解析可选的整数查询参数（与 Flask request.args.get(..., type=int) 一致）
+
+        Returns:
+            整数值；缺失或无法解析时返回 None
+        """
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
     @staticmethod
     def validate_phone(phone):
         """
@@ -152,3 +167,34 @@ class InputValidator:
         if value not in allowed_values:
             raise ValueError(f"{field_name}值错误，允许的值为: {allowed_values}")
         return value
+
+    @staticmethod
+    def validate_fields(value, allowed_fields, field_name="fields"):
+        """
+        验证字段选择参数（逗号分隔的字段名，如 fields=Order_ID,Amount）
+
+        Args:
+            value: 待验证的值（None 或空字符串表示不做字段选择）
+            allowed_fields: 允许选择的字段集合
+            field_name: 参数名称
+
+        Returns:
+            去重后的字段列表（保持原顺序）；未指定时返回 None
+
+        Raises:
+            ValueError: 包含不允许的字段
+        """
+        if value is None or str(value).strip() == "":
+            return None
+        fields = []
+        for name in str(value).split(","):
+            name = name.strip()
+            if name and name not in fields:
+                fields.append(name)
+        invalid = [f for f in fields if f not in allowed_fields]
+        if invalid:
+            raise ValueError(f"{field_name}包含不支持的字段: {', '.join(invalid)}，允许的字段为: {', '.join(sorted(allowed_fields))}")
+        if not fields:
+            raise ValueError(f"{field_name}不能为空")
+        return fields
+
@@ -22,6 +22,7 @@ from typing import Dict, List, Tuple
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from models.schedule_model import ScheduleModel
 from nosql.mongo import col
 from nosql.redis_client import get_redis
 
@@ -171,6 +172,7 @@ def adjust_range(
         # Redis seats key may already exist; delete it so runtime will re-init from Mongo
         if not dry_run:
             r.delete(f"seats:{schedule_id}")
+            ScheduleModel.rebuild_order_counters([schedule_id])
 
     return adjusted_schedules, adjusted_orders
 
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+为历史 transactions 补齐反范式字段 Script_ID / Room_ID（按剧本/房间拆分营收趋势时使用）
+
+用法：
+  python tools/backfill_transaction_fields.py
+  python tools/backfill_transaction_fields.py --batch-size 500 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+
+from nosql.mongo import col
+
+
+def backfill(batch_size: int = 1000, dry_run: bool = False) -> int:
+    cursor = col("transactions").find(
+        {"$or": [{"Script_ID": {"$exists": False}}, {"Room_ID": {"$exists": False}}]},
+        {"_id": 1, "Order_ID": 1},
+    )
+
+    updated = 0
+    batch = []
+
+    def _flush(rows) -> int:
+        order_ids = list({int(t["Order_ID"]) for t in rows if t.get("Order_ID") is not None})
+        orders = {
+            int(o["_id"]): o
+            for o in col("orders").find({"_id": {"$in": order_ids}}, {"Script_ID": 1, "Room_ID": 1})
+        }
+        ops = []
+        for t in rows:
+            o = orders.get(int(t.get("Order_ID") or 0))
+            if not o:
+                continue
+            ops.append(
+                UpdateOne({"_id": t["_id"]}, {"$set": {"Script_ID": o.get("Script_ID"), "Room_ID": o.get("Room_ID")}})
+            )
+        if not ops or dry_run:
+            return len(ops)
+        return int(col("transactions").bulk_write(ops, ordered=False).modified_count)
+
+    for t in cursor:
+        batch.append(t)
+        if len(batch) >= batch_size:
+            updated += _flush(batch)
+            batch = []
+    if batch:
+        updated += _flush(batch)
+    return updated
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    updated = backfill(batch_size=args.batch_size, dry_run=bool(args.dry_run))
+    mode = "DRY-RUN" if args.dry_run else "APPLIED"
+    print(f"[{mode}] transactions backfilled={updated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+从历史订单回填去重玩家 HyperLogLog（uv:{YYYYMMDD}:all / script:{id} / dm:{id}）
+
+用法：
+  python tools/backfill_unique_players.py
+  python tools/backfill_unique_players.py --from-date 2025-01-01 --to-date 2025-12-31
+
+说明：
+  - 与实时写入规则一致：每个订单按 Create_Time 所在日期计入（含之后取消的订单），
+    支付成功的订单再按支付流水 Trans_Time 所在日期计入一次；PFADD 幂等，可重复执行
+  - 超出 UNIQUE_PLAYERS_RETENTION_DAYS 的日期写入后也会按保留期过期
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Set
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nosql.mongo import col
+from nosql.redis_client import get_redis
+from nosql.unique_players import add_players, keys_for
+
+
+def _flush(buckets: Dict[str, Set[int]]) -> int:
+    pipe = get_redis().pipeline(transaction=False)
+    for key, players in buckets.items():
+        add_players(key, players, pipe)
+    pipe.execute()
+    n = len(buckets)
+    buckets.clear()
+    return n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from-date", default=None, help="YYYY-MM-DD (inclusive)")
+    ap.add_argument("--to-date", default=None, help="YYYY-MM-DD (inclusive)")
+    ap.add_argument("--batch-size", type=int, default=5000, help="每累计多少条订单/流水写一次 Redis")
+    args = ap.parse_args()
+
+    def _range(field: str) -> dict:
+        cond = {"$type": "date"}
+        if args.from_date:
+            cond["$gte"] = datetime.strptime(args.from_date, "%Y-%m-%d")
+        if args.to_date:
+            cond["$lt"] = datetime.strptime(args.to_date, "%Y-%m-%d") + timedelta(days=1)
+        return {field: cond}
+
+    buckets: Dict[str, Set[int]] = defaultdict(set)
+    keys = 0
+
+    # 1) 下单：所有订单按创建日期计入
+    orders = 0
+    cursor = col("orders").find(
+        {"Player_ID": {"$ne": None}, **_range("Create_Time")},
+        {"_id": 0, "Player_ID": 1, "Script_ID": 1, "DM_ID": 1, "Create_Time": 1},
+    )
+    for o in cursor:
+        for key in keys_for(o["Create_Time"], o.get("Script_ID"), o.get("DM_ID")):
+            buckets[key].add(int(o["Player_ID"]))
+        orders += 1
+        if orders % args.batch_size == 0:
+            keys += _flush(buckets)
+    keys += _flush(buckets)
+
+    # 2) 支付：成功的支付流水按支付日期计入（玩家 ID 取自订单）
+    payments = 0
+    batch: List[dict] = []
+
+    def _add_payments() -> None:
+        players = {
+            int(o["_id"]): int(o["Player_ID"])
+            for o in col("orders").find(
+                {"_id": {"$in": [int(t["Order_ID"]) for t in batch]}, "Player_ID": {"$ne": None}}, {"Player_ID": 1}
+            )
+        }
+        for t in batch:
+            player_id = players.get(int(t["Order_ID"]))
+            if player_id is None:
+                continue
+            for key in keys_for(t["Trans_Time"], t.get("Script_ID"), t.get("DM_ID")):
+                buckets[key].add(player_id)
+        batch.clear()
+
+    cursor = col("transactions").find(
+        {"Trans_Type": 1, "Result": 1, **_range("Trans_Time")},
+        {"_id": 0, "Order_ID": 1, "Script_ID": 1, "DM_ID": 1, "Trans_Time": 1},
+    )
+    for t in cursor:
+        batch.append(t)
+        payments += 1
+        if len(batch) >= args.batch_size:
+            _add_payments()
+            keys += _flush(buckets)
+    _add_payments()
+    keys += _flush(buckets)
+
+    print(f"[OK] unique players backfilled: orders={orders}, payments={payments}, key writes={keys}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+同步（Flask）与异步（ASGI）部署模式压测对比：固定并发持续请求同一接口，输出 RPS 与延迟分位数
+
+用法：
+  # 先分别启动两种模式
+  python app.py                                                   # 同步，:5000
+  uvicorn asgi_app:app --port 5001 --workers 4                    # 异步，:5001
+
+  python tools/bench_async_vs_sync.py \
+      --target sync=http://127.0.0.1:5000 --target async=http://127.0.0.1:5001 \
+      --path /api/scripts/1/schedules --concurrency 1000 --duration 30
+
+  # 锁位接口需带玩家 token（每次请求会真实占座，建议在测试库上执行）
+  python tools/bench_async_vs_sync.py --target async=http://127.0.0.1:5001 \
+      --method POST --path /api/locks --body '{"schedule_id": 4001}' --token <JWT>
+
+依赖：pip install -r requirements-async.txt（httpx）
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+async def _worker(client: httpx.AsyncClient, args, body, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(args.method, args.path, json=body)
+            ok = resp.status_code < 500 and (args.allow_4xx or resp.status_code < 400)
+        except httpx.HTTPError:
+            ok = False
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if not ok:
+            errors[0] += 1
+
+
+async def run_target(base_url: str, args) -> Dict[str, float]:
+    headers: Dict[str, str] = {}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.request_timeout)
+    body = json.loads(args.body) if args.body else None
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout) as client:
+        # 预热：建立连接、填充服务端缓存
+        await asyncio.gather(*(client.request(args.method, args.path, json=body) for _ in range(min(args.concurrency, 50))), return_exceptions=True)
+
+        latencies: List[float] = []
+        errors = [0]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(_worker(client, args, body, deadline, latencies, errors) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def _parse_target(value: str) -> Tuple[str, str]:
+    if "=" not in value:
+        raise argparse.ArgumentTypeError("格式应为 名称=URL，例如 sync=http://127.0.0.1:5000")
+    name, url = value.split("=", 1)
+    return name.strip(), url.strip()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", action="append", type=_parse_target, required=True, help="名称=基础URL，可重复")
+    ap.add_argument("--path", default="/api/scripts/1/schedules")
+    ap.add_argument("--method", default="GET")
+    ap.add_argument("--body", default=None, help="POST 请求体（JSON 字符串）")
+    ap.add_argument("--token", default=None)
+    ap.add_argument("--concurrency", type=int, default=1000)
+    ap.add_argument("--duration", type=float, default=30.0, help="每个目标的压测秒数")
+    ap.add_argument("--request-timeout", type=float, default=30.0)
+    ap.add_argument("--allow-4xx", action="store_true", help="4xx 不计为错误（如重复锁位）")
+    args = ap.parse_args(argv)
+    args.method = args.method.upper()
+
+    print(f"{args.method} {args.path}  concurrency={args.concurrency}  duration={args.duration:g}s")
+    print(f"{'target':>10} {'requests':>9} {'errors':>7} {'rps':>9} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+    for name, url in args.target:
+        r = asyncio.run(run_target(url, args))
+        print(
+            f"{name:>10} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+DM 业绩报表基准测试：验证 get_dm_performance 的耗时不随 DM 数量线性增长
+
+用法：
+  python tools/bench_dm_performance.py --dm-counts 5,50,500 --rounds 5
+
+说明：
+  - 使用独立的基准库（默认 script_kill_store_bench），不会写入业务库
+  - 场次/订单/流水/锁位总量固定（--schedules × --orders-per-schedule），只改变分摊到的 DM 数量，
+    因此各轮耗时的差异只来自 DM 数量本身
+  - 结束后默认删除基准库（--keep 保留）
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _seed(db, dm_count: int, schedule_count: int, orders_per_schedule: int) -> None:
+    for name in ("dms", "schedules", "orders", "transactions", "lock_records"):
+        db[name].delete_many({})
+
+    now = datetime.now()
+    dms, schedules, orders, txs, locks = [], [], [], [], []
+    for i in range(dm_count):
+        dm_id = 2001 + i
+        dms.append({"_id": dm_id, "DM_ID": dm_id, "Name": f"DM_{dm_id}", "Phone": f"138{dm_id:08d}", "Star_Level": 3})
+
+    oid = 1
+    for j in range(schedule_count):
+        sid = 4001 + j
+        # 场次轮流分配给各 DM
+        dm_id = 2001 + j % dm_count
+        start = now - timedelta(days=j % 30, hours=j % 12)
+        schedules.append({"_id": sid, "Schedule_ID": sid, "DM_ID": dm_id, "Start_Time": start, "Status": 1, "Max_Players": 6})
+        for k in range(orders_per_schedule):
+            paid = 1 if k % 3 else 0
+            orders.append(
+                {"_id": oid, "Order_ID": oid, "Schedule_ID": sid, "DM_ID": dm_id, "Start_Time": start, "Pay_Status": paid, "Amount": 100.0}
+            )
+            if paid:
+                txs.append(
+                    {"_id": oid, "Order_ID": oid, "DM_ID": dm_id, "Trans_Type": 1, "Result": 1, "Amount": 100.0, "Trans_Time": start}
+                )
+            oid += 1
+        locks.append({"_id": sid, "Schedule_ID": sid, "DM_ID": dm_id, "Status": 0, "ExpireTime": now + timedelta(minutes=10)})
+
+    for name, docs in (("dms", dms), ("schedules", schedules), ("orders", orders), ("transactions", txs), ("lock_records", locks)):
+        if docs:
+            db[name].insert_many(docs, ordered=False)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default="script_kill_store_bench", help="基准测试使用的独立数据库名")
+    ap.add_argument("--dm-counts", default="5,50,500", help="逗号分隔的 DM 数量")
+    ap.add_argument("--schedules", type=int, default=5000, help="场次总数（各轮相同）")
+    ap.add_argument("--orders-per-schedule", type=int, default=4)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--keep", action="store_true", help="保留基准库")
+    args = ap.parse_args()
+
+    if args.db == os.getenv("MONGO_DB_NAME", "script_kill_store"):
+        raise SystemExit("基准库不能与业务库同名（会被清空）")
+
+    # 必须在导入 nosql.* 之前设置，保证 col() 指向基准库
+    os.environ["MONGO_DB_NAME"] = args.db
+    # 测的是查询本身，绕过报表缓存
+    os.environ["REPORT_CACHE_ENABLED"] = "0"
+
+    from models.report_model import ReportModel
+    from nosql.mongo import ensure_indexes, get_client, get_db
+
+    db = get_db()
+    ensure_indexes()
+
+    print(f"{'DMs':>6} {'orders':>8} {'median_ms':>10} {'p_max_ms':>10}")
+    try:
+        for dm_count in [int(x) for x in args.dm_counts.split(",") if x.strip()]:
+            _seed(db, dm_count, args.schedules, args.orders_per_schedule)
+            ReportModel.get_dm_performance()  # 预热
+
+            samples = []
+            for _ in range(max(1, args.rounds)):
+                t0 = time.perf_counter()
+                rows = ReportModel.get_dm_performance()
+                samples.append((time.perf_counter() - t0) * 1000)
+            assert len(rows) == dm_count
+
+            orders = db["orders"].estimated_document_count()
+            print(f"{dm_count:>6} {orders:>8} {statistics.median(samples):>10.1f} {max(samples):>10.1f}")
+    finally:
+        if not args.keep:
+            get_client().drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+锁位历史写入（独立进程，脱离 Web 层运行）
+
+用法：
+  python tools/lock_history_writer.py            # 持续运行，参与 leader 选举
+  python tools/lock_history_writer.py --once     # 立即写入积压的锁位历史后退出（不参与选举，仅在没有其他写入进程时使用）
+
+说明：
+  - 锁位/取消/转订单/过期回收产生的 lock_records 变更先进入 Redis Stream lockhist:stream，由 leader 批量写入 MongoDB
+  - 可在多台机器上各起一个实现高可用；独立部署时建议给 Web 进程设置 LOCK_HISTORY_IN_WEB=0
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nosql.config import LOCK_HISTORY_LEASE_MS
+from nosql.leader import LeaderLease
+from nosql.lock_history import flush_once, flush_pending, run_writer
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="只写入当前积压的消息")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger(__name__)
+
+    if args.once:
+        # 与常驻写入进程竞争同一租约，保证同一时刻只有一个写入者（写入顺序）
+        lease = LeaderLease("lock_history", LOCK_HISTORY_LEASE_MS)
+        if not lease.acquire_or_renew():
+            logger.info("其他写入进程正在运行（持有租约），无需单独写入")
+            return
+        try:
+            total = flush_pending(lease)
+            while lease.is_leader:
+                n = flush_once(lease, block_ms=None)
+                if not n:
+                    break
+                total += n
+        finally:
+            lease.release()
+        logger.info(f"写入完成，处理锁位历史 {total} 条")
+        return
+
+    stop = threading.Event()
+    # 收到退出信号时主动释放租约，其他进程可立即接管
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    logger.info("lock history writer started")
+    run_writer(stop)
+    logger.info("lock history writer stopped")
+
+
+if __name__ == "__main__":
+    main()
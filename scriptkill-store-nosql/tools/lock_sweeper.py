@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+锁位过期清理（独立进程，脱离 Web 层运行）
+
+用法：
+  python tools/lock_sweeper.py            # 持续运行，参与 leader 选举
+  python tools/lock_sweeper.py --once     # 立即清理一轮后退出（不参与选举）
+
+说明：
+  - 可在多台机器上各起一个实现高可用：同一时刻只有持有 Redis 租约的进程执行清理，
+    leader 退出/失联后其余进程在 LOCK_SWEEPER_LEASE_MS 内接管
+  - 独立部署时建议给 Web 进程设置 LOCK_SWEEPER_IN_WEB=0
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nosql.seat_lock_service import cleanup_expired_locks, run_lock_sweeper
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="只清理一轮")
+    ap.add_argument("--limit", type=int, default=200, help="--once 时单轮处理的过期锁位上限")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger(__name__)
+
+    if args.once:
+        reclaimed = cleanup_expired_locks(limit=args.limit)
+        logger.info(f"清理完成，回收过期锁位 {reclaimed} 个")
+        return
+
+    stop = threading.Event()
+    # 收到退出信号时主动释放租约，其他进程可立即接管
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    logger.info("lock sweeper started")
+    run_lock_sweeper(stop)
+    logger.info("lock sweeper stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -344,7 +344,7 @@ def main():
         db["orders"].insert_many(orders, ordered=False)
 
     if txs:
-        # 补足 DM_ID / Schedule_ID 便于报表过滤
+        # 补足 DM_ID / Schedule_ID / Script_ID / Room_ID 便于报表过滤
         order_map = {int(o["Order_ID"]): o for o in orders} if orders else {}
         for t in txs:
             t["_id"] = int(t["Trans_ID"])
@@ -352,6 +352,8 @@ def main():
             if o:
                 t["DM_ID"] = o.get("DM_ID")
                 t["Schedule_ID"] = o.get("Schedule_ID")
+                t["Script_ID"] = o.get("Script_ID")
+                t["Room_ID"] = o.get("Room_ID")
         db["transactions"].insert_many(txs, ordered=False)
 
     if locks:
@@ -390,6 +392,10 @@ def main():
 
     _init_seats_and_lock_id(db)
 
+    from models.schedule_model import ScheduleModel
+
+    ScheduleModel.rebuild_order_counters()
+
     print(f"[OK] migrated to MongoDB db={MONGO_DB_NAME}")
     print(f"  users={db['users'].count_documents({})}")
     print(f"  players={db['players'].count_documents({})}")
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+超时未支付订单自动取消（独立进程，脱离 Web 层运行）
+
+用法：
+  python tools/order_expirer.py              # 持续运行，参与 leader 选举
+  python tools/order_expirer.py --once       # 立即处理一批到期订单后退出（不参与选举）
+  python tools/order_expirer.py --backfill   # 为已有未支付订单补齐 Pay_Deadline 并写入延迟队列
+
+说明：
+  - 支付时限取场次 Pay_Timeout_Minutes，未设置时为 ORDER_PAY_TIMEOUT_MINUTES（默认 30 分钟）
+  - 可在多台机器上各起一个实现高可用；独立部署时建议给 Web 进程设置 ORDER_EXPIRER_IN_WEB=0
+  - --backfill 按订单创建时间计算截止时间，早已超时的订单会在下一轮被取消
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+
+from models.order_model import OrderModel, run_order_expirer
+from nosql.config import ORDER_EXPIRE_BATCH
+from nosql.mongo import col
+from nosql.pay_deadline import add_deadlines, deadline_for
+
+
+def backfill(batch_size: int) -> int:
+    schedules = {}
+    total = 0
+    ops = []
+    deadlines = []
+
+    def flush():
+        if ops:
+            col("orders").bulk_write(ops, ordered=False)
+        add_deadlines(deadlines)
+        ops.clear()
+        deadlines.clear()
+
+    cursor = col("orders").find(
+        {"Pay_Status": 0}, {"Schedule_ID": 1, "Create_Time": 1, "Pay_Deadline": 1}
+    ).batch_size(batch_size)
+    for order in cursor:
+        deadline = order.get("Pay_Deadline")
+        if deadline is None:
+            sid = int(order["Schedule_ID"])
+            if sid not in schedules:
+                schedules[sid] = col("schedules").find_one({"_id": sid}, {"Pay_Timeout_Minutes": 1}) or {}
+            deadline = deadline_for(schedules[sid], order["Create_Time"])
+            ops.append(UpdateOne({"_id": order["_id"], "Pay_Deadline": None}, {"$set": {"Pay_Deadline": deadline}}))
+        deadlines.append((int(order["_id"]), deadline))
+        total += 1
+        if len(deadlines) >= batch_size:
+            flush()
+    flush()
+    return total
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="只处理一批")
+    ap.add_argument("--limit", type=int, default=ORDER_EXPIRE_BATCH, help="--once 时单批处理的订单上限")
+    ap.add_argument("--backfill", action="store_true", help="为已有未支付订单补齐支付时限")
+    ap.add_argument("--batch-size", type=int, default=1000, help="--backfill 每批写入数量")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger(__name__)
+
+    if args.backfill:
+        total = backfill(args.batch_size)
+        logger.info(f"回填完成，未支付订单 {total} 个已写入延迟队列")
+        return
+
+    if args.once:
+        cancelled = OrderModel.cancel_overdue_orders(limit=args.limit)
+        logger.info(f"处理完成，取消超时订单 {cancelled} 个")
+        return
+
+    stop = threading.Event()
+    # 收到退出信号时主动释放租约，其他进程可立即接管
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    logger.info("order expirer started")
+    run_order_expirer(stop)
+    logger.info("order expirer stopped")
+
+
+if __name__ == "__main__":
+    main()
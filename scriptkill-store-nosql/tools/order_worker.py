@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+秒杀订单落库 worker（SECKILL_MODE=1 时必须运行）
+
+用法：
+  python tools/order_worker.py
+  python tools/order_worker.py --consumer order-1 --batch 500
+
+说明：
+  - 从 Redis Stream orders:stream（消费组 order-writers）批量读取已准入的订单，insert_many 写入 MongoDB 后 ACK
+  - 可启动多个 worker，每个使用不同的 --consumer（默认 主机名-进程号，同一主机多个 worker 互不干扰）
+  - 以相同 --consumer 重启时先处理上次未 ACK 的消息；未指定时由其他 worker 在空闲超时后认领
+  - 某个 worker 宕机后，其未 ACK 的消息在 ORDER_STREAM_CLAIM_IDLE_MS 后由其他 worker 认领
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nosql.config import ORDER_STREAM_BATCH
+from nosql.order_pipeline import run_worker
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}")
+    ap.add_argument("--batch", type=int, default=ORDER_STREAM_BATCH, help="单批最多处理的订单数")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger(__name__)
+
+    stop = threading.Event()
+    # 处理完当前批次再退出
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    logger.info(f"order worker started: {args.consumer}, batch={args.batch}")
+    run_worker(args.consumer, batch=args.batch, stop=stop)
+    logger.info("order worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+重建场次上的反范式订单计数（Booked_Count / Paid_Count）
+
+用法：
+  python tools/rebuild_schedule_counters.py
+  python tools/rebuild_schedule_counters.py --schedule-ids 4001,4002
+
+说明：
+  - 计数日常由下单/支付/取消时的 $inc 维护，房间利用率报表直接读取
+  - 迁移、造数或手工修改订单后运行本脚本即可全量对齐
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.schedule_model import ScheduleModel
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--schedule-ids", default=None, help="逗号分隔的场次ID，默认全部场次")
+    args = ap.parse_args()
+
+    schedule_ids = None
+    if args.schedule_ids:
+        schedule_ids = [int(x) for x in args.schedule_ids.split(",") if x.strip()]
+
+    updated = ScheduleModel.rebuild_order_counters(schedule_ids)
+    print(f"[OK] schedule counters rebuilt, modified={updated}")
+
+
+if __name__ == "__main__":
+    main()
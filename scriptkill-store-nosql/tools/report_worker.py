@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+异步报表任务 worker（独立进程，长区间报表不再占用 Flask 工作线程）
+
+用法：
+  python tools/report_worker.py
+  python tools/report_worker.py --worker-id report-1
+
+说明：
+  - 任务由 POST /api/admin/reports/jobs 提交，结果通过 GET /api/admin/reports/jobs/<job_id> 获取
+  - 可启动多个 worker，每个使用不同的 --worker-id（默认 主机名-进程号，同一主机多个 worker 互不干扰）
+  - worker 崩溃后，其未完成的任务在心跳过期（REPORT_WORKER_HEARTBEAT_SECONDS）后由其他 worker 重新入队；
+    以相同 worker-id 重启时也会立即重新入队
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import socket
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.report_model import REPORT_JOBS
+from nosql.report_jobs import run_worker
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    handlers = {name: fn for name, (fn, _) in REPORT_JOBS.items()}
+    logging.getLogger(__name__).info(f"report worker started: {args.worker_id}, reports={sorted(handlers)}")
+    run_worker(handlers, args.worker_id)
+
+
+if __name__ == "__main__":
+    main()
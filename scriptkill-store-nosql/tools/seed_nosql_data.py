@@ -351,6 +351,8 @@ def _seed_orders(min_orders: int = 1200):
                         "Result": 1,
                         "DM_ID": sch.get("DM_ID"),
                         "Schedule_ID": schedule_id,
+                        "Script_ID": sch.get("Script_ID"),
+                        "Room_ID": sch.get("Room_ID"),
                         "Seeded": True,
                         "SeededAt": now,
                     }
@@ -427,6 +429,10 @@ def main():
     _seed_orders(min_orders=args.min_orders)
     _rebuild_seats()
 
+    from models.schedule_model import ScheduleModel
+
+    ScheduleModel.rebuild_order_counters()
+
     db = get_db()
     print("[OK] seed done")
     print(f"  users={db['users'].count_documents({})}")
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+基于列式快照计算报表（离线分析，不访问线上 Mongo）
+
+用法：
+  python tools/snapshot_report.py top-scripts --start 2025-01-01 --end 2025-12-31 --limit 10
+  python tools/snapshot_report.py room-utilization --snapshot snapshots/latest
+  python tools/snapshot_report.py lock-conversion --dm-id 2001
+  python tools/snapshot_report.py dm-performance
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.snapshot_report_model import SnapshotReportModel
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("report", choices=["top-scripts", "room-utilization", "lock-conversion", "dm-performance"])
+    ap.add_argument("--snapshot", default="snapshots/latest")
+    ap.add_argument("--start", default=None, help="YYYY-MM-DD")
+    ap.add_argument("--end", default=None, help="YYYY-MM-DD")
+    ap.add_argument("--limit", type=int, default=5)
+    ap.add_argument("--dm-id", type=int, default=None)
+    args = ap.parse_args()
+
+    model = SnapshotReportModel(args.snapshot)
+    t0 = time.perf_counter()
+    if args.report == "top-scripts":
+        data = model.get_top_scripts(args.start, args.end, args.limit, dm_id=args.dm_id)
+    elif args.report == "room-utilization":
+        data = model.get_room_utilization(args.start, args.end, dm_id=args.dm_id)
+    elif args.report == "lock-conversion":
+        data = model.get_lock_conversion_rate(args.start, args.end, dm_id=args.dm_id)
+    else:
+        data = model.get_dm_performance(args.start, args.end)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    print(json.dumps(data, ensure_ascii=False, indent=2))
+    print(f"[snapshot {model.snapshot.manifest['exported_at']}] {args.report} in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()